@@ -11,4 +11,4 @@ login = LoginManager(app)
 login.login_view = 'login'
 mail = Mail(app)
 
-from app import routes, models
+from app import routes, models, commands, metrics, statement_budget
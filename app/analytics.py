@@ -0,0 +1,208 @@
+import threading
+from itertools import chain
+from sqlalchemy import case, func, select
+from app import db
+from app.models import BoxScore, Game
+
+try:
+    import numpy as np
+except ImportError:  # Pinned in requirements.txt; a deployment not yet reinstalled gets a 501 explaining the fix
+    np = None
+
+# Counters loaded per box score row, in column order of the arrays
+COUNTERS = ['fga', 'fgm', 'three_fga', 'three_fgm', 'fta', 'ftm', 'oreb', 'dreb', 'assists', 'turnovers', 'points']
+
+PLAYER_COLUMNS = ['player_id', 'team_id', 'games', 'points', 'efg_pct', 'ts_pct', 'usg_pct', 'ast_to',
+                  'orb_pct', 'drb_pct', 'trb_pct']
+TEAM_COLUMNS = ['team_id', 'games', 'points', 'opp_points', 'efg_pct', 'ts_pct', 'ast_to', 'orb_pct', 'drb_pct',
+                'trb_pct', 'possessions', 'pace', 'off_rtg', 'def_rtg']
+
+
+class AnalyticsUnavailable(RuntimeError):
+    pass
+
+
+def require_numpy():
+    if np is None:
+        raise AnalyticsUnavailable('Advanced stats need NumPy: pip install numpy')
+
+
+def load_season(season_id):
+    """Every box score row of a season as int64 columns, from one query.
+
+    Returns (game_id, team_id, opponent_id, player_id, counters) where counters has one column per COUNTERS entry.
+    """
+    require_numpy()
+    opponent_id = func.coalesce(case((BoxScore.team_id == Game.team_1_id, Game.team_2_id), else_=Game.team_1_id), 0)
+    result = db.session.execute(
+        select(BoxScore.game_id, BoxScore.team_id, opponent_id, BoxScore.player_id,
+               *[getattr(BoxScore, column) for column in COUNTERS])
+        .join(Game, Game.game_id == BoxScore.game_id)
+        .where(BoxScore.season_id == season_id)
+    )
+    # Flattened straight into one buffer; building an array from Row objects costs three times the fetch
+    data = np.fromiter(chain.from_iterable(result), dtype=np.int64).reshape(-1, 4 + len(COUNTERS))
+    return data[:, 0], data[:, 1], data[:, 2], data[:, 3], data[:, 4:]
+
+
+def _ratio(numerator, denominator, scale=1.0):
+    # Undefined ratios (no attempts, no turnovers) come out as NaN and are reported as null
+    out = np.full(np.shape(numerator), np.nan)
+    np.divide(numerator * scale, denominator, out=out, where=denominator > 0)
+    return out
+
+
+def _sum_by(index, size, values):
+    # Per-group sums of every column in one pass per column; bincount beats np.add.at by an order of magnitude
+    return np.column_stack([np.bincount(index, weights=values[:, i], minlength=size) for i in range(values.shape[1])])
+
+
+def _shooting(c):
+    efg = _ratio(c['fgm'] + 0.5 * c['three_fgm'], c['fga'], 100)
+    ts = _ratio(c['points'], 2 * (c['fga'] + 0.44 * c['fta']), 100)
+    return efg, ts
+
+
+def _columns(matrix):
+    return {name: matrix[:, i] for i, name in enumerate(COUNTERS)}
+
+
+def compute_advanced_stats(game_id, team_id, opponent_id, player_id, counters):
+    """Advanced player and team stats for a season's box score arrays, in a few vectorized passes.
+
+    There are no minutes in a box score, so usage and rebound rates are shares of the team's (and
+    opponent's) totals over the games a player appeared in, and pace is possessions per game.
+    """
+    require_numpy()
+    if not len(game_id):
+        return {'players': {column: np.zeros(0) for column in PLAYER_COLUMNS},
+                'teams': {column: np.zeros(0) for column in TEAM_COLUMNS}}
+    counters = counters.astype(np.float64)
+
+    # Team-games: (game, team) pairs keyed as game * base + team, with their totals
+    key_base = int(max(team_id.max(), opponent_id.max())) + 1
+    team_game_keys, team_game = np.unique(game_id * key_base + team_id, return_inverse=True)
+    team_game_totals = _sum_by(team_game, len(team_game_keys), counters)
+
+    # The opponent's totals in the same game; zero when the opponent has no box score rows
+    opponent_of = np.zeros(len(team_game_keys), dtype=np.int64)
+    opponent_of[team_game] = opponent_id
+    opponent_keys = team_game_keys - team_game_keys % key_base + opponent_of
+    opponent_index = np.minimum(np.searchsorted(team_game_keys, opponent_keys), len(team_game_keys) - 1)
+    has_opponent = team_game_keys[opponent_index] == opponent_keys
+    opponent_totals = np.where(has_opponent[:, None], team_game_totals[opponent_index], 0.0)
+
+    # Possessions per team-game, averaged with the opponent's estimate as is customary
+    tg, og = _columns(team_game_totals), _columns(opponent_totals)
+    estimate = tg['fga'] - tg['oreb'] + tg['turnovers'] + 0.44 * tg['fta']
+    opponent_estimate = og['fga'] - og['oreb'] + og['turnovers'] + 0.44 * og['fta']
+    possessions = np.where(has_opponent, 0.5 * (estimate + opponent_estimate), estimate)
+
+    teams = _team_stats(team_game_keys % key_base, team_game_totals, opponent_totals, possessions)
+    players = _player_stats(player_id, team_id, team_game, counters, team_game_totals, opponent_totals)
+    return {'players': players, 'teams': teams}
+
+
+def _team_stats(team_of_team_game, team_game_totals, opponent_totals, possessions):
+    team_ids, team = np.unique(team_of_team_game, return_inverse=True)
+    size = len(team_ids)
+    totals = _columns(_sum_by(team, size, team_game_totals))
+    against = _columns(_sum_by(team, size, opponent_totals))
+    games = np.bincount(team, minlength=size)
+    team_possessions = np.bincount(team, weights=possessions, minlength=size)
+
+    efg, ts = _shooting(totals)
+    return {
+        'team_id': team_ids,
+        'games': games,
+        'points': totals['points'].astype(np.int64),
+        'opp_points': against['points'].astype(np.int64),
+        'efg_pct': efg,
+        'ts_pct': ts,
+        'ast_to': _ratio(totals['assists'], totals['turnovers']),
+        'orb_pct': _ratio(totals['oreb'], totals['oreb'] + against['dreb'], 100),
+        'drb_pct': _ratio(totals['dreb'], totals['dreb'] + against['oreb'], 100),
+        'trb_pct': _ratio(totals['oreb'] + totals['dreb'],
+                          totals['oreb'] + totals['dreb'] + against['oreb'] + against['dreb'], 100),
+        'possessions': team_possessions,
+        'pace': _ratio(team_possessions, games),
+        'off_rtg': _ratio(totals['points'], team_possessions, 100),
+        'def_rtg': _ratio(against['points'], team_possessions, 100),
+    }
+
+
+def _player_stats(player_id, team_id, team_game, counters, team_game_totals, opponent_totals):
+    player_ids, first_row, player = np.unique(player_id, return_index=True, return_inverse=True)
+    size = len(player_ids)
+    own = _columns(_sum_by(player, size, counters))
+    # The team's and opponent's totals in each game the player appeared in, summed per player
+    team = _columns(_sum_by(player, size, team_game_totals[team_game]))
+    opponent = _columns(_sum_by(player, size, opponent_totals[team_game]))
+
+    efg, ts = _shooting(own)
+    usage = own['fga'] + 0.44 * own['fta'] + own['turnovers']
+    team_usage = team['fga'] + 0.44 * team['fta'] + team['turnovers']
+    return {
+        'player_id': player_ids,
+        'team_id': team_id[first_row],
+        'games': np.bincount(player, minlength=size),
+        'points': own['points'].astype(np.int64),
+        'efg_pct': efg,
+        'ts_pct': ts,
+        'usg_pct': _ratio(usage, team_usage, 100),
+        'ast_to': _ratio(own['assists'], own['turnovers']),
+        'orb_pct': _ratio(own['oreb'], team['oreb'] + opponent['dreb'], 100),
+        'drb_pct': _ratio(own['dreb'], team['dreb'] + opponent['oreb'], 100),
+        'trb_pct': _ratio(own['oreb'] + own['dreb'],
+                          team['oreb'] + team['dreb'] + opponent['oreb'] + opponent['dreb'], 100),
+    }
+
+
+def as_rows(stats, columns):
+    """Compact {'columns', 'rows'} with plain numbers, rates rounded to one decimal and NaN as null."""
+    rows = []
+    arrays = [stats[column] for column in columns]
+    for values in zip(*[array.tolist() for array in arrays]):
+        rows.append([None if value != value else round(value, 1) if isinstance(value, float) else value
+                     for value in values])
+    return {'columns': columns, 'rows': rows}
+
+
+class SeasonStatsCache:
+    """Advanced stats per season, reused until a box score write or import changes one of its rows."""
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, season_id):
+        # Every box score write stamps its row with a newer game version, so over the rows load_season reads
+        # the count and version sum change whenever the season's data does
+        fingerprint = tuple(db.session.execute(
+            select(func.count(), func.coalesce(func.sum(BoxScore.version), 0))
+            .where(BoxScore.season_id == season_id)
+        ).one())
+        with self._lock:
+            entry = self._entries.get(season_id)
+            if entry is not None and entry[0] == fingerprint:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        stats = compute_advanced_stats(*load_season(season_id))
+        result = {'players': as_rows(stats['players'], PLAYER_COLUMNS), 'teams': as_rows(stats['teams'], TEAM_COLUMNS)}
+        with self._lock:
+            if season_id not in self._entries and len(self._entries) >= self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[season_id] = (fingerprint, result)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+season_stats_cache = SeasonStatsCache()
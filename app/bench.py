@@ -0,0 +1,522 @@
+import io
+import math
+import random
+import statistics
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import date, datetime, time as clock, timedelta
+from sqlalchemy import event, func, insert
+from app import app, db
+from app.analytics import season_stats_cache
+from app.dashboard import dashboard_cache
+from app.game_events import ACTION_DELTAS
+from app.models import User, League, Season, Team, Player, Game, BoxScore, GameLog
+from app.player_stats import STAT_COLUMNS, rebuild_player_season_stats
+from app.rolling_form import rebuild_form
+from app.standings import rebuild_standings
+
+
+@contextmanager
+def count_statements():
+    # Count every statement sent to the database while the block runs
+    counter = {'count': 0, 'commits': 0}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter['count'] += 1
+
+    def commit(conn):
+        counter['commits'] += 1
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(db.engine, 'commit', commit)
+    try:
+        yield counter
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+        event.remove(db.engine, 'commit', commit)
+
+
+def percentile(values, pct):
+    # Nearest-rank percentile of a list of timings
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def time_call(fn, repeat):
+    # Run fn `repeat` times and return (median latency in ms, statements issued by one call)
+    timings = []
+    statements = 0
+    for _ in range(repeat):
+        db.session.expire_all()
+        with count_statements() as counter:
+            start = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - start) * 1000)
+        statements = counter['count']
+    return statistics.median(timings), statements
+
+
+def seed_league(team_count, games_per_team, seed=0):
+    # Build one league with a single season, `team_count` teams and random played games
+    rng = random.Random(seed)
+    league = League(name=f'Bench League {team_count}-{rng.randrange(10 ** 9)}')
+    db.session.add(league)
+    db.session.flush()
+
+    season = Season(name='Bench Season', start_date=date(2024, 1, 1), end_date=date(2024, 12, 31), league_id=league.id)
+    teams = [Team(teamName=f'Team {i + 1}', league_id=league.id) for i in range(team_count)]
+    db.session.add(season)
+    db.session.add_all(teams)
+    db.session.flush()
+
+    games = []
+    for i in range(team_count * games_per_team // 2):
+        team1, team2 = rng.sample(teams, 2)
+        team_1_score = rng.randint(40, 110)
+        team_2_score = rng.randint(40, 110)
+        games.append(Game(
+            game_date=season.start_date + timedelta(days=i % 300),
+            team_1_id=team1.teamID,
+            team_2_id=team2.teamID,
+            team_1_score=team_1_score,
+            team_2_score=team_2_score,
+            team_won=team1.teamID if team_1_score > team_2_score else team2.teamID if team_2_score > team_1_score else None,
+            scheduled_played='Played',
+            league_id=league.id,
+            season_id=season.id
+        ))
+    db.session.add_all(games)
+    db.session.commit()
+
+    return league.id, season.id
+
+
+def legacy_standings(league_id, season_id):
+    # The per-team counting loop the routes used before app.standings existed, kept for comparison
+    games_query = Game.query.filter_by(season_id=season_id, league_id=league_id)
+    team_standings = []
+    for team in Team.query.filter_by(league_id=league_id).all():
+        wins = games_query.filter(
+            ((Game.team_1_id == team.teamID) & (Game.team_1_score > Game.team_2_score)) |
+            ((Game.team_2_id == team.teamID) & (Game.team_2_score > Game.team_1_score))
+        ).count()
+        losses = games_query.filter(
+            ((Game.team_1_id == team.teamID) & (Game.team_1_score < Game.team_2_score)) |
+            ((Game.team_2_id == team.teamID) & (Game.team_2_score < Game.team_1_score))
+        ).count()
+        team_standings.append({'teamName': team.teamName, 'wins': wins, 'losses': losses})
+    return sorted(team_standings, key=lambda x: x['wins'], reverse=True)
+
+
+def legacy_advanced_stats(season_id):
+    # The same advanced stats as app.analytics, worked out one box score object at a time for comparison
+    def ratio(numerator, denominator, scale=1):
+        return round(numerator * scale / denominator, 1) if denominator > 0 else None
+
+    counters = ('fga', 'fgm', 'three_fgm', 'fta', 'oreb', 'dreb', 'assists', 'turnovers', 'points')
+    team_games, player_rows = {}, []
+    for box, game in db.session.query(BoxScore, Game).join(Game, Game.game_id == BoxScore.game_id) \
+            .filter(BoxScore.season_id == season_id).all():
+        opponent_id = game.team_2_id if box.team_id == game.team_1_id else game.team_1_id
+        totals = team_games.setdefault((box.game_id, box.team_id), {'opponent_id': opponent_id, **dict.fromkeys(counters, 0)})
+        for counter in counters:
+            totals[counter] += getattr(box, counter)
+        player_rows.append(box)
+
+    empty = dict.fromkeys(counters, 0)
+    players, teams = {}, {}
+    for (game_id, team_id), totals in team_games.items():
+        against = team_games.get((game_id, totals['opponent_id']), empty)
+        estimate = totals['fga'] - totals['oreb'] + totals['turnovers'] + 0.44 * totals['fta']
+        if against is not empty:
+            estimate = 0.5 * (estimate + against['fga'] - against['oreb'] + against['turnovers'] + 0.44 * against['fta'])
+        team = teams.setdefault(team_id, {'games': 0, 'possessions': 0.0, 'own': dict(empty), 'against': dict(empty)})
+        team['games'] += 1
+        team['possessions'] += estimate
+        for counter in counters:
+            team['own'][counter] += totals[counter]
+            team['against'][counter] += against[counter]
+
+    for box in player_rows:
+        totals = team_games[(box.game_id, box.team_id)]
+        against = team_games.get((box.game_id, totals['opponent_id']), empty)
+        player = players.setdefault(box.player_id, {'team_id': box.team_id, 'games': 0, 'own': dict(empty),
+                                                    'team': dict(empty), 'against': dict(empty)})
+        player['games'] += 1
+        for counter in counters:
+            player['own'][counter] += getattr(box, counter)
+            player['team'][counter] += totals[counter]
+            player['against'][counter] += against[counter]
+
+    def shared(own):
+        return {
+            'points': own['points'],
+            'efg_pct': ratio(own['fgm'] + 0.5 * own['three_fgm'], own['fga'], 100),
+            'ts_pct': ratio(own['points'], 2 * (own['fga'] + 0.44 * own['fta']), 100),
+            'ast_to': ratio(own['assists'], own['turnovers']),
+        }
+
+    team_stats = {}
+    for team_id, team in teams.items():
+        own, against = team['own'], team['against']
+        team_stats[team_id] = {
+            'games': team['games'], **shared(own), 'opp_points': against['points'],
+            'orb_pct': ratio(own['oreb'], own['oreb'] + against['dreb'], 100),
+            'drb_pct': ratio(own['dreb'], own['dreb'] + against['oreb'], 100),
+            'trb_pct': ratio(own['oreb'] + own['dreb'], own['oreb'] + own['dreb'] + against['oreb'] + against['dreb'], 100),
+            'possessions': round(team['possessions'], 1),
+            'pace': ratio(team['possessions'], team['games']),
+            'off_rtg': ratio(own['points'], team['possessions'], 100),
+            'def_rtg': ratio(against['points'], team['possessions'], 100),
+        }
+
+    player_stats = {}
+    for player_id, player in players.items():
+        own, team, against = player['own'], player['team'], player['against']
+        player_stats[player_id] = {
+            'team_id': player['team_id'], 'games': player['games'], **shared(own),
+            'usg_pct': ratio(own['fga'] + 0.44 * own['fta'] + own['turnovers'],
+                             team['fga'] + 0.44 * team['fta'] + team['turnovers'], 100),
+            'orb_pct': ratio(own['oreb'], team['oreb'] + against['dreb'], 100),
+            'drb_pct': ratio(own['dreb'], team['dreb'] + against['oreb'], 100),
+            'trb_pct': ratio(own['oreb'] + own['dreb'], team['oreb'] + team['dreb'] + against['oreb'] + against['dreb'], 100),
+        }
+    return {'players': player_stats, 'teams': team_stats}
+
+
+def seed_rosters(league_id, players_per_team):
+    # Give every team of the league a roster of its own
+    players = [Player(firstName=f'Player {i + 1}', lastName=team.teamName, jerseyNumber=i + 1, teamID=team.teamID)
+               for team in Team.query.filter_by(league_id=league_id).all() for i in range(players_per_team)]
+    db.session.add_all(players)
+    db.session.commit()
+    return len(players)
+
+
+def seed_game(league_id, season_id, players_per_team):
+    # Start an ongoing game between two teams of the league, each with a fresh roster
+    team1, team2 = Team.query.filter_by(league_id=league_id).limit(2).all()
+    rosters = {}
+    for team in (team1, team2):
+        players = [Player(firstName=f'Player {i + 1}', lastName=team.teamName, jerseyNumber=i + 1, teamID=team.teamID)
+                   for i in range(players_per_team)]
+        db.session.add_all(players)
+        rosters[team.teamID] = players
+
+    game = Game(game_date=date.today(), team_1_id=team1.teamID, team_2_id=team2.teamID,
+                league_id=league_id, season_id=season_id, scheduled_played='Ongoing')
+    db.session.add(game)
+    db.session.commit()
+
+    return game.game_id, {team_id: [p.playerID for p in players] for team_id, players in rosters.items()}
+
+
+def scorer_events(rosters, count, seed=0):
+    # Random taps the way the scorer page produces them
+    rng = random.Random(seed)
+    actions = list(ACTION_DELTAS)
+    events = []
+    for i in range(count):
+        team_id = rng.choice(list(rosters))
+        action = rng.choice(actions)
+        events.append({
+            'team_id': team_id,
+            'player_id': rng.choice(rosters[team_id]),
+            'action_type': 'Game Action',
+            'action': action,
+            'action_desc': action,
+            'current_timer': f'00:{i // 60 % 60:02d}:{i % 60:02d}'
+        })
+    return events
+
+
+def logged_in_client(league_id):
+    # Test client holding a session for a bench user with the league selected
+    user = User.query.filter_by(username='bench').first()
+    if user is None:
+        user = User(username='bench', email='bench@example.com')
+        user.set_password('bench')
+        db.session.add(user)
+        db.session.commit()
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+        session['_fresh'] = True
+        session['selected_league_id'] = league_id
+    return client
+
+
+def seed_pages(team_count, players_per_team):
+    """A synthetic league with rosters, a finished and an ongoing game, plus a client and the pages to request."""
+    league_id, season_id = seed_league(team_count, 6)
+    seed_rosters(league_id, players_per_team)
+    client = logged_in_client(league_id)
+
+    game_ids = []
+    for seed in (0, 1):
+        game_id, rosters = seed_game(league_id, season_id, players_per_team)
+        events = scorer_events(rosters, 200, seed=seed)
+        for start in range(0, len(events), 50):
+            client.post(f'/games/{game_id}/events', json={'events': events[start:start + 50]})
+        game_ids.append(game_id)
+    played_id, ongoing_id = game_ids
+    client.post('/end_game', json={'game_id': played_id})
+    team_id = Team.query.filter_by(league_id=league_id).first().teamID
+
+    pages = [
+        f'/league_dashboard/{league_id}', '/teams', f'/team_details/{team_id}', '/players', '/add_player',
+        '/view_games', '/create_game', '/schedule_game', f'/game_details/{played_id}', f'/game_summary/{played_id}',
+        f'/games/{played_id}/log', f'/game_actions/{ongoing_id}', f'/refresh_box_scores/{ongoing_id}', '/'
+    ]
+    return client, pages
+
+
+def request_page(client, page):
+    if page == '/':
+        # The league picker only renders while no league is selected
+        with client.session_transaction() as session:
+            session.pop('selected_league_id', None)
+    # A fresh app context gives the request its own flask.g and database session, as in a worker
+    with app.app_context():
+        return client.get(page)
+
+
+def _next_id(column):
+    return (db.session.query(func.max(column)).scalar() or 0) + 1
+
+
+def _bulk_insert(model, rows, chunk=5000):
+    for start in range(0, len(rows), chunk):
+        db.session.execute(insert(model), rows[start:start + chunk])
+
+
+def generate_dataset(leagues=2, seasons=2, teams=8, players=10, games_per_team=10, events_per_game=120, seed=0):
+    """Fill the database with synthetic leagues and return the row counts written.
+
+    Every game is replayed from random scorer events, so box scores, final scores and the GameLog agree
+    the way they do for games scored through the app. The last games of each season are left scheduled
+    and one game per league is in progress.
+    """
+    rng = random.Random(seed)
+    actions = list(ACTION_DELTAS)
+    ids = {model: _next_id(column) for model, column in (
+        (League, League.id), (Season, Season.id), (Team, Team.teamID), (Player, Player.playerID),
+        (Game, Game.game_id), (BoxScore, BoxScore.box_score_id), (GameLog, GameLog.gamelogid)
+    )}
+    rows = {model: [] for model in ids}
+
+    def new_id(model):
+        ids[model] += 1
+        return ids[model] - 1
+
+    for league_number in range(leagues):
+        league_id = new_id(League)
+        rows[League].append({'id': league_id, 'name': f'Synthetic League {league_id}-{rng.randrange(10 ** 9)}'})
+
+        rosters = {}
+        for team_number in range(teams):
+            team_id = new_id(Team)
+            rows[Team].append({'teamID': team_id, 'teamName': f'Team {league_id}-{team_number + 1}', 'league_id': league_id})
+            rosters[team_id] = []
+            for number in range(players):
+                player_id = new_id(Player)
+                rows[Player].append({'playerID': player_id, 'firstName': f'Player{number + 1}', 'lastName': f'T{team_id}',
+                                     'jerseyNumber': number + 1, 'teamID': team_id})
+                rosters[team_id].append(player_id)
+
+        for season_number in range(seasons):
+            season_id = new_id(Season)
+            start = date(2000 + season_number, 1, 1)
+            rows[Season].append({'id': season_id, 'name': f'Season {season_number + 1}', 'start_date': start,
+                                 'end_date': date(2000 + season_number, 12, 31), 'league_id': league_id})
+
+            game_count = teams * games_per_team // 2
+            for number in range(game_count):
+                team1, team2 = rng.sample(list(rosters), 2)
+                game_id = new_id(Game)
+                game_date = start + timedelta(days=number * 300 // max(game_count, 1))
+                # The newest season ends with one game in progress and a few still to play
+                status = 'Played'
+                if season_number == seasons - 1 and number >= game_count - 3:
+                    status = 'Ongoing' if number == game_count - 3 else 'Scheduled'
+
+                boxes = {}
+                if status != 'Scheduled':
+                    started = datetime.combine(game_date, clock(19))
+                    for n in range(events_per_game):
+                        team_id = rng.choice((team1, team2))
+                        player_id = rng.choice(rosters[team_id])
+                        action = rng.choice(actions)
+                        box = boxes.setdefault((team_id, player_id), dict.fromkeys(STAT_COLUMNS, 0))
+                        for column, delta in ACTION_DELTAS[action].items():
+                            box[column] += delta
+                        rows[GameLog].append({
+                            'gamelogid': new_id(GameLog), 'gameid': game_id, 'teamid': team_id, 'playerid': player_id,
+                            'actiontype': 'Game Action', 'action': action, 'actiondesc': f'Player {player_id} {action}',
+                            'currenttimer': clock(0, n * 40 // 60 % 60, n * 40 % 60),
+                            'gamelogdatetime': started + timedelta(seconds=n * 20)
+                        })
+
+                for (team_id, player_id), box in boxes.items():
+                    rows[BoxScore].append(dict(box, box_score_id=new_id(BoxScore), date_played=game_date, game_id=game_id,
+                                               player_id=player_id, team_id=team_id, league_id=league_id,
+                                               season_id=season_id, version=1))
+
+                score1 = sum(box['points'] for (team_id, _), box in boxes.items() if team_id == team1)
+                score2 = sum(box['points'] for (team_id, _), box in boxes.items() if team_id == team2)
+                played = status == 'Played'
+                rows[Game].append({
+                    'game_id': game_id, 'game_date': game_date, 'team_1_id': team1, 'team_2_id': team2,
+                    'team_1_score': score1 if played else 0, 'team_2_score': score2 if played else 0,
+                    'team_won': (team1 if score1 > score2 else team2 if score2 > score1 else None) if played else None,
+                    'scheduled_played': status, 'league_id': league_id, 'season_id': season_id,
+                    'box_score_version': 1 if boxes else 0
+                })
+
+    for model in (League, Team, Player, Season, Game, BoxScore, GameLog):
+        _bulk_insert(model, rows[model])
+    for season in rows[Season]:
+        rebuild_standings(season['league_id'], season['id'])
+        rebuild_player_season_stats(season['id'])
+        rebuild_form(season['id'])
+    db.session.commit()
+
+    return {model.__tablename__: len(model_rows) for model, model_rows in rows.items()}
+
+
+# Endpoints the route benchmark cannot replay meaningfully through the test client
+UNTIMED_ENDPOINTS = {
+    'static': 'static files',
+    'game_stream': 'long-lived event stream',
+    'metrics_endpoint': 'reports on the benchmark itself',
+    'logout': 'ends the benchmark session',
+    'select_league': 'redirect only',
+}
+
+
+class BenchRequest(namedtuple('BenchRequest', ['name', 'method', 'path', 'json', 'data', 'anonymous', 'cold'],
+                              defaults=(None, None, False, None))):
+    """One timed request of the route benchmark.
+
+    name is the endpoint, with a ':variant' suffix when an endpoint is timed more than one way. data is a
+    function of the run number returning form fields or files, since uploads and sign-ups need fresh values
+    every run. anonymous requests are sent by a new signed-out client each run, and cold is called before
+    each run to empty the cache the route would otherwise answer from.
+    """
+
+    @property
+    def endpoint(self):
+        return self.name.partition(':')[0]
+
+
+def route_requests(league_id):
+    """One or more representative requests per route for a league built by generate_dataset."""
+    season = Season.query.filter_by(league_id=league_id).order_by(Season.start_date.desc()).first()
+    played = Game.query.filter_by(season_id=season.id, scheduled_played='Played').order_by(Game.game_id.desc()).first()
+    ongoing = Game.query.filter_by(season_id=season.id, scheduled_played='Ongoing').first()
+    box = BoxScore.query.filter_by(game_id=ongoing.game_id).first()
+    team_id, player_id = box.team_id, box.player_id
+    team_name = db.session.get(Team, team_id).teamName
+    events = [{'team_id': team_id, 'player_id': player_id, 'action_type': 'Game Action', 'action': action,
+               'action_desc': action, 'current_timer': '00:10:00'} for action in list(ACTION_DELTAS)[:5]]
+
+    def player_upload(run):
+        # A fresh jersey number every run, so each upload imports a player instead of rejecting a duplicate
+        csv = f'team,firstName,lastName,jerseyNumber\n{team_name},Bench,Upload,{1000 + run}\n'
+        return {'file': (io.BytesIO(csv.encode()), 'players.csv')}
+
+    def sign_up(run):
+        name = f'bench-{league_id}-{run}-{random.randrange(10 ** 9)}'
+        return {'username': name, 'email': f'{name}@example.com', 'password': 'bench', 'password2': 'bench'}
+
+    return [
+        BenchRequest('index', 'GET', '/'),
+        BenchRequest('league_dashboard', 'GET', f'/league_dashboard/{league_id}'),
+        BenchRequest('league_dashboard:cold', 'GET', f'/league_dashboard/{league_id}', cold=dashboard_cache.clear),
+        # Signed-out visitors: the form pages, then the submissions up to their redirect, which is not followed
+        BenchRequest('login', 'GET', '/login', anonymous=True),
+        BenchRequest('login:submit', 'POST', '/login', data=lambda run: {'username': 'bench', 'password': 'bench'},
+                     anonymous=True),
+        BenchRequest('register', 'GET', '/register', anonymous=True),
+        BenchRequest('register:submit', 'POST', '/register', data=sign_up, anonymous=True),
+        BenchRequest('add_team', 'GET', '/add_team'),
+        BenchRequest('teams', 'GET', '/teams'),
+        BenchRequest('team_details', 'GET', f'/team_details/{team_id}'),
+        BenchRequest('players', 'GET', '/players'),
+        BenchRequest('add_player', 'GET', '/add_player'),
+        BenchRequest('update_player', 'GET', f'/update_player/{player_id}'),
+        BenchRequest('quick_upload', 'GET', '/quick_upload'),
+        BenchRequest('import_upload', 'POST', '/import/players', data=player_upload),
+        BenchRequest('export', 'GET', f'/export/box_scores?season_id={season.id}'),
+        BenchRequest('stats_api', 'GET', f'/api/v1/stats?season_id={season.id}'),
+        BenchRequest('advanced_stats_api', 'GET', f'/api/v1/advanced_stats?season_id={season.id}'),
+        BenchRequest('advanced_stats_api:cold', 'GET', f'/api/v1/advanced_stats?season_id={season.id}',
+                     cold=season_stats_cache.clear),
+        BenchRequest('leaderboards_api', 'GET', f'/api/v1/leaderboards?season_id={season.id}'),
+        BenchRequest('create_game', 'GET', '/create_game'),
+        BenchRequest('schedule_game', 'GET', '/schedule_game'),
+        BenchRequest('view_games', 'GET', '/view_games'),
+        BenchRequest('game_details', 'GET', f'/game_details/{played.game_id}'),
+        BenchRequest('game_actions', 'GET', f'/game_actions/{ongoing.game_id}'),
+        BenchRequest('refresh_box_scores', 'GET', f'/refresh_box_scores/{ongoing.game_id}'),
+        BenchRequest('game_summary', 'GET', f'/game_summary/{played.game_id}'),
+        BenchRequest('game_log', 'GET', f'/games/{played.game_id}/log'),
+        BenchRequest('log_action', 'POST', '/log_action', json={
+            'gameid': ongoing.game_id, 'teamid': team_id, 'playerid': player_id, 'actiontype': 'Game Action',
+            'action': 'Assist', 'actiondesc': 'Assist', 'currenttimer': '00:10:00'}),
+        BenchRequest('game_events', 'POST', f'/games/{ongoing.game_id}/events', json={'events': events}),
+        BenchRequest('update_boxscore', 'POST', '/update_boxscore', json={
+            'game_id': ongoing.game_id, 'team_id': team_id, 'player_id': player_id, 'action': '2-Point Made'}),
+        BenchRequest('end_game', 'POST', '/end_game', json={'game_id': played.game_id}),
+    ]
+
+
+def bench_routes(client, league_id, requests, repeat):
+    """p50/p95 latency in ms and statements per request for each BenchRequest, keyed by its name.
+
+    Redirects are not followed, so a form submission is timed up to its redirect and not the page after it.
+    """
+    results = {}
+    # The bench posts forms the way a browser would, minus the CSRF token it cannot scrape from a rendered page
+    csrf_enabled = app.config.get('WTF_CSRF_ENABLED', True)
+    app.config['WTF_CSRF_ENABLED'] = False
+    try:
+        for bench_request in requests:
+            timings = []
+            statements = []
+            # The first request compiles templates and warms caches, so it is not timed
+            for run in range(repeat + 1):
+                sender = app.test_client() if bench_request.anonymous else client
+                if bench_request.endpoint == 'index':
+                    # The league picker only renders while no league is selected
+                    with client.session_transaction() as session:
+                        session.pop('selected_league_id', None)
+                if bench_request.cold:
+                    bench_request.cold()
+                data = bench_request.data(run) if bench_request.data else None
+                # A fresh app context gives every request its own flask.g and database session, as in a worker
+                with app.app_context(), count_statements() as counter:
+                    start = time.perf_counter()
+                    response = sender.open(bench_request.path, method=bench_request.method, json=bench_request.json,
+                                           data=data)
+                    # Streamed responses such as exports do their work while the body is read
+                    response.get_data()
+                    response.close()
+                    elapsed = (time.perf_counter() - start) * 1000
+                if run:
+                    timings.append(elapsed)
+                    statements.append(counter['count'])
+                if bench_request.endpoint == 'index':
+                    with client.session_transaction() as session:
+                        session['selected_league_id'] = league_id
+            results[bench_request.name] = {
+                'status': response.status_code,
+                'p50_ms': round(percentile(timings, 50), 3),
+                'p95_ms': round(percentile(timings, 95), 3),
+                'statements': max(statements),
+            }
+    finally:
+        app.config['WTF_CSRF_ENABLED'] = csrf_enabled
+    return results
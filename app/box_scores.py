@@ -0,0 +1,92 @@
+from collections import namedtuple
+from sqlalchemy import case, func, null, select, union_all
+from app import db
+from app.models import BoxScore, Player
+from app.player_stats import STAT_COLUMNS
+
+# Percentage columns and the (made, attempted) counters they are computed from
+PERCENTAGES = {
+    'fg_percent': ('fgm', 'fga'),
+    'three_fg_percent': ('three_fgm', 'three_fga'),
+    'ft_percent': ('ftm', 'fta'),
+}
+
+# A team's player rows in box score order and its totals row
+TeamBoxScore = namedtuple('TeamBoxScore', ['team_id', 'rows', 'totals'])
+
+
+def _stat_sums():
+    return [func.coalesce(func.sum(getattr(BoxScore, column)), 0).label(column) for column in STAT_COLUMNS]
+
+
+def percentage(made, attempted):
+    return case((attempted > 0, func.round(made * 100.0 / attempted, 1)), else_=0.0)
+
+
+def _team_groups(game_id):
+    # The rollup's team level: one row per team with the sums of every counter
+    return select(
+        BoxScore.team_id,
+        null().label('player_id'),
+        null().label('position'),
+        func.max(BoxScore.version).label('version'),
+        *_stat_sums()
+    ).where(BoxScore.game_id == game_id).group_by(BoxScore.team_id)
+
+
+def _with_percentages(groups):
+    # Derived columns are computed in SQL over either level of the rollup
+    return [(groups.c.oreb + groups.c.dreb).label('reb')] + [
+        percentage(groups.c[made], groups.c[attempted]).label(name)
+        for name, (made, attempted) in PERCENTAGES.items()
+    ]
+
+
+def empty_totals():
+    totals = {column: 0 for column in STAT_COLUMNS + ['reb', 'version']}
+    totals.update({name: 0.0 for name in PERCENTAGES})
+    return totals
+
+
+def _totals(row):
+    return {key: row[key] for key in STAT_COLUMNS + ['reb', 'version'] + list(PERCENTAGES)}
+
+
+def game_box_score(game):
+    """Player rows and team totals for both teams of a game from one grouped query, keyed by team id.
+
+    Player groups and team groups are combined with UNION ALL, the portable spelling of GROUP BY ... WITH ROLLUP.
+    """
+    player_groups = select(
+        BoxScore.team_id,
+        BoxScore.player_id,
+        func.min(BoxScore.box_score_id).label('position'),
+        func.max(BoxScore.version).label('version'),
+        *_stat_sums()
+    ).where(BoxScore.game_id == game.game_id).group_by(BoxScore.team_id, BoxScore.player_id)
+    groups = union_all(player_groups, _team_groups(game.game_id)).subquery()
+
+    query = select(
+        groups, Player.firstName, Player.lastName, Player.jerseyNumber, *_with_percentages(groups)
+    ).outerjoin(Player, Player.playerID == groups.c.player_id).order_by(groups.c.position)
+
+    teams = {team_id: TeamBoxScore(team_id, [], empty_totals()) for team_id in (game.team_1_id, game.team_2_id)}
+    for row in db.session.execute(query).mappings():
+        team = teams.get(row['team_id'])
+        if team is None:
+            continue  # Rows credited to a team that is not playing this game are not shown
+        if row['player_id'] is None:
+            team.totals.update(_totals(row))
+        else:
+            team.rows.append(dict(row))
+    return teams
+
+
+def game_team_totals(game):
+    """Just the team level of game_box_score, for callers that need team sums such as the final score."""
+    groups = _team_groups(game.game_id).subquery()
+    totals = {team_id: empty_totals() for team_id in (game.team_1_id, game.team_2_id)}
+    for row in db.session.execute(select(groups, *_with_percentages(groups))).mappings():
+        if row['team_id'] in totals:
+            totals[row['team_id']].update(_totals(row))
+    return totals
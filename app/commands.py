@@ -0,0 +1,466 @@
+import json
+import time
+from collections import Counter
+import click
+from sqlalchemy import event, select
+from app import app, db
+from app.analytics import (PLAYER_COLUMNS, TEAM_COLUMNS, AnalyticsUnavailable, as_rows, compute_advanced_stats,
+                           load_season, require_numpy)
+from app.exporter import EXPORTS, FORMATS, export_chunks, gzip_chunks
+from app.importer import CHUNK_ROWS, IMPORTERS, format_for, import_rows, read_rows, text_stream
+from app.game_log_replay import GAMES_PER_CHUNK, replay_game_log
+from app.migrations import upgrade
+from app.models import Game, League, Season
+from app.player_stats import rebuild_player_season_stats
+from app.query_plans import explain, full_table_scans
+from app.rolling_form import rebuild_form
+from app.standings import compute_standings, load_standings, rebuild_standings
+from app.statement_budget import StatementBudgetExceeded
+
+# app.bench and app.load_test are imported inside the commands that use them, so web workers never load them
+
+
+def require_sqlite():
+    # Benchmarks create tables and synthetic rows, so never let them near the production database
+    if db.engine.url.get_backend_name() != 'sqlite':
+        raise click.UsageError('Benchmarks must run against SQLite, e.g. DATABASE_URL=sqlite:///bench.db')
+
+
+@app.cli.command('rebuild-standings')
+@click.argument('season_id', type=int)
+def rebuild_standings_command(season_id):
+    """Rebuild the standings table of a season from its games."""
+    season = db.session.get(Season, season_id)
+    if season is None:
+        raise click.BadParameter(f'Season {season_id} does not exist.', param_hint='SEASON_ID')
+
+    db.create_all()  # Creates the standings table on databases that predate it
+    games = rebuild_standings(season.league_id, season.id)
+    db.session.commit()
+    click.echo(f'Rebuilt standings for {season.name} from {games} games.')
+
+
+@app.cli.command('rebuild-player-stats')
+@click.argument('season_id', type=int)
+def rebuild_player_stats_command(season_id):
+    """Rebuild the player season aggregates of a season from its box scores."""
+    season = db.session.get(Season, season_id)
+    if season is None:
+        raise click.BadParameter(f'Season {season_id} does not exist.', param_hint='SEASON_ID')
+
+    db.create_all()  # Creates the player_season_stats table on databases that predate it
+    players = rebuild_player_season_stats(season.id)
+    db.session.commit()
+    click.echo(f'Rebuilt season stats for {players} player/team rows in {season.name}.')
+
+
+@app.cli.command('rebuild-form')
+@click.argument('season_id', type=int)
+def rebuild_form_command(season_id):
+    """Rebuild the rolling form windows of a season from its played games."""
+    season = db.session.get(Season, season_id)
+    if season is None:
+        raise click.BadParameter(f'Season {season_id} does not exist.', param_hint='SEASON_ID')
+
+    db.create_all()  # Creates the form_windows table on databases that predate it
+    windows = rebuild_form(season.id)
+    db.session.commit()
+    click.echo(f'Rebuilt {windows} player and team form windows for {season.name}.')
+
+
+@app.cli.command('replay-game-log')
+@click.option('--game', 'game_id', type=int, help='Replay a single game.')
+@click.option('--season', 'season_id', type=int, help='Replay every game of a season.')
+@click.option('--dry-run', is_flag=True, help='Report what drifted without rewriting anything.')
+def replay_game_log_command(game_id, season_id, dry_run):
+    """Rebuild box scores and final scores from the game log of a game, a season or every game."""
+    if game_id is not None and season_id is not None:
+        raise click.UsageError('Pass --game or --season, not both.')
+    query = select(Game.game_id).order_by(Game.game_id)
+    if game_id is not None:
+        query = query.where(Game.game_id == game_id)
+    elif season_id is not None:
+        query = query.where(Game.season_id == season_id)
+    game_ids = db.session.scalars(query).all()
+    if game_id is not None and not game_ids:
+        raise click.BadParameter(f'Game {game_id} does not exist.', param_hint='--game')
+
+    counts = Counter()
+    box_score_seasons = set()
+    score_seasons = set()
+    start = time.perf_counter()
+    for offset in range(0, len(game_ids), GAMES_PER_CHUNK):
+        replay = replay_game_log(game_ids[offset:offset + GAMES_PER_CHUNK], dry_run)
+        counts.update(replay.counts)
+        box_score_seasons |= replay.box_score_seasons
+        score_seasons |= replay.score_seasons
+        if not dry_run:
+            db.session.commit()
+
+    # Season aggregates are rebuilt once at the end rather than per chunk
+    if not dry_run:
+        for season in sorted(box_score_seasons):
+            rebuild_player_season_stats(season)
+        for league, season in sorted(score_seasons):
+            rebuild_standings(league, season)
+        for season in sorted(box_score_seasons | {season for league, season in score_seasons}):
+            rebuild_form(season)
+        db.session.commit()
+    elapsed = time.perf_counter() - start
+
+    events_per_sec = counts['events'] / elapsed if elapsed else 0
+    click.echo(f"Replayed {counts['events']} events from {counts['logged_games']} of {counts['games']} games "
+               f"in {elapsed:.2f} s ({events_per_sec:,.0f} events/s).")
+    click.echo(f"{'Would change' if dry_run else 'Changed'} {counts['games_changed']} games: "
+               f"{counts['box_scores_updated']} box scores updated, {counts['box_scores_inserted']} inserted, "
+               f"{counts['scores_updated']} final scores corrected.")
+    if counts['queued_log_games']:
+        click.echo(f"Skipped {counts['queued_log_games']} games whose log rows are still queued; run again shortly.")
+    if counts['unplaceable_box_scores']:
+        click.echo(f"Skipped {counts['unplaceable_box_scores']} box scores of games without a league or season.")
+    if not dry_run and (box_score_seasons or score_seasons):
+        click.echo(f'Rebuilt player stats for {len(box_score_seasons)} and standings for {len(score_seasons)} seasons.')
+
+
+@app.cli.command('import')
+@click.argument('kind', type=click.Choice(list(IMPORTERS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--league', 'league_id', type=int, required=True, help='League the rows belong to.')
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'jsonl']),
+              help='File format; by default taken from the file extension.')
+@click.option('--chunk-rows', default=CHUNK_ROWS, help='Rows validated and inserted per transaction.')
+def import_command(kind, path, league_id, file_format, chunk_rows):
+    """Stream teams, players, games or box scores from a CSV or JSON-lines file into a league."""
+    if db.session.get(League, league_id) is None:
+        raise click.BadParameter(f'League {league_id} does not exist.', param_hint='--league')
+
+    def progress(result):
+        click.echo(f'{result.rows:>9} rows  {result.inserted:>9} inserted  {result.skipped:>7} skipped  '
+                   f'{result.rows_per_sec:>9,.0f} rows/s', err=True)
+
+    with open(path, 'rb') as f:
+        rows = read_rows(text_stream(f), file_format or format_for(path))
+        result = import_rows(kind, rows, league_id, chunk_rows, progress)
+
+    for line, message in result.errors:
+        click.echo(f'Line {line}: {message}', err=True)
+    if result.skipped > len(result.errors):
+        click.echo(f'... and {result.skipped - len(result.errors)} more skipped rows.', err=True)
+    click.echo(f'Imported {result.inserted} of {result.rows} {kind} rows in {result.seconds:.2f} s '
+               f'({result.rows_per_sec:,.0f} rows/s).')
+
+
+@app.cli.command('export')
+@click.argument('kind', type=click.Choice(list(EXPORTS)))
+@click.option('--league', 'league_id', type=int, required=True, help='League to export.')
+@click.option('--season', 'season_id', type=int, help='Only this season.')
+@click.option('--format', 'file_format', type=click.Choice(list(FORMATS)), default='csv')
+@click.option('--after', type=int, help='Resume after this id, the first column of the last row received.')
+@click.option('--gzip', 'compress', is_flag=True, help='Write gzip; implied by an output name ending in .gz.')
+@click.option('--output', type=click.Path(dir_okay=False, writable=True), default='-', help='File to write; - for stdout.')
+def export_command(kind, league_id, season_id, file_format, after, compress, output):
+    """Stream a league's box scores, games or game logs as CSV or JSON lines."""
+    if db.session.get(League, league_id) is None:
+        raise click.BadParameter(f'League {league_id} does not exist.', param_hint='--league')
+
+    compress = compress or output.endswith('.gz')
+    chunks = export_chunks(kind, league_id, season_id, after, file_format)
+    start = time.perf_counter()
+    written = 0
+    # Resumed exports append to what was already received
+    with click.open_file(output, 'ab' if after is not None else 'wb') as f:
+        for chunk in gzip_chunks(chunks) if compress else (chunk.encode() for chunk in chunks):
+            f.write(chunk)
+            written += len(chunk)
+    elapsed = time.perf_counter() - start
+    click.echo(f'Wrote {written:,} bytes of {kind} in {elapsed:.2f} s.', err=True)
+
+
+@app.cli.command('upgrade-db')
+def upgrade_db():
+    """Bring an existing database up to the current schema."""
+    applied = 0
+    for name in upgrade():
+        click.echo(f'Applied {name}')
+        applied += 1
+    if not applied:
+        click.echo('Database is up to date.')
+
+
+@app.cli.command('bench-standings')
+@click.option('--teams', 'team_counts', default='4,8,16,32,64', help='Comma separated team counts to measure.')
+@click.option('--games-per-team', default=20, help='Games played by each team in the season.')
+@click.option('--repeat', default=20, help='Timed runs per measurement.')
+def bench_standings(team_counts, games_per_team, repeat):
+    """Compare standings query count and latency as the number of teams grows."""
+    from app.bench import legacy_standings, seed_league, time_call
+    require_sqlite()
+    db.create_all()
+
+    click.echo(f"{'teams':>6} {'table stmts':>12} {'table ms':>9} {'grouped stmts':>14} {'grouped ms':>11} "
+               f"{'legacy stmts':>13} {'legacy ms':>10}")
+    for team_count in [int(n) for n in team_counts.split(',')]:
+        league_id, season_id = seed_league(team_count, games_per_team)
+        rebuild_standings(league_id, season_id)
+        db.session.commit()
+
+        table_ms, table_statements = time_call(lambda: load_standings(league_id, season_id), repeat)
+        ms, statements = time_call(lambda: compute_standings(league_id, season_id), repeat)
+        legacy_ms, legacy_statements = time_call(lambda: legacy_standings(league_id, season_id), repeat)
+        click.echo(f'{team_count:>6} {table_statements:>12} {table_ms:>9.2f} {statements:>14} {ms:>11.2f} '
+                   f'{legacy_statements:>13} {legacy_ms:>10.2f}')
+
+
+@app.cli.command('bench-analytics')
+@click.option('--teams', default=30, help='Teams in the synthetic season.')
+@click.option('--players', default=12, help='Players per team.')
+@click.option('--games-per-team', default=80, help='Games each team plays.')
+@click.option('--events-per-game', default=60, help='Scorer events per game.')
+@click.option('--repeat', default=5, help='Timed runs per measurement.')
+def bench_analytics(teams, players, games_per_team, events_per_game, repeat):
+    """Time the vectorized advanced stats against the same arithmetic done row by row."""
+    from app.bench import generate_dataset, legacy_advanced_stats, time_call
+    require_sqlite()
+    try:
+        require_numpy()
+    except AnalyticsUnavailable as e:
+        raise click.UsageError(str(e))
+    db.create_all()
+
+    rows = generate_dataset(1, 1, teams, players, games_per_team, events_per_game)
+    season_id = db.session.query(db.func.max(Season.id)).scalar()
+
+    columns = load_season(season_id)
+    load_ms, _ = time_call(lambda: load_season(season_id), repeat)
+    compute_ms, _ = time_call(lambda: compute_advanced_stats(*columns), repeat)
+    legacy_ms, legacy_statements = time_call(lambda: legacy_advanced_stats(season_id), repeat)
+
+    # Both must agree to the reported precision; float summation order may move a rounding by 0.1
+    stats = compute_advanced_stats(*columns)
+    legacy = legacy_advanced_stats(season_id)
+    mismatches = 0
+    for group, names in (('players', PLAYER_COLUMNS), ('teams', TEAM_COLUMNS)):
+        for row in as_rows(stats[group], names)['rows']:
+            expected = legacy[group][row[0]]
+            for name, value in zip(names[1:], row[1:]):
+                if (value is None) != (expected[name] is None) or (value is not None and abs(value - expected[name]) > 0.11):
+                    mismatches += 1
+
+    click.echo(f"Season of {len(columns[0])} box score rows ({rows['box_scores']} generated), "
+               f"{len(stats['players']['player_id'])} players, {len(stats['teams']['team_id'])} teams")
+    click.echo(f'{"load (1 query)":<22} {load_ms:>9.2f} ms')
+    click.echo(f'{"vectorized compute":<22} {compute_ms:>9.2f} ms')
+    click.echo(f'{"row by row":<22} {legacy_ms:>9.2f} ms  ({legacy_statements} statements)')
+    click.echo(f'{"speedup":<22} {legacy_ms / (load_ms + compute_ms):>9.1f}x')
+    if mismatches:
+        raise click.ClickException(f'{mismatches} values differ from the row by row computation.')
+
+
+def replay_paired(client, game_id, events):
+    # One tap as the scorer page used to send it: box score, play-by-play, then a refresh
+    for event in events:
+        client.post('/update_boxscore', json={
+            'game_id': game_id, 'team_id': event['team_id'], 'player_id': event['player_id'], 'action': event['action']
+        })
+        client.post('/log_action', json={
+            'gameid': game_id, 'teamid': event['team_id'], 'playerid': event['player_id'],
+            'actiontype': event['action_type'], 'action': event['action'],
+            'actiondesc': event['action_desc'], 'currenttimer': event['current_timer']
+        })
+        client.get(f'/refresh_box_scores/{game_id}')
+    return len(events) * 3
+
+
+def replay_batched(client, game_id, events, batch_size):
+    # Buffered taps flushed to the events endpoint, with one refresh per batch
+    requests = 0
+    for start in range(0, len(events), batch_size):
+        client.post(f'/games/{game_id}/events', json={'events': events[start:start + batch_size]})
+        client.get(f'/refresh_box_scores/{game_id}')
+        requests += 2
+    return requests
+
+
+@app.cli.command('bench-scoring')
+@click.option('--events', 'event_count', default=500, help='Scorer taps to replay per mode.')
+@click.option('--batch-size', default=5, help='Events per request in batched mode.')
+@click.option('--players-per-team', default=10)
+def bench_scoring(event_count, batch_size, players_per_team):
+    """Measure scorer table throughput with paired requests versus batched events."""
+    from app.bench import count_statements, logged_in_client, scorer_events, seed_game, seed_league
+    require_sqlite()
+    db.create_all()
+
+    league_id, season_id = seed_league(2, 0)
+    client = logged_in_client(league_id)
+
+    click.echo(f"{'mode':>8} {'events/s':>9} {'requests':>9} {'stmts':>7} {'commits':>8}")
+    for mode in ('paired', 'batched'):
+        game_id, rosters = seed_game(league_id, season_id, players_per_team)
+        events = scorer_events(rosters, event_count)
+        with count_statements() as counter:
+            start = time.perf_counter()
+            if mode == 'paired':
+                requests = replay_paired(client, game_id, events)
+            else:
+                requests = replay_batched(client, game_id, events, batch_size)
+            elapsed = time.perf_counter() - start
+        click.echo(f"{mode:>8} {event_count / elapsed:>9.0f} {requests:>9} {counter['count']:>7} {counter['commits']:>8}")
+
+
+@app.cli.command('check-queries')
+@click.option('--limit', default=10, help='Most statements any page may issue.')
+@click.option('--teams', 'team_count', default=12, help='Teams in the synthetic league.')
+@click.option('--players-per-team', default=10)
+def check_queries(limit, team_count, players_per_team):
+    """Render every page against a synthetic league and fail if one issues more than --limit statements."""
+    from app.bench import count_statements, request_page, seed_pages
+    require_sqlite()
+    db.create_all()
+
+    # Enough distinct teams, players and games that a lazy load per row cannot stay under the limit
+    client, pages = seed_pages(team_count, players_per_team)
+
+    app.config.update(TESTING=True, MAX_STATEMENTS_PER_REQUEST=limit)
+    failures = 0
+    click.echo(f"{'page':<32} {'status':>6} {'stmts':>6}")
+    for page in pages:
+        db.session.expire_all()
+        with count_statements() as counter:
+            try:
+                status = request_page(client, page).status_code
+            except StatementBudgetExceeded:
+                status = 'FAIL'
+                failures += 1
+        click.echo(f"{page:<32} {status:>6} {counter['count']:>6}")
+
+    if failures:
+        raise click.ClickException(f'{failures} pages issued more than {limit} statements.')
+
+
+@app.cli.command('explain-queries')
+@click.option('--scratch', is_flag=True, help='Allow a database other than SQLite; synthetic rows are written to it.')
+@click.option('--verbose', is_flag=True, help='Print the plan of every statement.')
+def explain_queries(scratch, verbose):
+    """EXPLAIN every SELECT the pages issue and fail if one scans a whole table."""
+    from app.bench import request_page, seed_pages
+    if not scratch:
+        require_sqlite()
+    db.create_all()
+    client, pages = seed_pages(12, 10)
+
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            captured.append((statement, parameters))
+
+    failures = 0
+    for page in pages:
+        captured.clear()
+        event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            request_page(client, page)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capture)
+
+        for statement, parameters in captured:
+            scans = full_table_scans(statement, parameters)
+            if scans:
+                failures += 1
+                click.echo(f"{page}: full scan of {', '.join(sorted(scans))}\n  {' '.join(statement.split())}")
+            if verbose:
+                for table, detail in explain(statement, parameters):
+                    click.echo(f'{page}: {table or ""} {detail}')
+
+    if failures:
+        raise click.ClickException(f'{failures} statements scan a whole table.')
+    click.echo(f'No full table scans in {len(pages)} pages.')
+
+
+@app.cli.command('bench')
+@click.option('--scale', default=1, help='Multiplies the number of leagues, e.g. 1, 10 or 100.')
+@click.option('--leagues', default=2, help='Leagues at scale 1.')
+@click.option('--seasons', default=2, help='Seasons per league.')
+@click.option('--teams', default=8, help='Teams per league.')
+@click.option('--players', default=10, help='Players per team.')
+@click.option('--games-per-team', default=10, help='Games each team plays per season.')
+@click.option('--events-per-game', default=120, help='Scorer events, and so GameLog rows, per game.')
+@click.option('--repeat', default=20, help='Timed requests per route.')
+@click.option('--seed', default=0)
+@click.option('--baseline', type=click.File('r'), help='Earlier bench output to compare p50 latency against.')
+@click.option('--output', type=click.File('w'), default='-', help='Where to write the JSON report.')
+@click.option('--scratch', is_flag=True, help='Allow a database other than SQLite, such as a local MySQL.')
+def bench(scale, leagues, seasons, teams, players, games_per_team, events_per_game, repeat, seed, baseline, output,
+          scratch):
+    """Time every route against a synthetic dataset and report p50/p95 latency and statements as JSON."""
+    from app.bench import UNTIMED_ENDPOINTS, bench_routes, generate_dataset, logged_in_client, route_requests
+    if not scratch:
+        require_sqlite()
+    db.create_all()
+
+    start = time.perf_counter()
+    rows = generate_dataset(leagues * scale, seasons, teams, players, games_per_team, events_per_game, seed)
+    generated_in = time.perf_counter() - start
+
+    # Routes are measured on the newest league; the others are history the queries must skip past
+    league_id = db.session.query(db.func.max(League.id)).scalar()
+    requests = route_requests(league_id)
+    results = bench_routes(logged_in_client(league_id), league_id, requests, repeat)
+
+    if baseline:
+        previous = json.load(baseline)['routes']
+        for name, result in results.items():
+            if name in previous and previous[name]['p50_ms']:
+                result['p50_vs_baseline'] = round(result['p50_ms'] / previous[name]['p50_ms'], 2)
+
+    timed = {bench_request.endpoint for bench_request in requests}
+    skipped = {rule.endpoint: UNTIMED_ENDPOINTS.get(rule.endpoint, 'no benchmark request defined')
+               for rule in app.url_map.iter_rules() if rule.endpoint not in timed}
+
+    report = {
+        'dataset': {'scale': scale, 'rows': rows, 'generated_seconds': round(generated_in, 2),
+                    'database': db.engine.url.get_backend_name()},
+        'repeat': repeat,
+        'routes': results,
+        'skipped': skipped,
+    }
+    output.write(json.dumps(report, indent=2) + '\n')
+
+
+@app.cli.command('load-test')
+@click.option('--url', help='Base URL of a running local server sharing this database; by default one is started.')
+@click.option('--games', 'game_counts', default='1,4,16', help='Comma separated numbers of simultaneous games, one stage each.')
+@click.option('--events-per-game', default=200)
+@click.option('--players-per-team', default=10)
+@click.option('--mode', type=click.Choice(['paired', 'batched']), default='paired',
+              help='paired replays update_boxscore + log_action per tap; batched posts to the events endpoint.')
+@click.option('--batch-size', default=5, help='Events per request in batched mode.')
+@click.option('--refresh-every', default=5, help='Taps between box score refreshes in paired mode.')
+@click.option('--output', type=click.File('w'), default='-', help='Where to write the JSON report.')
+@click.option('--scratch', is_flag=True, help='Allow a database other than SQLite, such as a local MySQL.')
+def load_test(url, game_counts, events_per_game, players_per_team, mode, batch_size, refresh_every, output, scratch):
+    """Replay concurrent scorekeepers against a server and check the final box scores."""
+    from app.load_test import LocalServer, run_stage
+    if not scratch:
+        require_sqlite()
+    if db.engine.url.database in (None, '', ':memory:'):
+        raise click.UsageError('The server and the harness must share a database file, e.g. DATABASE_URL=sqlite:///load.db')
+    db.create_all()
+
+    stages = []
+
+    def run(base_url):
+        for count in [int(n) for n in game_counts.split(',')]:
+            stage = run_stage(base_url, count, events_per_game, players_per_team, mode, batch_size, refresh_every)
+            click.echo(f"{count:>4} games: {stage['events_per_sec']:>8} events/s, error rate {stage['error_rate']:.2%}, "
+                       f"{'correct' if stage['correct'] else 'INCORRECT'}", err=True)
+            stages.append(stage)
+
+    if url:
+        run(url)
+    else:
+        with LocalServer() as server:
+            run(server.url)
+
+    output.write(json.dumps({'mode': mode, 'stages': stages}, indent=2) + '\n')
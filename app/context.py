@@ -0,0 +1,107 @@
+import threading
+import time
+from collections import namedtuple
+from flask import g, session
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app import db
+from app.models import League, Season
+
+# Plain snapshots rather than ORM objects, so cached values are safe to share between requests
+LeagueInfo = namedtuple('LeagueInfo', ['id', 'name'])
+SeasonInfo = namedtuple('SeasonInfo', ['id', 'name', 'start_date', 'end_date', 'league_id'])
+
+
+class LeagueSeasonCache:
+    """Process-wide league -> seasons cache, invalidated when a league or season is written.
+
+    The TTL only matters for changes made outside this process (another worker, a manual SQL edit).
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, league_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(league_id)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+        value = self._load(league_id)
+        with self._lock:
+            self._entries[league_id] = (now + self.ttl, value)
+        return value
+
+    def invalidate(self, league_id=None):
+        with self._lock:
+            if league_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(league_id, None)
+
+    @staticmethod
+    def _load(league_id):
+        league = db.session.get(League, league_id)
+        if league is None:
+            return None
+        seasons = Season.query.filter_by(league_id=league_id).order_by(Season.start_date.desc()).all()
+        return (
+            LeagueInfo(league.id, league.name),
+            tuple(SeasonInfo(s.id, s.name, s.start_date, s.end_date, s.league_id) for s in seasons)
+        )
+
+
+league_seasons = LeagueSeasonCache()
+
+
+class LeagueContext:
+    """The league being worked on and its seasons, newest first, resolved once per request."""
+
+    def __init__(self, league_id, cached):
+        self.league_id = league_id
+        self.league, self.seasons = cached if cached is not None else (None, ())
+
+    @property
+    def latest_season(self):
+        return self.seasons[0] if self.seasons else None
+
+    def season(self, season_id):
+        return next((season for season in self.seasons if season.id == season_id), None)
+
+
+def league_context(league_id=None):
+    # Defaults to the league selected in the session; cached on flask.g for the rest of the request
+    if league_id is None:
+        league_id = session.get('selected_league_id')
+    context = g.get('league_context')
+    if context is None or context.league_id != league_id:
+        context = LeagueContext(league_id, league_seasons.get(league_id) if league_id is not None else None)
+        g.league_context = context
+    return context
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_league_changes(session, flush_context):
+    # Remember which leagues had their league row or seasons written; they are invalidated once committed
+    changed = session.info.setdefault('changed_league_ids', set())
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(instance, Season):
+            # A season moved to another league invalidates both
+            changed.add(instance.league_id)
+            changed.update(inspect(instance).attrs.league_id.history.deleted)
+        elif isinstance(instance, League):
+            changed.add(instance.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_changed_leagues(session):
+    for league_id in session.info.pop('changed_league_ids', ()):
+        league_seasons.invalidate(league_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_league_changes(session):
+    session.info.pop('changed_league_ids', None)
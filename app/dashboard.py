@@ -0,0 +1,115 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from sqlalchemy import desc, func
+from sqlalchemy.orm import joinedload
+from app import app, db
+from app.models import BoxScore, Game, Player, Team
+from app.leaderboards import league_leaders
+from app.player_stats import top_scorers
+from app.rolling_form import hot_players
+from app.standings import load_standings
+
+
+class DashboardCache:
+    """League dashboard payloads per (league_id, season_id).
+
+    Writes that change a dashboard invalidate it in this process; the TTL bounds how stale another
+    worker process, or a change made outside those writes, can leave it.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # (league_id, season_id) -> (expires_at, payload)
+        self._lock = threading.Lock()
+
+    def get(self, league_id, season_id):
+        key = (league_id, season_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+
+    def put(self, league_id, season_id, payload):
+        ttl = app.config['DASHBOARD_CACHE_SECONDS']
+        if not ttl:
+            return
+        with self._lock:
+            self._entries[(league_id, season_id)] = (time.monotonic() + ttl, payload)
+            self._entries.move_to_end((league_id, season_id))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, league_id, season_id):
+        with self._lock:
+            self._entries.pop((league_id, season_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+dashboard_cache = DashboardCache()
+
+
+def _game_teams(game):
+    return {
+        'game_id': game.game_id,
+        'game_date': game.game_date,
+        'team1_name': game.team1.teamName,
+        'team2_name': game.team2.teamName,
+        'team_1_score': game.team_1_score,
+        'team_2_score': game.team_2_score,
+        'winner_name': game.winning_team.teamName if game.winning_team else None
+    }
+
+
+def dashboard_payload(league_id, season_id):
+    """Everything league_dashboard shows for a season, as plain values that can outlive the session."""
+    # Fetch games for the selected season and league
+    games_query = Game.query.options(
+        joinedload(Game.team1), joinedload(Game.team2), joinedload(Game.winning_team)
+    ).filter_by(season_id=season_id, league_id=league_id).order_by(Game.game_date.desc())
+
+    # Last game played
+    last_game = games_query.first()
+
+    mvp = None
+    if last_game:
+        mvp = db.session.query(
+            Player.firstName, Player.lastName, Team.teamName, func.sum(BoxScore.points).label('total_points')
+        ).select_from(BoxScore).join(Player, BoxScore.player_id == Player.playerID).join(Team, BoxScore.team_id == Team.teamID).filter(
+            BoxScore.game_id == last_game.game_id
+        ).group_by(Player.playerID, Team.teamID).order_by(desc('total_points')).first()
+
+    # Standings rows without the Team objects, which belong to this request's session
+    team_standings = [{key: value for key, value in row.items() if key != 'team'}
+                      for row in load_standings(league_id, season_id)]
+
+    # Upcoming games for the selected season
+    upcoming_games = games_query.filter(Game.game_date >= datetime.now()).all()
+
+    return {
+        'last_game': _game_teams(last_game) if last_game else None,
+        'mvp': dict(mvp._mapping) if mvp else None,
+        'team_standings': team_standings,
+        'top_scorers': [dict(row._mapping) for row in top_scorers(league_id, season_id)],
+        'leaders': league_leaders(league_id, season_id, limit=3),
+        'hot_players': hot_players(league_id, season_id),
+        'upcoming_games': [_game_teams(game) for game in upcoming_games]
+    }
+
+
+def league_dashboard_data(league_id, season_id):
+    payload = dashboard_cache.get(league_id, season_id)
+    if payload is None:
+        payload = dashboard_payload(league_id, season_id)
+        dashboard_cache.put(league_id, season_id, payload)
+    return payload
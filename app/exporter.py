@@ -0,0 +1,121 @@
+import csv
+import io
+import json
+import zlib
+from sqlalchemy import case, select
+from sqlalchemy.orm import aliased
+from app import db
+from app.models import BoxScore, Game, GameLog, Player, Season, Team
+from app.player_stats import STAT_COLUMNS
+
+# Rows fetched per round trip and written per chunk of the response
+EXPORT_BATCH = 1000
+
+FORMATS = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+
+
+def _box_scores(league_id, season_id):
+    # Named like the box score import, so an export can be loaded into another league as is
+    team = aliased(Team)
+    opponent = aliased(Team)
+    opponent_id = case((BoxScore.team_id == Game.team_1_id, Game.team_2_id), else_=Game.team_1_id)
+    query = select(
+        BoxScore.box_score_id, BoxScore.game_id, Game.game_date.label('date'), BoxScore.season_id,
+        team.teamName.label('team'), opponent.teamName.label('opponent'),
+        Player.jerseyNumber, Player.firstName, Player.lastName, BoxScore.player_id, BoxScore.team_id,
+        *[getattr(BoxScore, column) for column in STAT_COLUMNS]
+    ).join(Game, Game.game_id == BoxScore.game_id) \
+     .join(team, team.teamID == BoxScore.team_id) \
+     .outerjoin(opponent, opponent.teamID == opponent_id) \
+     .join(Player, Player.playerID == BoxScore.player_id) \
+     .where(BoxScore.league_id == league_id)
+    if season_id is not None:
+        query = query.where(BoxScore.season_id == season_id)
+    return query, BoxScore.box_score_id
+
+
+def _games(league_id, season_id):
+    team1 = aliased(Team)
+    team2 = aliased(Team)
+    winner = aliased(Team)
+    played = Game.scheduled_played == 'Played'
+    query = select(
+        Game.game_id, Game.game_date.label('date'), Season.name.label('season'),
+        team1.teamName.label('team1'), team2.teamName.label('team2'),
+        # Scheduled games store 0-0; the import reads blank scores as "not played yet"
+        case((played, Game.team_1_score)).label('team1_score'),
+        case((played, Game.team_2_score)).label('team2_score'),
+        Game.scheduled_played.label('status'), winner.teamName.label('winner'),
+        Game.season_id, Game.team_1_id, Game.team_2_id
+    ).join(team1, team1.teamID == Game.team_1_id) \
+     .join(team2, team2.teamID == Game.team_2_id) \
+     .outerjoin(winner, winner.teamID == Game.team_won) \
+     .outerjoin(Season, Season.id == Game.season_id) \
+     .where(Game.league_id == league_id)
+    if season_id is not None:
+        query = query.where(Game.season_id == season_id)
+    return query, Game.game_id
+
+
+def _game_logs(league_id, season_id):
+    query = select(
+        GameLog.gamelogid, GameLog.gameid.label('game_id'), GameLog.teamid.label('team_id'),
+        GameLog.playerid.label('player_id'), GameLog.actiontype, GameLog.action, GameLog.actiondesc,
+        GameLog.currenttimer, GameLog.gamelogdatetime
+    ).join(Game, Game.game_id == GameLog.gameid).where(Game.league_id == league_id)
+    if season_id is not None:
+        query = query.where(Game.season_id == season_id)
+    return query, GameLog.gamelogid
+
+
+# Each export is ordered by its first column, which is also its resume cursor
+EXPORTS = {
+    'box_scores': _box_scores,
+    'games': _games,
+    'game_logs': _game_logs,
+}
+
+
+def _json_value(value):
+    # Dates, datetimes and game clock times
+    return value.isoformat()
+
+
+def export_chunks(kind, league_id, season_id=None, after=None, file_format='csv'):
+    """Yield an export as text, one chunk per batch of rows, reading through a server-side cursor.
+
+    `after` resumes an interrupted export after the last id (the first column) that was received.
+    """
+    query, key = EXPORTS[kind](league_id, season_id)
+    if after is not None:
+        query = query.where(key > after)
+    result = db.session.execute(query.order_by(key).execution_options(yield_per=EXPORT_BATCH))
+    columns = list(result.keys())
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    if file_format == 'csv' and after is None:
+        writer.writerow(columns)
+
+    for rows in result.partitions():
+        if file_format == 'csv':
+            writer.writerows(rows)
+        else:
+            for row in rows:
+                buffer.write(json.dumps(dict(zip(columns, row)), default=_json_value) + '\n')
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzip_chunks(chunks):
+    """Compress text chunks into a gzip stream as they are produced."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 16 + 15 writes the gzip header and trailer
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
@@ -2,7 +2,7 @@
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, BooleanField, SubmitField, IntegerField, DecimalField, SelectField, DateField
 from wtforms.validators import DataRequired, Optional, Email, EqualTo, ValidationError
-from app.models import Team, User
+from app.models import User
 
 class LoginForm(FlaskForm):
     username = StringField('Username', validators=[DataRequired()])
@@ -67,12 +67,7 @@ class CreateGameForm(FlaskForm):
     gameDate = DateField('Select Date', format='%Y-%m-%d', validators=[DataRequired()])
     team1 = SelectField('Select Team 1', coerce=int, validators=[DataRequired()])
     team2 = SelectField('Select Team 2', coerce=int, validators=[DataRequired()])
-    submit = SubmitField('Start Game')
-
-    def __init__(self, *args, **kwargs):
-        super(CreateGameForm, self).__init__(*args, **kwargs)
-        self.team1.choices = [(team.teamID, team.teamName) for team in Team.query.all()]
-        self.team2.choices = [(team.teamID, team.teamName) for team in Team.query.all()]
+    submit = SubmitField('Start Game')  # Team choices are filled in by the view from the current league
 
 class CreateTeamForm(FlaskForm):
     teamName = StringField('Team Name', validators=[DataRequired()])
@@ -0,0 +1,236 @@
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import BoxScore, EventBatch, Game, GameLog, PlayerSeasonStats
+from app.player_stats import STAT_COLUMNS
+from app.render_cache import summary_cache
+from app.upserts import upsert
+
+# Largest batch the scorer page may send in a single request
+MAX_EVENTS_PER_BATCH = 100
+
+# Box score counters each scorer action adds to, applied in SQL as `column = column + n`
+ACTION_DELTAS = {
+    '2-Point Made': {'fga': 1, 'fgm': 1, 'points': 2},
+    '2-Point Miss': {'fga': 1},
+    '3-Point Made': {'fga': 1, 'fgm': 1, 'three_fga': 1, 'three_fgm': 1, 'points': 3},
+    '3-Point Miss': {'fga': 1, 'three_fga': 1},
+    'FT Made': {'fta': 1, 'ftm': 1, 'points': 1},
+    'FT Miss': {'fta': 1},
+    'Offensive Rebound': {'oreb': 1},
+    'Defensive Rebound': {'dreb': 1},
+    'Assist': {'assists': 1},
+    'Steal': {'steals': 1},
+    'Block': {'blocks': 1},
+    'Turnover': {'turnovers': 1},
+    'Foul': {'fouls': 1}
+}
+
+
+class EventError(ValueError):
+    pass
+
+
+def bump_box_score_version(game_id):
+    # Every box score write moves the game to a new version; on MySQL this also holds the game row
+    # lock until commit, so versions become visible in the order they were handed out
+    db.session.execute(
+        db.update(Game).where(Game.game_id == game_id).values(box_score_version=Game.box_score_version + 1)
+    )
+    summary_cache.invalidate(game_id)
+
+
+def add_box_score_deltas(game, team_id, player_id, league_id, season_id, deltas):
+    """Add counter deltas to a player's box score and season totals without reading either row first.
+
+    The caller bumps the game's box score version first; the row is stamped with it.
+    """
+    if not deltas:
+        return
+
+    version = db.select(Game.box_score_version).where(Game.game_id == game.game_id).scalar_subquery()
+    box_scores = BoxScore.__table__
+    upsert(
+        box_scores,
+        ['game_id', 'team_id', 'player_id'],
+        dict(
+            game_id=game.game_id,
+            team_id=team_id,
+            player_id=player_id,
+            league_id=league_id,
+            season_id=season_id,
+            date_played=game.game_date,  # Set date_played from game date
+            version=version,
+            **{column: deltas.get(column, 0) for column in STAT_COLUMNS}
+        ),
+        dict(version=version, **{column: box_scores.c[column] + n for column, n in deltas.items()})
+    )
+
+    # Games played is recounted from box_scores inside the same statement, so the first
+    # event of a game needs no separate "did the row exist" lookup
+    games_played = db.select(func.count()).select_from(box_scores).where(
+        box_scores.c.season_id == season_id,
+        box_scores.c.player_id == player_id,
+        box_scores.c.team_id == team_id
+    ).scalar_subquery()
+
+    season_stats = PlayerSeasonStats.__table__
+    upsert(
+        season_stats,
+        ['season_id', 'player_id', 'team_id'],
+        dict(
+            season_id=season_id,
+            player_id=player_id,
+            team_id=team_id,
+            league_id=league_id,
+            games_played=games_played,
+            **{column: deltas.get(column, 0) for column in STAT_COLUMNS}
+        ),
+        dict(games_played=games_played, **{column: season_stats.c[column] + n for column, n in deltas.items()})
+    )
+
+
+def record_action(game, team_id, player_id, action, league_id, season_id):
+    # Actions without counters (timer events and the like) leave the box score alone
+    if action in ACTION_DELTAS:
+        bump_box_score_version(game.game_id)
+        add_box_score_deltas(game, team_id, player_id, league_id, season_id, ACTION_DELTAS[action])
+
+
+def merge_duplicate_box_scores():
+    """Fold duplicate (game, team, player) box scores into the oldest row so the unique key can be added."""
+    duplicates = db.session.query(BoxScore.game_id, BoxScore.team_id, BoxScore.player_id) \
+        .group_by(BoxScore.game_id, BoxScore.team_id, BoxScore.player_id) \
+        .having(func.count() > 1).all()
+
+    for game_id, team_id, player_id in duplicates:
+        keep, *extra = BoxScore.query.filter_by(game_id=game_id, team_id=team_id, player_id=player_id) \
+            .order_by(BoxScore.box_score_id).all()
+        for row in extra:
+            for column in STAT_COLUMNS:
+                setattr(keep, column, getattr(keep, column) + getattr(row, column))
+            db.session.delete(row)
+    return len(duplicates)
+
+
+def parse_timer(value):
+    # The scorer page sends the game clock as 'HH:MM:SS'
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%H:%M:%S').time()
+    except (TypeError, ValueError):
+        raise EventError(f'Invalid timer value {value!r}.')
+
+
+def _optional_id(value, name):
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise EventError(f'Invalid {name} {value!r}.')
+
+
+def parse_log_row(data):
+    """Validate a single /log_action payload into GameLog column values.
+
+    Rows are written behind the request, so anything the database would reject is caught here instead.
+    """
+    if not isinstance(data, dict):
+        raise EventError('Expected a JSON object.')
+    game_id = _optional_id(data.get('gameid'), 'game id')
+    if game_id is None:
+        raise EventError('A game id is required.')
+    for key in ('actiontype', 'action'):
+        if data.get(key) is not None and (not isinstance(data[key], str) or len(data[key]) > 50):
+            raise EventError(f'Invalid {key} {data[key]!r}.')
+    return dict(
+        gameid=game_id,
+        teamid=_optional_id(data.get('teamid'), 'team id'),
+        playerid=_optional_id(data.get('playerid'), 'player id'),
+        actiontype=data.get('actiontype'),
+        action=data.get('action'),
+        actiondesc=data.get('actiondesc') if data.get('actiondesc') is None else str(data['actiondesc']),
+        currenttimer=parse_timer(data.get('currenttimer')),
+        gamelogdatetime=datetime.now()
+    )
+
+
+def parse_events(payload, game):
+    """Validate an ordered batch of scorer events posted as {'events': [...]}."""
+    events = payload.get('events') if isinstance(payload, dict) else None
+    if not isinstance(events, list) or not events:
+        raise EventError('Expected a non-empty list of events.')
+    if len(events) > MAX_EVENTS_PER_BATCH:
+        raise EventError(f'At most {MAX_EVENTS_PER_BATCH} events can be sent at once.')
+
+    for index, event in enumerate(events):
+        if not isinstance(event, dict) or not event.get('action'):
+            raise EventError(f'Event {index} has no action.')
+        if bool(event.get('team_id')) != bool(event.get('player_id')):
+            raise EventError(f'Event {index} must name both a team and a player, or neither.')
+        if event.get('team_id'):
+            try:
+                event['team_id'] = int(event['team_id'])
+                event['player_id'] = int(event['player_id'])
+            except (TypeError, ValueError):
+                raise EventError(f'Event {index} has an invalid team or player id.')
+            if event['team_id'] not in (game.team_1_id, game.team_2_id):
+                raise EventError(f'Event {index} names a team that is not playing this game.')
+        event['current_timer'] = parse_timer(event.get('current_timer'))
+    return events
+
+
+def parse_batch_id(payload):
+    # Optional: clients that send one get retries deduplicated, others are applied as they come
+    batch_id = payload.get('batch_id') if isinstance(payload, dict) else None
+    if batch_id is None:
+        return None
+    if not isinstance(batch_id, str) or not 0 < len(batch_id) <= 64:
+        raise EventError(f'Invalid batch id {batch_id!r}.')
+    return batch_id
+
+
+def claim_batch(game_id, batch_id):
+    """Record a batch id in the caller's transaction; False, with the transaction rolled back, if it was applied before.
+
+    The primary key makes a resend wait for the original to commit or roll back, so it cannot slip in twice.
+    """
+    db.session.add(EventBatch(batch_id=batch_id, game_id=game_id))
+    try:
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()
+        return False
+    return True
+
+
+def apply_events(game, events, league_id, season_id):
+    """Apply box score deltas and insert GameLog rows for a batch of events; the caller commits."""
+    # Deltas are summed per player first so the batch costs one upsert per player, not per event
+    deltas = {}
+    for event in events:
+        if event.get('player_id') and event['action'] in ACTION_DELTAS:
+            player_deltas = deltas.setdefault((event['team_id'], event['player_id']), {})
+            for column, n in ACTION_DELTAS[event['action']].items():
+                player_deltas[column] = player_deltas.get(column, 0) + n
+
+    if deltas:
+        bump_box_score_version(game.game_id)
+    for (team_id, player_id), player_deltas in deltas.items():
+        add_box_score_deltas(game, team_id, player_id, league_id, season_id, player_deltas)
+
+    log_entries = [GameLog(
+        gameid=game.game_id,
+        teamid=event.get('team_id'),
+        playerid=event.get('player_id'),
+        actiontype=event.get('action_type'),
+        action=event['action'],
+        actiondesc=event.get('action_desc'),
+        currenttimer=event.get('current_timer'),
+        gamelogdatetime=datetime.now()
+    ) for event in events]
+    db.session.add_all(log_entries)
+    return log_entries
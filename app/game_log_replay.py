@@ -0,0 +1,154 @@
+from collections import Counter, defaultdict, namedtuple
+from sqlalchemy import insert, select, update
+from app import db
+from app.game_events import ACTION_DELTAS
+from app.log_writer import game_log_writer
+from app.models import BoxScore, Game, GameLog
+from app.player_stats import STAT_COLUMNS
+from app.render_cache import summary_cache
+
+# GameLog rows fetched per round trip while streaming
+STREAM_BATCH = 1000
+
+# Games folded, diffed and rewritten per call; the CLI commits after each chunk
+GAMES_PER_CHUNK = 200
+
+# What a replay found, plus the seasons whose aggregates must be rebuilt afterwards:
+# box_score_seasons for player_season_stats, score_seasons as (league_id, season_id) for standings
+Replay = namedtuple('Replay', ['counts', 'box_score_seasons', 'score_seasons'])
+
+ZERO = dict.fromkeys(STAT_COLUMNS, 0)
+
+
+def fold_game_log(game_ids):
+    """Box score counters per (game, team, player) from one streamed pass over the games' log rows.
+
+    Returns the counters, the set of games that have any log rows at all and the number of rows read.
+    """
+    totals = defaultdict(lambda: dict(ZERO))
+    logged_games = set()
+    events = 0
+
+    # yield_per streams with a server-side cursor where the driver has one; only the running sums are kept
+    rows = db.session.execute(
+        select(GameLog.gameid, GameLog.teamid, GameLog.playerid, GameLog.action)
+        .where(GameLog.gameid.in_(game_ids))
+        .execution_options(yield_per=STREAM_BATCH)
+    )
+    for game_id, team_id, player_id, action in rows:
+        events += 1
+        logged_games.add(game_id)
+        deltas = ACTION_DELTAS.get(action)
+        if deltas and team_id and player_id:
+            counters = totals[(game_id, team_id, player_id)]
+            for column, n in deltas.items():
+                counters[column] += n
+    return totals, logged_games, events
+
+
+def replay_game_log(game_ids, dry_run=False):
+    """Rewrite the box scores and final scores of `game_ids` that disagree with their game log.
+
+    Games without any log rows predate the log and are left alone, as are games whose rows are still queued
+    in this process's log writer. The caller commits and rebuilds the season aggregates named in the result.
+    """
+    counts = Counter(games=len(game_ids))
+    box_score_seasons = set()
+    score_seasons = set()
+
+    # Their log is not complete in the table yet, so replaying it now would undo committed stats
+    queued_games = game_log_writer.pending_games().intersection(game_ids)
+    if queued_games:
+        counts['queued_log_games'] = len(queued_games)
+        game_ids = [game_id for game_id in game_ids if game_id not in queued_games]
+
+    totals, logged_games, counts['events'] = fold_game_log(game_ids)
+    if not logged_games:
+        return Replay(counts, box_score_seasons, score_seasons)
+    counts['logged_games'] = len(logged_games)
+
+    games = {row.game_id: row for row in db.session.execute(
+        select(Game.game_id, Game.team_1_id, Game.team_2_id, Game.team_1_score, Game.team_2_score,
+               Game.scheduled_played, Game.league_id, Game.season_id, Game.game_date, Game.box_score_version)
+        .where(Game.game_id.in_(logged_games))
+    )}
+
+    team_points = Counter()
+    for (game_id, team_id, player_id), counters in totals.items():
+        team_points[(game_id, team_id)] += counters['points']
+
+    # Changed games move to the next box score version so live pages and ETags pick up the rewrite
+    def next_version(game_id):
+        return games[game_id].box_score_version + 1
+
+    # Diff the stored rows against the fold; a stored row the log never mentions should be all zeros
+    changed_games = set()
+    box_score_updates = []
+    stored = db.session.execute(
+        select(BoxScore.box_score_id, BoxScore.game_id, BoxScore.team_id, BoxScore.player_id, BoxScore.season_id,
+               *[getattr(BoxScore, column) for column in STAT_COLUMNS])
+        .where(BoxScore.game_id.in_(logged_games))
+    ).mappings()
+    for row in stored:
+        expected = totals.pop((row['game_id'], row['team_id'], row['player_id']), ZERO)
+        if any(row[column] != expected[column] for column in STAT_COLUMNS):
+            box_score_updates.append(dict(box_score_id=row['box_score_id'], version=next_version(row['game_id']),
+                                          **expected))
+            changed_games.add(row['game_id'])
+            box_score_seasons.add(row['season_id'])
+
+    # Whatever is left in the fold has no stored row at all
+    box_score_inserts = []
+    for (game_id, team_id, player_id), counters in totals.items():
+        game = games[game_id]
+        if game.league_id is None or game.season_id is None:
+            counts['unplaceable_box_scores'] += 1
+            continue
+        box_score_inserts.append(dict(
+            game_id=game_id, team_id=team_id, player_id=player_id, league_id=game.league_id,
+            season_id=game.season_id, date_played=game.game_date, version=next_version(game_id), **counters
+        ))
+        changed_games.add(game_id)
+        box_score_seasons.add(game.season_id)
+
+    game_updates = {game_id: dict(game_id=game_id, box_score_version=next_version(game_id))
+                    for game_id in changed_games}
+
+    # Final scores are only stored once a game has been ended
+    for game in games.values():
+        if game.scheduled_played != 'Played':
+            continue
+        team_1_score = team_points[(game.game_id, game.team_1_id)]
+        team_2_score = team_points[(game.game_id, game.team_2_id)]
+        if (team_1_score, team_2_score) == (game.team_1_score, game.team_2_score):
+            continue
+        if team_1_score > team_2_score:
+            team_won = game.team_1_id
+        elif team_2_score > team_1_score:
+            team_won = game.team_2_id
+        else:
+            team_won = None
+        # A score-only correction moves the version too: the summary cache key and ETag of every worker use it
+        game_updates.setdefault(game.game_id, dict(game_id=game.game_id)).update(
+            box_score_version=next_version(game.game_id),
+            team_1_score=team_1_score, team_2_score=team_2_score, team_won=team_won)
+        counts['scores_updated'] += 1
+        if game.league_id is not None and game.season_id is not None:
+            score_seasons.add((game.league_id, game.season_id))
+
+    counts['box_scores_updated'] = len(box_score_updates)
+    counts['box_scores_inserted'] = len(box_score_inserts)
+    counts['games_changed'] = len(game_updates)
+
+    # ORM bulk UPDATE by primary key and bulk INSERT, one executemany each
+    if not dry_run:
+        if box_score_updates:
+            db.session.execute(update(BoxScore), box_score_updates)
+        if box_score_inserts:
+            db.session.execute(insert(BoxScore), box_score_inserts)
+        if game_updates:
+            db.session.execute(update(Game), list(game_updates.values()))
+        # Only reaches this process; other processes see the new version instead
+        for game_id in game_updates:
+            summary_cache.invalidate(game_id)
+    return Replay(counts, box_score_seasons, score_seasons)
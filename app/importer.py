@@ -0,0 +1,390 @@
+import csv
+import io
+import json
+import time
+from datetime import date
+from sqlalchemy import insert, select, update
+from app import db
+from app.dashboard import dashboard_cache
+from app.models import BoxScore, Game, Player, Season, Team
+from app.player_stats import STAT_COLUMNS, rebuild_player_season_stats
+from app.render_cache import summary_cache
+from app.rolling_form import rebuild_form
+from app.standings import rebuild_standings
+
+# Rows validated and inserted per transaction
+CHUNK_ROWS = 1000
+
+# Row errors kept for the report; the rest are only counted
+MAX_REPORTED_ERRORS = 50
+
+
+class RowError(ValueError):
+    """A row that cannot be imported; the row is skipped and reported."""
+
+
+def read_rows(stream, file_format):
+    """Yield (line number, dict) from a CSV or JSON-lines text stream, one row at a time."""
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif file_format == 'jsonl':
+        for number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield number, None
+                continue
+            yield number, row
+    else:
+        raise ValueError(f'Unsupported import format {file_format!r}.')
+
+
+def format_for(filename):
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def text_stream(binary):
+    # Uploads and files opened in binary mode are decoded as they are read
+    return io.TextIOWrapper(binary, encoding='utf-8-sig', newline='')
+
+
+def _value(row, name, required=False):
+    value = row.get(name)
+    if isinstance(value, str):
+        value = value.strip()
+    if value in (None, ''):
+        if required:
+            raise RowError(f'{name} is required.')
+        return None
+    return value
+
+
+def _text(row, name, required=False, max_length=100):
+    value = _value(row, name, required)
+    if value is not None:
+        value = str(value)
+        if len(value) > max_length:
+            raise RowError(f'{name} is longer than {max_length} characters.')
+    return value
+
+
+def _int(row, name, required=False):
+    value = _value(row, name, required)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise RowError(f'{name} must be a whole number, not {value!r}.')
+
+
+def _float(row, name):
+    value = _value(row, name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise RowError(f'{name} must be a number, not {value!r}.')
+
+
+def _date(row, name):
+    value = _value(row, name, required=True)
+    try:
+        return date.fromisoformat(str(value))
+    except ValueError:
+        raise RowError(f'{name} must be a YYYY-MM-DD date, not {value!r}.')
+
+
+class RowImporter:
+    """Validates rows of one kind for a league and bulk inserts the valid ones."""
+
+    model = None
+
+    def __init__(self, league_id):
+        self.league_id = league_id
+        self.seasons = set()  # Seasons whose aggregates must be rebuilt afterwards
+        self.load()
+
+    def load(self):
+        """Read the lookups the rows refer to, once per import."""
+
+    def validate(self, row):
+        """Column values for one row, or RowError."""
+        raise NotImplementedError
+
+    def insert(self, rows):
+        db.session.execute(insert(self.model), rows)
+
+    def finish(self):
+        """Rebuild whatever is derived from the imported rows."""
+
+    def _team_ids(self):
+        return {name.lower(): team_id for team_id, name in db.session.execute(
+            select(Team.teamID, Team.teamName).where(Team.league_id == self.league_id))}
+
+    def _season_ids(self):
+        return {name.lower(): season_id for season_id, name in db.session.execute(
+            select(Season.id, Season.name).where(Season.league_id == self.league_id))}
+
+    def _team(self, row, name):
+        team = _text(row, name, required=True)
+        try:
+            return self.teams[team.lower()]
+        except KeyError:
+            raise RowError(f'{name} {team!r} is not a team of this league.')
+
+    def _season(self, row):
+        season = _text(row, 'season', required=True)
+        try:
+            return self.season_ids[season.lower()]
+        except KeyError:
+            raise RowError(f'season {season!r} is not a season of this league.')
+
+
+class TeamImporter(RowImporter):
+    model = Team
+
+    def load(self):
+        self.teams = self._team_ids()
+
+    def validate(self, row):
+        name = _text(row, 'teamName', required=True)
+        if name.lower() in self.teams:
+            raise RowError(f'Team {name!r} already exists.')
+        values = dict(
+            teamName=name,
+            teamDivision=_text(row, 'teamDivision'),
+            teamCaptain=_text(row, 'teamCaptain'),
+            contactnumber=_text(row, 'contactnumber', max_length=15),
+            contactemail=_text(row, 'contactemail'),
+            league_id=self.league_id
+        )
+        self.teams[name.lower()] = None
+        return values
+
+
+class PlayerImporter(RowImporter):
+    model = Player
+
+    def load(self):
+        self.teams = self._team_ids()
+        self.jerseys = set(db.session.execute(
+            select(Player.teamID, Player.jerseyNumber).where(Player.teamID.in_(list(self.teams.values())))
+        ).tuples())
+
+    def validate(self, row):
+        team_id = self._team(row, 'team')
+        jersey = _int(row, 'jerseyNumber', required=True)
+        if (team_id, jersey) in self.jerseys:
+            raise RowError(f'Jersey {jersey} is already taken on {row["team"]}.')
+        values = dict(
+            firstName=_text(row, 'firstName', required=True),
+            lastName=_text(row, 'lastName', required=True),
+            jerseyNumber=jersey,
+            age=_int(row, 'age'),
+            phoneNumber=_text(row, 'phoneNumber', max_length=15),
+            email=_text(row, 'email'),
+            position=_text(row, 'position', max_length=50),
+            weight=_float(row, 'weight'),
+            height=_float(row, 'height'),
+            countryOfOrigin=_text(row, 'countryOfOrigin'),
+            teamID=team_id
+        )
+        self.jerseys.add((team_id, jersey))
+        return values
+
+
+class GameImporter(RowImporter):
+    """Scheduled games, or played ones when both scores are given."""
+
+    model = Game
+
+    def load(self):
+        self.teams = self._team_ids()
+        self.season_ids = self._season_ids()
+        # Box scores find their game by date and the pair of teams, so home/away order does not tell games apart
+        self.games = {(game_date, frozenset((team_1_id, team_2_id))) for game_date, team_1_id, team_2_id in
+                      db.session.execute(select(Game.game_date, Game.team_1_id, Game.team_2_id)
+                                         .where(Game.league_id == self.league_id))}
+
+    def validate(self, row):
+        game_date = _date(row, 'date')
+        team_1_id = self._team(row, 'team1')
+        team_2_id = self._team(row, 'team2')
+        if team_1_id == team_2_id:
+            raise RowError('team1 and team2 must be different teams.')
+        if (game_date, frozenset((team_1_id, team_2_id))) in self.games:
+            raise RowError('These teams already play each other on this date.')
+        season_id = self._season(row)
+
+        team_1_score = _int(row, 'team1_score')
+        team_2_score = _int(row, 'team2_score')
+        if (team_1_score is None) != (team_2_score is None):
+            raise RowError('Give both scores or neither.')
+
+        values = dict(game_date=game_date, team_1_id=team_1_id, team_2_id=team_2_id, team_1_score=0, team_2_score=0,
+                      team_won=None, scheduled_played='Scheduled', league_id=self.league_id, season_id=season_id)
+        if team_1_score is not None:
+            values.update(team_1_score=team_1_score, team_2_score=team_2_score, scheduled_played='Played')
+            if team_1_score != team_2_score:
+                values['team_won'] = team_1_id if team_1_score > team_2_score else team_2_id
+            self.seasons.add(season_id)
+        self.games.add((game_date, frozenset((team_1_id, team_2_id))))
+        return values
+
+    def finish(self):
+        for season_id in sorted(self.seasons):
+            rebuild_standings(self.league_id, season_id)
+            rebuild_form(season_id)
+            dashboard_cache.invalidate(self.league_id, season_id)
+
+
+class BoxScoreImporter(RowImporter):
+    """Historical box scores, one row per player and game, matched to games by date and teams."""
+
+    model = BoxScore
+
+    def load(self):
+        self.teams = self._team_ids()
+        self.players = {(team_id, jersey): player_id for player_id, team_id, jersey in db.session.execute(
+            select(Player.playerID, Player.teamID, Player.jerseyNumber)
+            .where(Player.teamID.in_(list(self.teams.values()))))}
+        self.games = {}
+        for game_id, game_date, team_1_id, team_2_id, season_id in db.session.execute(
+                select(Game.game_id, Game.game_date, Game.team_1_id, Game.team_2_id, Game.season_id)
+                .where(Game.league_id == self.league_id)):
+            self.games[(game_date, frozenset((team_1_id, team_2_id)))] = (game_id, season_id)
+        self.seen = set()
+
+    def validate(self, row):
+        game_date = _date(row, 'date')
+        team_id = self._team(row, 'team')
+        opponent_id = self._team(row, 'opponent')
+        game = self.games.get((game_date, frozenset((team_id, opponent_id))))
+        if game is None:
+            raise RowError(f'No game between {row["team"]} and {row["opponent"]} on {game_date}.')
+        game_id, season_id = game
+        if season_id is None:
+            raise RowError('The game has no season.')
+
+        jersey = _int(row, 'jerseyNumber', required=True)
+        player_id = self.players.get((team_id, jersey))
+        if player_id is None:
+            raise RowError(f'{row["team"]} has no player with jersey {jersey}.')
+        if (game_id, team_id, player_id) in self.seen:
+            raise RowError('This player already has a box score for the game.')
+        self.seen.add((game_id, team_id, player_id))
+
+        counters = {column: _int(row, column) or 0 for column in STAT_COLUMNS}
+        if counters['fgm'] > counters['fga'] or counters['three_fgm'] > counters['three_fga'] \
+                or counters['ftm'] > counters['fta'] or counters['three_fga'] > counters['fga']:
+            raise RowError('Made shots cannot exceed attempts.')
+        self.seasons.add(season_id)
+        return dict(game_id=game_id, team_id=team_id, player_id=player_id, league_id=self.league_id,
+                    season_id=season_id, date_played=game_date, **counters)
+
+    def insert(self, rows):
+        # Rows already stored for these games are left alone rather than failing the whole chunk
+        game_ids = {row['game_id'] for row in rows}
+        stored = set(db.session.execute(
+            select(BoxScore.game_id, BoxScore.team_id, BoxScore.player_id).where(BoxScore.game_id.in_(game_ids))
+        ).tuples())
+        new_rows = [row for row in rows if (row['game_id'], row['team_id'], row['player_id']) not in stored]
+        if new_rows:
+            db.session.execute(insert(BoxScore), new_rows)
+            db.session.execute(update(Game).where(Game.game_id.in_(game_ids))
+                               .values(box_score_version=Game.box_score_version + 1))
+            for game_id in game_ids:
+                summary_cache.invalidate(game_id)
+        return len(rows) - len(new_rows)
+
+    def finish(self):
+        for season_id in sorted(self.seasons):
+            rebuild_player_season_stats(season_id)
+            rebuild_form(season_id)
+            dashboard_cache.invalidate(self.league_id, season_id)
+
+
+IMPORTERS = {
+    'teams': TeamImporter,
+    'players': PlayerImporter,
+    'games': GameImporter,
+    'box_scores': BoxScoreImporter,
+}
+
+
+class ImportResult:
+    def __init__(self, kind):
+        self.kind = kind
+        self.rows = 0
+        self.inserted = 0
+        self.skipped = 0
+        self.errors = []  # (line number, message), the first MAX_REPORTED_ERRORS only
+        self.seconds = 0.0
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def reject(self, line, message):
+        self.skipped += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    def as_dict(self):
+        return {
+            'kind': self.kind,
+            'rows': self.rows,
+            'inserted': self.inserted,
+            'skipped': self.skipped,
+            'errors': [{'line': line, 'message': message} for line, message in self.errors],
+            'seconds': round(self.seconds, 3),
+            'rows_per_sec': round(self.rows_per_sec, 1)
+        }
+
+
+def import_rows(kind, rows, league_id, chunk_rows=CHUNK_ROWS, progress=None):
+    """Validate and insert (line, dict) rows of one kind into a league, committing every chunk_rows rows.
+
+    Invalid rows are skipped and reported; progress, if given, is called with the result after each chunk.
+    """
+    importer = IMPORTERS[kind](league_id)
+    result = ImportResult(kind)
+    start = time.perf_counter()
+
+    chunk = []
+
+    def flush():
+        skipped = importer.insert(chunk) or 0
+        db.session.commit()
+        result.inserted += len(chunk) - skipped
+        result.skipped += skipped
+        chunk.clear()
+        result.seconds = time.perf_counter() - start
+        if progress is not None:
+            progress(result)
+
+    for line, row in rows:
+        result.rows += 1
+        if not isinstance(row, dict):
+            result.reject(line, 'Not a JSON object.')
+            continue
+        try:
+            chunk.append(importer.validate(row))
+        except RowError as e:
+            result.reject(line, str(e))
+            continue
+        if len(chunk) >= chunk_rows:
+            flush()
+    if chunk:
+        flush()
+
+    importer.finish()
+    db.session.commit()
+    result.seconds = time.perf_counter() - start
+    return result
@@ -0,0 +1,96 @@
+import heapq
+from app import db
+from app.models import Player, PlayerSeasonStats, Team
+from app.player_stats import STAT_COLUMNS
+
+DEFAULT_LIMIT = 5
+MAX_LIMIT = 25
+
+MODES = ('totals', 'per_game')
+
+# Counting categories: label and how the value is read off a season stats row
+COUNTING = {
+    'points': ('Points', lambda row: row.points),
+    'rebounds': ('Rebounds', lambda row: row.oreb + row.dreb),
+    'offensive_rebounds': ('Offensive Rebounds', lambda row: row.oreb),
+    'defensive_rebounds': ('Defensive Rebounds', lambda row: row.dreb),
+    'assists': ('Assists', lambda row: row.assists),
+    'steals': ('Steals', lambda row: row.steals),
+    'blocks': ('Blocks', lambda row: row.blocks),
+    'threes': ('3-Pointers Made', lambda row: row.three_fgm),
+    'turnovers': ('Turnovers', lambda row: row.turnovers),
+    'fouls': ('Fouls', lambda row: row.fouls),
+}
+
+# Shooting categories: label, made and attempted counters, and the attempts per game that qualify a player
+SHOOTING = {
+    'fg_pct': ('FG%', 'fgm', 'fga', 1.0),
+    'three_pct': ('3P%', 'three_fgm', 'three_fga', 0.5),
+    'ft_pct': ('FT%', 'ftm', 'fta', 0.5),
+}
+
+CATEGORIES = list(COUNTING) + list(SHOOTING)
+
+
+def _season_rows(league_id, season_id):
+    # The one scan: every player's season totals with the names the boards show
+    return db.session.query(
+        PlayerSeasonStats.player_id, PlayerSeasonStats.team_id, PlayerSeasonStats.games_played,
+        *[getattr(PlayerSeasonStats, column) for column in STAT_COLUMNS],
+        Player.firstName, Player.lastName, Team.teamName
+    ).join(Player, PlayerSeasonStats.player_id == Player.playerID) \
+     .join(Team, PlayerSeasonStats.team_id == Team.teamID) \
+     .filter(
+        PlayerSeasonStats.season_id == season_id,
+        PlayerSeasonStats.league_id == league_id,
+        PlayerSeasonStats.games_played > 0
+    ).all()
+
+
+def _entry(row, value):
+    return {
+        'player_id': row.player_id,
+        'firstName': row.firstName,
+        'lastName': row.lastName,
+        'team_id': row.team_id,
+        'teamName': row.teamName,
+        'games': row.games_played,
+        'value': value,
+    }
+
+
+def _top(rows, value, limit):
+    # Highest value first; ties go to the player with fewer games, then the lower id, so boards are stable.
+    # Nobody leads with nothing: players without a value or at zero stay off the board
+    ranked = ((value(row), row) for row in rows)
+    ranked = [(score, row) for score, row in ranked if score]
+    leaders = heapq.nsmallest(limit, ranked, key=lambda item: (-item[0], item[1].games_played, item[1].player_id))
+    return [_entry(row, round(score, 1) if isinstance(score, float) else score) for score, row in leaders]
+
+
+def league_leaders(league_id, season_id, limit=DEFAULT_LIMIT):
+    """Top `limit` players of every category, as totals and per game, from a single scan of the season aggregates.
+
+    Shooting percentages are the same in both modes and only rank players averaging enough attempts, counted
+    against the most games anyone has played this season.
+    """
+    rows = _season_rows(league_id, season_id)
+    season_games = max((row.games_played for row in rows), default=0)
+
+    leaders = {}
+    for category, (label, total) in COUNTING.items():
+        leaders[category] = {
+            'label': label,
+            'totals': _top(rows, total, limit),
+            'per_game': _top(rows, lambda row, total=total: total(row) / row.games_played, limit),
+        }
+    for category, (label, made, attempted, attempts_per_game) in SHOOTING.items():
+        minimum = max(1, attempts_per_game * season_games)
+
+        def percentage(row, made=made, attempted=attempted, minimum=minimum):
+            attempts = getattr(row, attempted)
+            return getattr(row, made) * 100.0 / attempts if attempts >= minimum else None
+
+        board = _top(rows, percentage, limit)
+        leaders[category] = {'label': label, 'totals': board, 'per_game': board}
+    return leaders
@@ -0,0 +1,149 @@
+import json
+import queue
+import threading
+from collections import defaultdict
+from app import db
+from app.models import BoxScore, Player
+from app.player_stats import STAT_COLUMNS
+
+# Seconds between keep-alive comments on an idle stream
+HEARTBEAT_SECONDS = 15
+
+
+class GameBroadcaster:
+    """Fans live game updates out to every stream subscribed to that game in this process."""
+
+    def __init__(self, max_pending=256):
+        self.max_pending = max_pending
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, game_id):
+        subscription = queue.Queue(maxsize=self.max_pending)
+        with self._lock:
+            self._subscribers[game_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, game_id, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(game_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[game_id]
+
+    def is_subscribed(self, game_id, subscription):
+        with self._lock:
+            return subscription in self._subscribers.get(game_id, ())
+
+    def subscriber_count(self, game_id):
+        with self._lock:
+            return len(self._subscribers.get(game_id, ()))
+
+    def publish(self, game_id, event, data):
+        with self._lock:
+            subscribers = list(self._subscribers.get(game_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.put_nowait((event, data))
+            except queue.Full:
+                # A browser that stopped reading is cut loose; it resyncs from a fresh snapshot on reconnect
+                self.unsubscribe(game_id, subscription)
+
+
+broadcaster = GameBroadcaster()
+
+
+def format_sse(event, data):
+    return f'event: {event}\ndata: {json.dumps(data, default=str)}\n\n'
+
+
+# Field order of the compact rows returned by refresh_box_scores?since=
+ROW_COLUMNS = ['player_id', 'team_id', 'name', 'jersey', 'version'] + STAT_COLUMNS
+
+
+def box_score_rows(game_id, player_ids=None, since=None):
+    # Box score rows with the player fields the tables display, in one query
+    query = db.session.query(BoxScore, Player.firstName, Player.lastName, Player.jerseyNumber) \
+        .join(Player, BoxScore.player_id == Player.playerID) \
+        .filter(BoxScore.game_id == game_id)
+    if player_ids is not None:
+        query = query.filter(BoxScore.player_id.in_(player_ids))
+    if since is not None:
+        query = query.filter(BoxScore.version > since)
+
+    return [dict(
+        player_id=box.player_id,
+        team_id=box.team_id,
+        name=f'{first_name[0]}. {last_name}',
+        jersey=jersey_number,
+        version=box.version,
+        **{column: getattr(box, column) for column in STAT_COLUMNS}
+    ) for box, first_name, last_name, jersey_number in query.order_by(BoxScore.box_score_id).all()]
+
+
+def log_entry_payload(entry):
+    return {
+        'id': entry.gamelogid,
+        'team_id': entry.teamid,
+        'player_id': entry.playerid,
+        'action': entry.action,
+        'description': entry.actiondesc,
+        'timer': entry.currenttimer.strftime('%H:%M:%S') if entry.currenttimer else None
+    }
+
+
+def game_snapshot(game):
+    return {
+        'game_id': game.game_id,
+        'status': game.scheduled_played,
+        'version': game.box_score_version,
+        'team1_id': game.team_1_id,
+        'team2_id': game.team_2_id,
+        'rows': box_score_rows(game.game_id)
+    }
+
+
+def publish_box_scores(game_id, player_ids):
+    # Changed rows are read back once per write and shared by every subscriber; nobody watching costs nothing
+    if not player_ids or not broadcaster.subscriber_count(game_id):
+        return
+    broadcaster.publish(game_id, 'boxscore', {'rows': box_score_rows(game_id, list(player_ids))})
+
+
+def publish_log_entries(game_id, entries):
+    if entries and broadcaster.subscriber_count(game_id):
+        broadcaster.publish(game_id, 'log', {'entries': [log_entry_payload(entry) for entry in entries]})
+
+
+def publish_final(game):
+    broadcaster.publish(game.game_id, 'final', {
+        'team_1_score': game.team_1_score,
+        'team_2_score': game.team_2_score,
+        'team_won': game.team_won
+    })
+
+
+def stream_game(game_id, subscription, snapshot, heartbeat=HEARTBEAT_SECONDS):
+    """Generator behind /games/<id>/stream: the snapshot first, then every update published for the game."""
+    try:
+        yield format_sse('snapshot', snapshot)
+        while True:
+            try:
+                event, data = subscription.get_nowait()
+            except queue.Empty:
+                # Caught up; a subscriber dropped for falling behind resyncs now instead of after a heartbeat
+                if not broadcaster.is_subscribed(game_id, subscription):
+                    yield format_sse('resync', {})
+                    return
+                try:
+                    event, data = subscription.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+
+            yield format_sse(event, data)
+            if event == 'final':
+                return
+    finally:
+        broadcaster.unsubscribe(game_id, subscription)
@@ -0,0 +1,211 @@
+import http.client
+import json
+import logging
+import threading
+import time
+from datetime import date
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from sqlalchemy import func
+from werkzeug.serving import make_server
+from app import app, db
+from app.bench import seed_league, seed_rosters, scorer_events, logged_in_client, percentile
+from app.game_events import ACTION_DELTAS
+from app.log_writer import game_log_writer
+from app.models import BoxScore, Game, GameLog, Player, Team
+from app.player_stats import STAT_COLUMNS
+
+
+def seed_game_day(game_count, players_per_team):
+    """A league whose teams are all in progress at once: `game_count` ongoing games between distinct rosters."""
+    league_id, season_id = seed_league(game_count * 2, 0)
+    seed_rosters(league_id, players_per_team)
+    teams = Team.query.filter_by(league_id=league_id).order_by(Team.teamID).all()
+    roster = defaultdict(list)
+    for player in Player.query.filter(Player.teamID.in_([team.teamID for team in teams])).all():
+        roster[player.teamID].append(player.playerID)
+
+    games = []
+    for team1, team2 in zip(teams[::2], teams[1::2]):
+        game = Game(game_date=date.today(), team_1_id=team1.teamID, team_2_id=team2.teamID,
+                    league_id=league_id, season_id=season_id, scheduled_played='Ongoing')
+        db.session.add(game)
+        games.append((game, {team1.teamID: roster[team1.teamID], team2.teamID: roster[team2.teamID]}))
+    db.session.commit()
+    return league_id, [(game.game_id, rosters) for game, rosters in games]
+
+
+def session_cookie(league_id):
+    # Sign the session a logged-in scorer would hold, so the harness needs no login form round trip
+    client = logged_in_client(league_id)
+    with client.session_transaction() as session:
+        data = dict(session)
+    return app.session_interface.get_signing_serializer(app).dumps(data)
+
+
+class LocalServer:
+    """The app served by a threaded Werkzeug server on a free local port, for runs without --url."""
+
+    def __init__(self):
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        # One access log line per request would drown the report
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.thread.join()
+
+
+class Scorer:
+    """One scorekeeper replaying a game's events over its own keep-alive connection."""
+
+    def __init__(self, url, cookie, game_id, events, mode, batch_size, refresh_every):
+        parts = urlsplit(url)
+        self.connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+        self.headers = {'Cookie': f'{app.config["SESSION_COOKIE_NAME"]}={cookie}', 'Content-Type': 'application/json'}
+        self.game_id = game_id
+        self.events = events
+        self.mode = mode
+        self.batch_size = batch_size
+        self.refresh_every = refresh_every
+        self.etag = None
+        self.latencies = defaultdict(list)  # endpoint -> ms
+        self.errors = defaultdict(int)
+        self.error_samples = []
+
+    def request(self, endpoint, method, path, body=None):
+        headers = dict(self.headers)
+        if endpoint == 'refresh_box_scores' and self.etag:
+            headers['If-None-Match'] = self.etag
+        start = time.perf_counter()
+        try:
+            self.connection.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+            response = self.connection.getresponse()
+            payload = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            self.connection.close()
+            self.fail(endpoint, repr(e))
+            return
+        self.latencies[endpoint].append((time.perf_counter() - start) * 1000)
+
+        if response.status == 304:
+            return
+        if response.status >= 400:
+            self.fail(endpoint, f'HTTP {response.status}')
+            return
+        if endpoint == 'refresh_box_scores':
+            self.etag = response.getheader('ETag')
+        elif response.getheader('Content-Type', '').startswith('application/json'):
+            status = json.loads(payload).get('status')
+            if status != 'success':
+                self.fail(endpoint, payload.decode()[:200])
+
+    def fail(self, endpoint, detail):
+        self.errors[endpoint] += 1
+        if len(self.error_samples) < 5:
+            self.error_samples.append(f'{endpoint}: {detail}')
+
+    def run(self):
+        if self.mode == 'batched':
+            for start in range(0, len(self.events), self.batch_size):
+                self.request('game_events', 'POST', f'/games/{self.game_id}/events',
+                             {'events': self.events[start:start + self.batch_size]})
+                self.request('refresh_box_scores', 'GET', f'/refresh_box_scores/{self.game_id}')
+        else:
+            # The scorer page before batching: a box score write and a log write per tap, polling in between
+            for number, event in enumerate(self.events, 1):
+                self.request('update_boxscore', 'POST', '/update_boxscore', {
+                    'game_id': self.game_id, 'team_id': event['team_id'], 'player_id': event['player_id'],
+                    'action': event['action']})
+                self.request('log_action', 'POST', '/log_action', {
+                    'gameid': self.game_id, 'teamid': event['team_id'], 'playerid': event['player_id'],
+                    'actiontype': event['action_type'], 'action': event['action'],
+                    'actiondesc': event['action_desc'], 'currenttimer': event['current_timer']})
+                if number % self.refresh_every == 0:
+                    self.request('refresh_box_scores', 'GET', f'/refresh_box_scores/{self.game_id}')
+        self.connection.close()
+        return self
+
+
+def expected_box_scores(events):
+    totals = defaultdict(lambda: dict.fromkeys(STAT_COLUMNS, 0))
+    for event in events:
+        for column, delta in ACTION_DELTAS[event['action']].items():
+            totals[(event['team_id'], event['player_id'])][column] += delta
+    return totals
+
+
+def verify_game(game_id, events):
+    # Every generated event must be reflected exactly once in the box scores and the game log
+    expected = expected_box_scores(events)
+    actual = {(box.team_id, box.player_id): {column: getattr(box, column) for column in STAT_COLUMNS}
+              for box in BoxScore.query.filter_by(game_id=game_id).all()}
+    mismatched = sum(1 for key in set(expected) | set(actual)
+                     if expected.get(key, dict.fromkeys(STAT_COLUMNS, 0)) != actual.get(key, dict.fromkeys(STAT_COLUMNS, 0)))
+    log_rows = db.session.query(func.count(GameLog.gamelogid)).filter_by(gameid=game_id).scalar()
+    return mismatched, log_rows - len(events)
+
+
+def run_stage(url, game_count, events_per_game, players_per_team, mode, batch_size, refresh_every, seed=0):
+    """Score `game_count` games at once and report throughput, errors, tail latency and final-state checks."""
+    league_id, games = seed_game_day(game_count, players_per_team)
+    cookie = session_cookie(league_id)
+    streams = [(game_id, scorer_events(rosters, events_per_game, seed=seed + n)) for n, (game_id, rosters) in enumerate(games)]
+    scorers = [Scorer(url, cookie, game_id, events, mode, batch_size, refresh_every) for game_id, events in streams]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(scorers)) as pool:
+        finished = list(pool.map(Scorer.run, scorers))
+    elapsed = time.perf_counter() - start
+
+    # A server in this process may still hold queued log rows; one behind --url has to be given time itself
+    game_log_writer.drain()
+    drain_seconds = time.perf_counter() - start - elapsed
+
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    samples = []
+    for scorer in finished:
+        for endpoint, values in scorer.latencies.items():
+            latencies[endpoint].extend(values)
+        for endpoint, count in scorer.errors.items():
+            errors[endpoint] += count
+        samples.extend(scorer.error_samples)
+
+    db.session.expire_all()
+    mismatched_box_scores = 0
+    log_row_difference = 0
+    for game_id, events in streams:
+        mismatched, log_difference = verify_game(game_id, events)
+        mismatched_box_scores += mismatched
+        log_row_difference += log_difference
+
+    requests = sum(len(values) for values in latencies.values()) + sum(errors.values())
+    event_count = game_count * events_per_game
+    return {
+        'games': game_count,
+        'events': event_count,
+        'seconds': round(elapsed, 2),
+        'log_drain_seconds': round(drain_seconds, 3),
+        'events_per_sec': round(event_count / elapsed, 1),
+        'requests': requests,
+        'errors': dict(errors),
+        'error_rate': round(sum(errors.values()) / requests, 4) if requests else 0,
+        'error_samples': samples[:5],
+        'latency_ms': {endpoint: {
+            'p50': round(percentile(values, 50), 2),
+            'p95': round(percentile(values, 95), 2),
+            'p99': round(percentile(values, 99), 2),
+            'max': round(max(values), 2),
+        } for endpoint, values in sorted(latencies.items()) if values},
+        'correct': mismatched_box_scores == 0 and log_row_difference == 0,
+        'mismatched_box_scores': mismatched_box_scores,
+        'log_row_difference': log_row_difference,
+    }
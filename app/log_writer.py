@@ -0,0 +1,191 @@
+import atexit
+import queue
+import threading
+import time
+from collections import Counter
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from app import app, db
+from app.live import publish_log_entries
+from app.models import GameLog
+
+
+def insert_log_rows(rows):
+    """Insert GameLog rows (dicts of column values) with one multi-row INSERT and return their new ids in order.
+
+    The ids come back through RETURNING where the database has it. MySQL does not, but InnoDB hands a single
+    multi-row INSERT consecutive ids starting at LAST_INSERT_ID().
+    """
+    statement = insert(GameLog).values(rows)
+    if db.session.get_bind().dialect.insert_returning:
+        return sorted(db.session.execute(statement.returning(GameLog.gamelogid)).scalars())
+    first_id = db.session.execute(statement).lastrowid
+    return list(range(first_id, first_id + len(rows)))
+
+
+def log_entries(rows, ids):
+    # Detached GameLog objects for the live stream; never added to a session
+    return [GameLog(gamelogid=gamelogid, **row) for gamelogid, row in zip(ids, rows)]
+
+
+class GameLogWriter:
+    """Write-behind buffer for play-by-play rows: requests enqueue, a background thread bulk inserts them.
+
+    Rows are flushed as one multi-row INSERT once flush_rows are waiting or the oldest has waited
+    flush_seconds, and only then published to the game's live stream, with their ids. A full queue blocks
+    the request for up to enqueue_timeout and then writes the row on the request thread, so a stalled
+    database slows scorers down instead of losing their log.
+
+    Durability: an acknowledged row is committed within flush_seconds, and close() (run at exit) flushes
+    whatever is still queued. A process killed outright loses at most that window of rows, the same as a
+    /log_action request that never arrived; replay_game_log leaves games with queued rows alone.
+    """
+
+    def __init__(self, enqueue_timeout=1.0):
+        self.enqueue_timeout = enqueue_timeout
+        self.written = 0
+        self.failed = 0
+        self.overflowed = 0
+        self.batches = 0
+        self._queue = None
+        self._thread = None
+        self._queued_games = Counter()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def synchronous(self):
+        # GAMELOG_BUFFER_ROWS = 0 is the fallback mode: rows are inserted in the request, as tests usually want
+        return not app.config['GAMELOG_BUFFER_ROWS']
+
+    def pending(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def pending_games(self):
+        """Ids of the games that have rows queued and not yet committed."""
+        with self._lock:
+            return set(self._queued_games)
+
+    def write(self, rows):
+        """Queue GameLog rows (dicts of column values) for the background thread, or insert them now.
+
+        Rows inserted now join the caller's transaction and are returned as GameLog entries for the caller to
+        publish once it commits. Queued rows return nothing; the writer publishes them after its own commit.
+        """
+        if self.synchronous:
+            return log_entries(rows, insert_log_rows(rows))
+
+        self._start()
+        for index, row in enumerate(rows):
+            with self._lock:
+                self._queued_games[row['gameid']] += 1
+            try:
+                self._queue.put(row, timeout=self.enqueue_timeout)
+            except queue.Full:
+                rest = rows[index:]
+                self._release(rest)
+                with self._lock:
+                    self.overflowed += len(rest)
+                return log_entries(rest, insert_log_rows(rest))
+        return []
+
+    def drain(self):
+        """Block until every queued row has been written or given up on."""
+        if self._queue is not None:
+            self._queue.join()
+
+    def close(self):
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+
+    def _start(self):
+        # Started on first use, so CLI commands and pre-fork masters never own a writer thread
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._queue = queue.Queue(maxsize=app.config['GAMELOG_BUFFER_ROWS'])
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name='gamelog-writer', daemon=True)
+                self._thread.start()
+
+    def _next_batch(self):
+        flush_rows = app.config['GAMELOG_FLUSH_ROWS']
+        flush_seconds = app.config['GAMELOG_FLUSH_SECONDS']
+        try:
+            batch = [self._queue.get(timeout=flush_seconds)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + flush_seconds
+        while len(batch) < flush_rows:
+            # Shutting down: take whatever is already queued without waiting for more
+            remaining = 0 if self._stopping.is_set() else deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if not batch:
+                continue
+            with app.app_context():
+                written = self._flush(batch)
+            self._release(batch)
+            for _ in batch:
+                self._queue.task_done()
+            self._publish(written)
+
+    def _flush(self, batch):
+        # Returns the committed rows as GameLog entries
+        try:
+            ids = insert_log_rows(batch)
+            db.session.commit()
+            entries = log_entries(batch, ids)
+            with self._lock:
+                self.written += len(batch)
+                self.batches += 1
+            return entries
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            app.logger.error(f'SQLAlchemyError flushing {len(batch)} game log rows, retrying one by one: {e}')
+
+        # One bad row must not take the rest of the batch down with it
+        entries = []
+        for row in batch:
+            try:
+                ids = insert_log_rows([row])
+                db.session.commit()
+                entries += log_entries([row], ids)
+                with self._lock:
+                    self.written += 1
+            except SQLAlchemyError as e:
+                db.session.rollback()
+                with self._lock:
+                    self.failed += 1
+                app.logger.error(f'Dropped game log row for game {row.get("gameid")}: {e}')
+        return entries
+
+    def _release(self, rows):
+        with self._lock:
+            self._queued_games.subtract(row['gameid'] for row in rows)
+            # Keep only the games that still have rows queued
+            self._queued_games = +self._queued_games
+
+    @staticmethod
+    def _publish(entries):
+        by_game = {}
+        for entry in entries:
+            by_game.setdefault(entry.gameid, []).append(entry)
+        for game_id, game_entries in by_game.items():
+            publish_log_entries(game_id, game_entries)
+
+
+game_log_writer = GameLogWriter()
+atexit.register(game_log_writer.close)
@@ -0,0 +1,164 @@
+import threading
+import time
+from bisect import bisect_left
+from flask import g, has_request_context, request, Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app import app
+from app.analytics import season_stats_cache
+from app.dashboard import dashboard_cache
+from app.render_cache import summary_cache
+
+# Histogram bucket upper bounds; the +Inf bucket is implied
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.sum}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+class RouteMetrics:
+    """Request, latency and database counters for one endpoint."""
+
+    def __init__(self):
+        self.responses = {}  # (method, status) -> count
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.statements = Histogram(STATEMENT_BUCKETS)
+        self.db_seconds = 0.0
+
+
+class MetricsRegistry:
+    """Per-endpoint metrics kept in process memory and rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def observe(self, endpoint, method, status, seconds, statements, db_seconds):
+        with self._lock:
+            route = self._routes.get(endpoint)
+            if route is None:
+                route = self._routes[endpoint] = RouteMetrics()
+            key = (method, status)
+            route.responses[key] = route.responses.get(key, 0) + 1
+            route.latency.observe(seconds)
+            route.statements.observe(statements)
+            route.db_seconds += db_seconds
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+    def render(self):
+        lines = []
+        with self._lock:
+            routes = sorted(self._routes.items())
+
+            lines += ['# HELP courtinsight_requests_total Requests handled, by endpoint, method and status.',
+                      '# TYPE courtinsight_requests_total counter']
+            for endpoint, route in routes:
+                for (method, status), count in sorted(route.responses.items()):
+                    lines.append(f'courtinsight_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {count}')
+
+            lines += ['# HELP courtinsight_request_duration_seconds Time spent handling a request.',
+                      '# TYPE courtinsight_request_duration_seconds histogram']
+            for endpoint, route in routes:
+                lines.extend(route.latency.samples('courtinsight_request_duration_seconds', f'endpoint="{endpoint}"'))
+
+            lines += ['# HELP courtinsight_db_statements SQL statements issued by a request.',
+                      '# TYPE courtinsight_db_statements histogram']
+            for endpoint, route in routes:
+                lines.extend(route.statements.samples('courtinsight_db_statements', f'endpoint="{endpoint}"'))
+
+            lines += ['# HELP courtinsight_db_seconds_total Time spent executing SQL statements.',
+                      '# TYPE courtinsight_db_seconds_total counter']
+            for endpoint, route in routes:
+                lines.append(f'courtinsight_db_seconds_total{{endpoint="{endpoint}"}} {route.db_seconds}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+
+# Caches whose lookups are reported alongside the request metrics
+CACHES = {'advanced_stats': season_stats_cache, 'dashboard': dashboard_cache, 'game_summary': summary_cache}
+
+
+def render_cache_metrics():
+    lines = ['# HELP courtinsight_cache_lookups_total Cache lookups, by cache and result.',
+             '# TYPE courtinsight_cache_lookups_total counter']
+    for name, cache in sorted(CACHES.items()):
+        lines.append(f'courtinsight_cache_lookups_total{{cache="{name}",result="hit"}} {cache.hits}')
+        lines.append(f'courtinsight_cache_lookups_total{{cache="{name}",result="miss"}} {cache.misses}')
+    return '\n'.join(lines) + '\n'
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_statement(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('statement_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _finish_statement(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['statement_started'].pop()
+    if has_request_context() and 'sql_statements' in g:
+        g.sql_statements += 1
+        g.sql_seconds += elapsed
+        if g.sql_log is not None:
+            g.sql_log.append((elapsed, statement))
+
+
+@event.listens_for(Engine, 'handle_error')
+def _abandon_statement(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    started = exception_context.connection.info.get('statement_started') if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+@app.before_request
+def _start_request_metrics():
+    g.request_started = time.perf_counter()
+    g.sql_statements = 0
+    g.sql_seconds = 0.0
+    # Statement text is only kept when slow requests are logged
+    g.sql_log = [] if app.config.get('SLOW_REQUEST_SECONDS') else None
+
+
+@app.after_request
+def _record_request_metrics(response):
+    if 'request_started' not in g:
+        return response
+    seconds = time.perf_counter() - g.request_started
+    endpoint = request.endpoint or 'unmatched'
+    metrics.observe(endpoint, request.method, response.status_code, seconds, g.sql_statements, g.sql_seconds)
+
+    threshold = app.config.get('SLOW_REQUEST_SECONDS')
+    if threshold and seconds >= threshold:
+        lines = [f'Slow request {request.method} {request.path} ({endpoint}) took {seconds * 1000:.1f} ms, '
+                 f'{g.sql_statements} statements, {g.sql_seconds * 1000:.1f} ms in the database']
+        lines += [f'  {elapsed * 1000:8.2f} ms  {" ".join(statement.split())}' for elapsed, statement in g.sql_log]
+        app.logger.warning('\n'.join(lines))
+    return response
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render() + render_cache_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,111 @@
+from datetime import datetime
+from sqlalchemy import inspect, select
+from sqlalchemy.schema import CreateColumn
+from app import db
+from app.game_events import merge_duplicate_box_scores
+from app.models import BoxScore, EventBatch, Game, Season
+from app.player_stats import rebuild_player_season_stats
+from app.rolling_form import rebuild_form
+from app.standings import rebuild_standings
+
+# One row per migration applied to this database, so upgrades only run what is new
+schema_migrations = db.Table(
+    'schema_migrations',
+    db.Column('name', db.String(100), primary_key=True),
+    db.Column('applied_at', db.DateTime, nullable=False)
+)
+
+
+def add_missing_column(column):
+    # ALTER TABLE ... ADD COLUMN for a model column the live table does not have yet
+    table = column.table
+    if column.name in {c['name'] for c in inspect(db.engine).get_columns(table.name)}:
+        return False
+
+    with db.engine.begin() as connection:
+        table_name = connection.dialect.identifier_preparer.format_table(table)
+        ddl = CreateColumn(column).compile(dialect=connection.dialect)
+        connection.exec_driver_sql(f'ALTER TABLE {table_name} ADD COLUMN {ddl}')
+    return True
+
+
+def create_tables():
+    # New tables (standings, player_season_stats, ...) are created whole
+    db.create_all()
+
+
+def add_box_score_versions():
+    add_missing_column(Game.__table__.c.box_score_version)
+    add_missing_column(BoxScore.__table__.c.version)
+
+
+def add_box_score_key():
+    # Duplicate (game, team, player) rows must be merged before the unique key can exist
+    merge_duplicate_box_scores()
+    db.session.commit()
+    for index in BoxScore.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+
+
+def add_query_indexes():
+    # Every index declared on the models; InnoDB builds them online, without blocking writes
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+
+def add_form_windows():
+    # Seed the form windows of every season from the games already played
+    db.create_all()
+    for (season_id,) in db.session.query(Season.id).all():
+        rebuild_form(season_id)
+    db.session.commit()
+
+
+def backfill_standings():
+    # create_tables left standings empty on databases that already had games; every team read 0-0
+    for season_id, league_id in db.session.query(Season.id, Season.league_id).all():
+        rebuild_standings(league_id, season_id)
+    db.session.commit()
+
+
+def backfill_player_season_stats():
+    # Box score upserts only add to these totals, so seed them with everything scored before the upgrade
+    for (season_id,) in db.session.query(Season.id).all():
+        rebuild_player_season_stats(season_id)
+    db.session.commit()
+
+
+def add_event_batches():
+    EventBatch.__table__.create(db.engine, checkfirst=True)
+
+
+# Schema changes applied to an existing database, in order; append new steps, never rename or reorder them
+MIGRATIONS = [
+    ('create_tables', create_tables),
+    ('box_score_versions', add_box_score_versions),
+    ('box_score_key', add_box_score_key),
+    ('query_indexes', add_query_indexes),
+    ('form_windows', add_form_windows),
+    ('standings_backfill', backfill_standings),
+    ('player_season_stats_backfill', backfill_player_season_stats),
+    ('event_batches', add_event_batches),
+]
+
+
+def applied_migrations():
+    schema_migrations.create(db.engine, checkfirst=True)
+    with db.engine.connect() as connection:
+        return set(connection.execute(select(schema_migrations.c.name)).scalars())
+
+
+def upgrade():
+    """Apply the migrations this database has not recorded yet, yielding each name once it is recorded."""
+    applied = applied_migrations()
+    for name, step in MIGRATIONS:
+        if name in applied:
+            continue
+        step()
+        with db.engine.begin() as connection:
+            connection.execute(schema_migrations.insert().values(name=name, applied_at=datetime.utcnow()))
+        yield name
@@ -27,6 +27,9 @@ def load_user(user_id):
 
 class Team(db.Model):
     __tablename__ = 'teams'
+    __table_args__ = (
+        db.Index('ix_teams_league', 'league_id'),
+    )
     teamID = db.Column(db.Integer, primary_key=True)
     teamName = db.Column(db.String(100), nullable=False)
     teamDivision = db.Column(db.String(100), nullable=True)
@@ -41,6 +44,9 @@ class Team(db.Model):
 
 class Player(db.Model):
     __tablename__ = 'player'
+    __table_args__ = (
+        db.Index('ix_player_team', 'teamID'),
+    )
     playerID = db.Column(db.Integer, primary_key=True)
     firstName = db.Column(db.String(100), nullable=False)
     lastName = db.Column(db.String(100), nullable=False)
@@ -57,6 +63,11 @@ class Player(db.Model):
 
 class BoxScore(db.Model):
     __tablename__ = 'box_scores'
+    __table_args__ = (
+        db.Index('uq_box_scores_game_team_player', 'game_id', 'team_id', 'player_id', unique=True),  # Also serves (game_id, team_id)
+        db.Index('ix_box_scores_season_league', 'season_id', 'league_id'),
+        db.Index('ix_box_scores_player_season', 'player_id', 'season_id'),
+    )
     box_score_id = db.Column(db.Integer, primary_key=True)
     date_played = db.Column(db.Date, nullable=False)
     game_id = db.Column(db.Integer, nullable=False)
@@ -78,6 +89,7 @@ class BoxScore(db.Model):
     turnovers = db.Column(db.Integer, nullable=False, default=0)
     fouls = db.Column(db.Integer, nullable=False, default=0)
     points = db.Column(db.Integer, nullable=False, default=0)
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Game box_score_version of the last write
 
     # Define relationships
     player = db.relationship('Player', backref=db.backref('box_scores', lazy=True))
@@ -91,6 +103,12 @@ class BoxScore(db.Model):
 
 class Game(db.Model):
     __tablename__ = 'games'
+    __table_args__ = (
+        db.Index('ix_games_league_season_date', 'league_id', 'season_id', 'game_date'),
+        db.Index('ix_games_league_status_date', 'league_id', 'scheduled_played', 'game_date', 'game_id'),
+        db.Index('ix_games_team_1_season', 'team_1_id', 'season_id'),
+        db.Index('ix_games_team_2_season', 'team_2_id', 'season_id'),
+    )
     game_id = db.Column(db.Integer, primary_key=True)
     game_date = db.Column(db.Date, nullable=False)
     team_1_id = db.Column(db.Integer, db.ForeignKey('teams.teamID'), nullable=False)
@@ -101,6 +119,7 @@ class Game(db.Model):
     scheduled_played = db.Column(db.String(10), nullable=False, default='Scheduled')
     league_id = db.Column(db.Integer, db.ForeignKey('leagues.id'))
     season_id = db.Column(db.Integer, db.ForeignKey('seasons.id'))
+    box_score_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Bumped on every box score write
 
     # Define relationships
     team1 = db.relationship('Team', foreign_keys=[team_1_id], backref=db.backref('team_1_games', lazy=True))
@@ -113,6 +132,9 @@ class Game(db.Model):
 
 class GameLog(db.Model):
     __tablename__ = 'gamelog'
+    __table_args__ = (
+        db.Index('ix_gamelog_game', 'gameid', 'gamelogid'),
+    )
 
     gamelogid = db.Column(db.Integer, primary_key=True, autoincrement=True)
     gameid = db.Column(db.Integer, nullable=False)
@@ -141,6 +163,9 @@ class League(db.Model):
 
 class Season(db.Model):
     __tablename__ = 'seasons'
+    __table_args__ = (
+        db.Index('ix_seasons_league_start', 'league_id', 'start_date'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     start_date = db.Column(db.Date)
@@ -150,3 +175,79 @@ class Season(db.Model):
     # Relationship with Game
     games = db.relationship('Game', backref='seasons', lazy=True)
 
+
+
+class Standing(db.Model):
+    __tablename__ = 'standings'
+    league_id = db.Column(db.Integer, db.ForeignKey('leagues.id'), primary_key=True)
+    season_id = db.Column(db.Integer, db.ForeignKey('seasons.id'), primary_key=True)
+    team_id = db.Column(db.Integer, db.ForeignKey('teams.teamID'), primary_key=True)
+    wins = db.Column(db.Integer, nullable=False, default=0)
+    losses = db.Column(db.Integer, nullable=False, default=0)
+    points_for = db.Column(db.Integer, nullable=False, default=0)
+    points_against = db.Column(db.Integer, nullable=False, default=0)
+    streak = db.Column(db.Integer, nullable=False, default=0)  # Positive for a winning streak, negative for a losing one
+
+    team = db.relationship('Team')
+
+    def __repr__(self):
+        return f'<Standing {self.league_id}/{self.season_id} - Team {self.team_id}>'
+
+
+class PlayerSeasonStats(db.Model):
+    __tablename__ = 'player_season_stats'
+    __table_args__ = (
+        db.Index('ix_player_season_stats_leaders', 'season_id', 'league_id', 'points'),
+    )
+    season_id = db.Column(db.Integer, db.ForeignKey('seasons.id'), primary_key=True)
+    player_id = db.Column(db.Integer, db.ForeignKey('player.playerID'), primary_key=True)
+    team_id = db.Column(db.Integer, db.ForeignKey('teams.teamID'), primary_key=True)
+    league_id = db.Column(db.Integer, db.ForeignKey('leagues.id'), nullable=False)
+    games_played = db.Column(db.Integer, nullable=False, default=0)
+    fga = db.Column(db.Integer, nullable=False, default=0)
+    fgm = db.Column(db.Integer, nullable=False, default=0)
+    three_fga = db.Column(db.Integer, nullable=False, default=0)
+    three_fgm = db.Column(db.Integer, nullable=False, default=0)
+    fta = db.Column(db.Integer, nullable=False, default=0)
+    ftm = db.Column(db.Integer, nullable=False, default=0)
+    oreb = db.Column(db.Integer, nullable=False, default=0)
+    dreb = db.Column(db.Integer, nullable=False, default=0)
+    assists = db.Column(db.Integer, nullable=False, default=0)
+    steals = db.Column(db.Integer, nullable=False, default=0)
+    blocks = db.Column(db.Integer, nullable=False, default=0)
+    turnovers = db.Column(db.Integer, nullable=False, default=0)
+    fouls = db.Column(db.Integer, nullable=False, default=0)
+    points = db.Column(db.Integer, nullable=False, default=0)
+
+    player = db.relationship('Player')
+    team = db.relationship('Team')
+
+    def __repr__(self):
+        return f'<PlayerSeasonStats Season {self.season_id} - Player {self.player_id}>'
+
+
+class FormWindow(db.Model):
+    """The most recent games of a player or team in a season, packed into fixed-size slots by app.rolling_form."""
+    __tablename__ = 'form_windows'
+    __table_args__ = (
+        db.Index('ix_form_windows_season_kind', 'season_id', 'kind', 'league_id'),
+    )
+    season_id = db.Column(db.Integer, db.ForeignKey('seasons.id'), primary_key=True)
+    kind = db.Column(db.String(6), primary_key=True)  # 'player' or 'team'
+    subject_id = db.Column(db.Integer, primary_key=True)  # playerID or teamID, by kind
+    league_id = db.Column(db.Integer, db.ForeignKey('leagues.id'), nullable=False)
+    slots = db.Column(db.LargeBinary, nullable=False)
+
+    def __repr__(self):
+        return f'<FormWindow Season {self.season_id} - {self.kind} {self.subject_id}>'
+
+
+class EventBatch(db.Model):
+    """A scorer batch applied by /games/<id>/events, so a resent batch whose response was lost is not applied twice."""
+    __tablename__ = 'event_batches'
+    batch_id = db.Column(db.String(64), primary_key=True)  # Generated by the scorer page, one per batch
+    game_id = db.Column(db.Integer, db.ForeignKey('games.game_id'), nullable=False)
+    received_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<EventBatch {self.batch_id} - Game {self.game_id}>'
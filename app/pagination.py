@@ -0,0 +1,71 @@
+import base64
+import json
+from collections import namedtuple
+from datetime import date, datetime
+from sqlalchemy import and_, or_
+
+PAGE_SIZE = 50
+
+# One page of a keyset listing; next_cursor is None on the last page
+Page = namedtuple('Page', ['items', 'next_cursor'])
+
+
+class CursorError(ValueError):
+    """A cursor that was not produced by encode_cursor for this listing."""
+
+
+def encode_cursor(values):
+    raw = json.dumps([value.isoformat() if isinstance(value, (date, datetime)) else value for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, columns):
+    # Back to typed values for the sort columns, so the comparison binds dates as dates
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except ValueError:
+        raise CursorError('Malformed cursor.')
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise CursorError('Malformed cursor.')
+
+    decoded = []
+    for column, value in zip(columns, values):
+        python_type = column.type.python_type
+        try:
+            if value is None:
+                decoded.append(None)
+            elif python_type in (date, datetime):
+                decoded.append(python_type.fromisoformat(value))
+            else:
+                decoded.append(python_type(value))
+        except (TypeError, ValueError):
+            raise CursorError('Malformed cursor.')
+    return decoded
+
+
+def _beyond(columns, values, descending):
+    # (a, b) < (x, y) spelled out as a < x OR (a = x AND b < y), which every backend can use an index for
+    column, value = columns[0], values[0]
+    past = column < value if descending else column > value
+    if len(columns) == 1:
+        return past
+    return or_(past, and_(column == value, _beyond(columns[1:], values[1:], descending)))
+
+
+def keyset_page(query, columns, cursor=None, page_size=PAGE_SIZE, descending=True):
+    """The page of `query` after `cursor` in `columns` order; the last column must be unique."""
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        if None in values:
+            raise CursorError('Malformed cursor.')
+        query = query.filter(_beyond(columns, values, descending))
+
+    # One extra row tells whether another page exists without a COUNT
+    order = [column.desc() if descending else column.asc() for column in columns]
+    rows = query.order_by(*order).limit(page_size + 1).all()
+    items = rows[:page_size]
+    next_cursor = None
+    if len(rows) > page_size:
+        last = items[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column in columns])
+    return Page(items, next_cursor)
@@ -0,0 +1,78 @@
+from sqlalchemy import desc, func
+from app import db
+from app.models import BoxScore, Player, PlayerSeasonStats, Team
+
+# Counters shared by BoxScore and PlayerSeasonStats
+STAT_COLUMNS = ['fga', 'fgm', 'three_fga', 'three_fgm', 'fta', 'ftm', 'oreb', 'dreb',
+                'assists', 'steals', 'blocks', 'turnovers', 'fouls', 'points']
+
+
+def rebuild_player_season_stats(season_id):
+    """Recompute the player_season_stats rows of a season from its box scores."""
+    PlayerSeasonStats.query.filter_by(season_id=season_id).delete()
+
+    totals = db.session.query(
+        BoxScore.player_id,
+        BoxScore.team_id,
+        func.max(BoxScore.league_id),
+        func.count(func.distinct(BoxScore.game_id)),
+        *[func.sum(getattr(BoxScore, column)) for column in STAT_COLUMNS]
+    ).filter(BoxScore.season_id == season_id) \
+     .group_by(BoxScore.player_id, BoxScore.team_id).all()
+
+    db.session.add_all([
+        PlayerSeasonStats(
+            season_id=season_id,
+            player_id=player_id,
+            team_id=team_id,
+            league_id=league_id,
+            games_played=games_played,
+            **{column: int(value or 0) for column, value in zip(STAT_COLUMNS, sums)}
+        )
+        for player_id, team_id, league_id, games_played, *sums in totals
+    ])
+    return len(totals)
+
+
+def roster_season_stats(team_id, season_id):
+    """Per-game averages and FG% for every rostered player who has played in the season."""
+    rows = db.session.query(
+        Player.firstName,
+        Player.lastName,
+        Player.jerseyNumber,
+        func.sum(PlayerSeasonStats.games_played),
+        func.sum(PlayerSeasonStats.points),
+        func.sum(PlayerSeasonStats.fgm),
+        func.sum(PlayerSeasonStats.fga)
+    ).join(PlayerSeasonStats, PlayerSeasonStats.player_id == Player.playerID) \
+     .filter(Player.teamID == team_id, PlayerSeasonStats.season_id == season_id) \
+     .group_by(Player.playerID).all()
+
+    player_stats = []
+    for first_name, last_name, jersey_number, games_played, points, fgm, fga in rows:
+        if not games_played:
+            continue
+        player_stats.append({
+            'firstName': first_name,
+            'lastName': last_name,
+            'jersey_number': jersey_number,
+            'avg_points': points / games_played,
+            'fg_percentage': (fgm / fga) * 100 if fga > 0 else 0
+        })
+    return player_stats
+
+
+def top_scorers(league_id, season_id, limit=5):
+    # Season scoring leaders straight from the aggregate table
+    return db.session.query(
+        Player.firstName, Player.lastName, Team.teamName,
+        PlayerSeasonStats.points.label('total_points'),
+        (PlayerSeasonStats.fgm * 100.0 / PlayerSeasonStats.fga).label('fg_percentage')
+    ).select_from(PlayerSeasonStats) \
+     .join(Player, PlayerSeasonStats.player_id == Player.playerID) \
+     .join(Team, PlayerSeasonStats.team_id == Team.teamID) \
+     .filter(
+        PlayerSeasonStats.season_id == season_id,
+        PlayerSeasonStats.league_id == league_id,
+        PlayerSeasonStats.fga > 0  # Exclude players with zero field goal attempts
+    ).order_by(desc('total_points')).limit(limit).all()
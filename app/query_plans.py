@@ -0,0 +1,33 @@
+import re
+from app import db
+
+# SQLite plan rows read "SCAN games" for a full table scan and "SEARCH games USING INDEX ..." for an index lookup
+SQLITE_SCAN = re.compile(r'^SCAN (\w+)(?: AS \w+)?$')
+
+# Tables a page lists in full by design: the league picker shows every league
+LISTED_TABLES = {'leagues'}
+
+
+def explain(statement, parameters):
+    """The database's plan for a captured statement, as (table, detail) pairs."""
+    connection = db.session.connection()
+    if connection.dialect.name == 'sqlite':
+        rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+        return [(None, row[-1]) for row in rows]
+    rows = connection.exec_driver_sql(f'EXPLAIN {statement}', parameters).mappings().all()
+    return [(row['table'], f"type={row['type']} key={row['key']} rows={row['rows']}") for row in rows]
+
+
+def full_table_scans(statement, parameters):
+    # Base tables the plan reads end to end; derived tables and constant rows are not counted
+    tables = set(db.metadata.tables)
+    scans = set()
+    for table, detail in explain(statement, parameters):
+        if table is None:
+            match = SQLITE_SCAN.match(detail)
+            table = match.group(1) if match else None
+        elif 'type=ALL' not in detail:
+            table = None
+        if table in tables and table not in LISTED_TABLES:
+            scans.add(table)
+    return scans
@@ -0,0 +1,134 @@
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from app import app
+
+
+class RenderCache:
+    """Rendered HTML of completed games, keyed by (game_id, *version parts).
+
+    Entries live in memory with least-recently-used eviction. When RENDER_CACHE_DIR is set they are also
+    written there, so a restarted or second worker process starts warm. The directory holds one file per
+    game, named after the game id and starting with the key it was rendered for, so a newer version
+    replaces the older one and invalidating a game removes a single known file. Past RENDER_CACHE_DIR_ENTRIES
+    files the least recently written ones are removed.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._files = None  # Files in RENDER_CACHE_DIR as of the last count, plus those this process added since
+        self._lock = threading.Lock()
+
+    def _path(self, game_id):
+        directory = app.config.get('RENDER_CACHE_DIR')
+        if not directory:
+            return None
+        return os.path.join(directory, f'{self.prefix}-{game_id}.html')
+
+    @staticmethod
+    def _key_line(key):
+        return '-'.join(str(part) for part in key) + '\n'
+
+    def get(self, key):
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return html
+
+        path = self._path(key[0])
+        if path is not None:
+            try:
+                with open(path, encoding='utf-8') as f:
+                    # A file rendered for another version of the game is a miss
+                    html = f.read() if f.readline() == self._key_line(key) else None
+            except OSError:
+                html = None
+        with self._lock:
+            if html is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        self._remember(key, html)
+        return html
+
+    def put(self, key, html):
+        self._remember(key, html)
+        path = self._path(key[0])
+        if path is None:
+            return
+        # Written under a temporary name and renamed, so a reader never sees half a page
+        try:
+            directory = os.path.dirname(path)
+            os.makedirs(directory, exist_ok=True)
+            is_new = not os.path.exists(path)
+            fd, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(self._key_line(key))
+                f.write(html)
+            os.replace(temporary, path)
+            if is_new:
+                self._count_file(directory)
+        except OSError as e:
+            app.logger.warning(f'Could not write render cache file {path}: {e}')
+
+    def invalidate(self, game_id):
+        """Drop every cached version of a game."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == game_id]:
+                del self._entries[key]
+        path = self._path(game_id)
+        if path is not None:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _count_file(self, directory):
+        # The directory is listed once per process and then only when the count passes the limit, so a write
+        # does not scan it
+        with self._lock:
+            if self._files is not None:
+                self._files += 1
+                if self._files <= app.config['RENDER_CACHE_DIR_ENTRIES']:
+                    return
+        self._prune(directory)
+
+    def _prune(self, directory):
+        limit = app.config['RENDER_CACHE_DIR_ENTRIES']
+        files = []
+        for entry in os.scandir(directory):
+            if entry.name.startswith(f'{self.prefix}-') and entry.name.endswith('.html'):
+                try:
+                    files.append((entry.stat().st_mtime, entry.path))
+                except OSError:
+                    pass
+        files.sort()
+        # Down to nine tenths of the limit, so the next prune is a good number of writes away
+        excess = len(files) - limit * 9 // 10 if len(files) > limit else 0
+        for _, stale in files[:excess]:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+        with self._lock:
+            self._files = len(files) - excess
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _remember(self, key, html):
+        with self._lock:
+            self._entries[key] = html
+            self._entries.move_to_end(key)
+            while len(self._entries) > app.config['RENDER_CACHE_ENTRIES']:
+                self._entries.popitem(last=False)
+
+
+summary_cache = RenderCache('game-summary')
@@ -0,0 +1,193 @@
+import struct
+from collections import namedtuple
+from datetime import date
+from sqlalchemy import and_, or_
+from app import db
+from app.models import BoxScore, FormWindow, Game, Player, Team
+
+# Games kept per player and team; also the longest window reported
+FORM_GAMES = 10
+WINDOWS = (5, 10)
+
+# One slot: game id, game date as an ordinal, points, FGM, FGA, rebounds and the team's margin
+SLOT = struct.Struct('<iihhhhh')
+
+FormGame = namedtuple('FormGame', ['game_id', 'game_date', 'points', 'fgm', 'fga', 'rebounds', 'margin'])
+
+
+class FormRing:
+    """FORM_GAMES fixed-size slots packed into bytes; once full, a new game overwrites the oldest one kept.
+
+    Games normally end in date order, which makes this a plain ring; a game ended late only displaces an
+    older one, and a game ended again overwrites its own slot.
+    """
+
+    def __init__(self, data=None):
+        self.data = bytearray(data) if data else bytearray(SLOT.size * FORM_GAMES)
+
+    def _slots(self):
+        return [SLOT.unpack_from(self.data, i * SLOT.size) for i in range(FORM_GAMES)]
+
+    def put(self, game):
+        slots = self._slots()
+        key = (game.game_date.toordinal(), game.game_id)
+        target = next((i for i, slot in enumerate(slots) if slot[0] == game.game_id), None)
+        if target is None:
+            # Empty slots are all zeros, so they sort before any game
+            target = min(range(FORM_GAMES), key=lambda i: (slots[i][1], slots[i][0]))
+            if slots[target][0] and (slots[target][1], slots[target][0]) > key:
+                return
+        SLOT.pack_into(self.data, target * SLOT.size, game.game_id, key[0], game.points, game.fgm, game.fga,
+                       game.rebounds, game.margin)
+
+    def games(self):
+        """The games kept, newest first."""
+        games = [FormGame(game_id, date.fromordinal(day), *stats) for game_id, day, *stats in self._slots() if game_id]
+        return sorted(games, key=lambda game: (game.game_date, game.game_id), reverse=True)
+
+
+def _sides(game):
+    # (team, points for, margin) for both teams of a played game
+    margin = game.team_1_score - game.team_2_score
+    return ((game.team_1_id, game.team_1_score, margin), (game.team_2_id, game.team_2_score, -margin))
+
+
+def _form_games(games, box_scores):
+    """(kind, subject id, FormGame) for every team of the games and every player with a box score in them.
+
+    A box score does not record who was on the court, so a player's margin is their team's margin in the game.
+    """
+    sides = {}
+    for game in games:
+        for team_id, points, margin in _sides(game):
+            sides[(game.game_id, team_id)] = [game, points, 0, 0, 0, margin]
+
+    for game_id, team_id, player_id, points, fgm, fga, rebounds in box_scores:
+        side = sides.get((game_id, team_id))
+        if side is None:
+            continue
+        side[2] += fgm
+        side[3] += fga
+        side[4] += rebounds
+        yield 'player', player_id, FormGame(game_id, side[0].game_date, points, fgm, fga, rebounds, side[5])
+
+    for (game_id, team_id), (game, points, fgm, fga, rebounds, margin) in sides.items():
+        yield 'team', team_id, FormGame(game_id, game.game_date, points, fgm, fga, rebounds, margin)
+
+
+def _box_score_rows(*criteria):
+    return db.session.query(
+        BoxScore.game_id, BoxScore.team_id, BoxScore.player_id, BoxScore.points, BoxScore.fgm, BoxScore.fga,
+        BoxScore.oreb + BoxScore.dreb
+    ).filter(*criteria).all()
+
+
+def record_game_form(game):
+    """Put a finished game into its teams' and players' form windows; the caller commits it with the game."""
+    if game.league_id is None or game.season_id is None:
+        return
+
+    entries = list(_form_games([game], _box_score_rows(BoxScore.game_id == game.game_id)))
+    subjects = {}
+    for kind, subject_id, _ in entries:
+        subjects.setdefault(kind, set()).add(subject_id)
+    windows = {
+        (window.kind, window.subject_id): window
+        for window in FormWindow.query.filter(
+            FormWindow.season_id == game.season_id,
+            or_(*[and_(FormWindow.kind == kind, FormWindow.subject_id.in_(ids)) for kind, ids in subjects.items()])
+        ).with_for_update()
+    } if subjects else {}
+
+    for kind, subject_id, form_game in entries:
+        window = windows.get((kind, subject_id))
+        if window is None:
+            window = windows[(kind, subject_id)] = FormWindow(
+                season_id=game.season_id, kind=kind, subject_id=subject_id, league_id=game.league_id)
+            db.session.add(window)
+        ring = FormRing(window.slots)
+        ring.put(form_game)
+        window.slots = bytes(ring.data)
+
+
+def rebuild_form(season_id):
+    """Recompute every form window of a season from its played games and their box scores."""
+    FormWindow.query.filter_by(season_id=season_id).delete()
+
+    played = (Game.season_id == season_id, Game.scheduled_played == 'Played', Game.league_id.isnot(None))
+    games = Game.query.filter(*played).all()
+    box_scores = _box_score_rows(BoxScore.season_id == season_id, BoxScore.game_id.in_(
+        db.select(Game.game_id).where(*played)))
+    leagues = {game.game_id: game.league_id for game in games}
+
+    rings = {}
+    for kind, subject_id, form_game in _form_games(games, box_scores):
+        key = (kind, subject_id)
+        if key not in rings:
+            rings[key] = (leagues[form_game.game_id], FormRing())
+        rings[key][1].put(form_game)
+
+    db.session.add_all([
+        FormWindow(season_id=season_id, kind=kind, subject_id=subject_id, league_id=league_id, slots=bytes(ring.data))
+        for (kind, subject_id), (league_id, ring) in rings.items()
+    ])
+    return len(rings)
+
+
+def summarize(games):
+    """Per-game averages over the newest `n` games for each of WINDOWS, and the margin trend.
+
+    The trend is the average margin of the last five games less that of the five before them.
+    """
+    summary = {}
+    for size in WINDOWS:
+        window = games[:size]
+        if not window:
+            summary[f'last_{size}'] = None
+            continue
+        count = len(window)
+        fgm = sum(game.fgm for game in window)
+        fga = sum(game.fga for game in window)
+        summary[f'last_{size}'] = {
+            'games': count,
+            'points': round(sum(game.points for game in window) / count, 1),
+            'fg_pct': round(fgm * 100 / fga, 1) if fga else None,
+            'rebounds': round(sum(game.rebounds for game in window) / count, 1),
+            'margin': round(sum(game.margin for game in window) / count, 1),
+        }
+    recent, previous = games[:5], games[5:10]
+    summary['trend'] = round(sum(game.margin for game in recent) / len(recent)
+                             - sum(game.margin for game in previous) / len(previous), 1) if previous else None
+    return summary
+
+
+def team_form(team_id, season_id):
+    """A team's kept games of the season, newest first."""
+    window = db.session.get(FormWindow, (season_id, 'team', team_id))
+    return FormRing(window.slots).games() if window else []
+
+
+def hot_players(league_id, season_id, limit=5, min_games=3):
+    """Players with the most points per game over their last five games, from the form windows alone."""
+    rows = db.session.query(FormWindow.slots, Player.playerID, Player.firstName, Player.lastName, Team.teamName) \
+        .join(Player, and_(FormWindow.kind == 'player', FormWindow.subject_id == Player.playerID)) \
+        .outerjoin(Team, Player.teamID == Team.teamID) \
+        .filter(FormWindow.season_id == season_id, FormWindow.league_id == league_id).all()
+
+    players = []
+    for slots, player_id, first_name, last_name, team_name in rows:
+        summary = summarize(FormRing(slots).games())
+        recent, longer = summary['last_5'], summary['last_10']
+        if recent is None or recent['games'] < min_games:
+            continue
+        players.append({
+            'player_id': player_id,
+            'firstName': first_name,
+            'lastName': last_name,
+            'teamName': team_name,
+            **recent,
+            # Points per game over the last five against the last ten
+            'points_change': round(recent['points'] - longer['points'], 1),
+        })
+    players.sort(key=lambda player: (-player['points'], player['player_id']))
+    return players[:limit]
@@ -1,14 +1,61 @@
-from flask import render_template, flash, redirect, url_for, request, jsonify, session
+from flask import (render_template, flash, redirect, url_for, request, jsonify, session, Response, abort, g, make_response,
+                   stream_with_context)
 from app import app, db
 from app.forms import LoginForm, RegistrationForm, TeamForm, AddPlayerForm, UpdatePlayerForm, CreateGameForm, CreateTeamForm
-from app.models import User, Team, Player, Game, GameLog, BoxScore, Season, League
+from app.live import (broadcaster, game_snapshot, stream_game, box_score_rows, publish_box_scores, publish_log_entries,
+                      publish_final, ROW_COLUMNS)
+from app.models import User, Team, Player, Game, GameLog, League
+from app.box_scores import game_box_score, game_team_totals
+from app.context import league_context
+from app.dashboard import dashboard_cache, league_dashboard_data
+from app.pagination import keyset_page, CursorError
+from app.exporter import EXPORTS, FORMATS, export_chunks, gzip_chunks
+from app.stats_api import StatsQueryError, parse_stats_query, run_stats_query
+from app.analytics import AnalyticsUnavailable, season_stats_cache
+from app.leaderboards import DEFAULT_LIMIT, MAX_LIMIT, MODES, league_leaders
+from app.importer import IMPORTERS, format_for, import_rows, read_rows, text_stream
+from app.game_events import (EventError, MAX_EVENTS_PER_BATCH, record_action, parse_events, parse_batch_id,
+                             parse_log_row, claim_batch, apply_events)
+from app.log_writer import game_log_writer
+from app.render_cache import summary_cache
+from app.player_stats import roster_season_stats
+from app.rolling_form import record_game_form, summarize, team_form
+from app.standings import load_standings, team_standing, record_game_result, rebuild_standings, format_streak
 from flask_login import current_user, login_user, logout_user, login_required
 from urllib.parse import urlparse
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import func, desc
-from datetime import datetime, date
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload, selectinload
+from datetime import date
 from functools import wraps
 
+app.add_template_filter(format_streak, 'streak')
+
+# Sections of the games page, by game status
+GAME_SECTIONS = {'Scheduled': 'Scheduled Games', 'Ongoing': 'Ongoing Games', 'Played': 'Completed Games'}
+
+# The teams every game listing renders, loaded with the games rather than one SELECT per access
+GAME_TEAMS = (joinedload(Game.team1), joinedload(Game.team2))
+GAME_RESULT = GAME_TEAMS + (joinedload(Game.winning_team),)
+
+
+def requested_page(query, columns, cursor=None, **kwargs):
+    # Keyset page starting at a cursor taken from the query string; a tampered cursor is a bad request
+    try:
+        return keyset_page(query, columns, cursor, **kwargs)
+    except CursorError:
+        abort(400)
+
+
+def load_more_response(template, next_url, **context):
+    # JSON for load_more.js: the rendered rows of the next page and the link to the page after it
+    return jsonify({'html': render_template(template, **context), 'next_url': next_url})
+
+
+def game_log_page(game_id, cursor=None):
+    # Play-by-play newest first; gamelogid follows insertion order and is unique, unlike the timestamp
+    return requested_page(GameLog.query.filter_by(gameid=game_id), [GameLog.gamelogid], cursor, page_size=100)
+
 
 def league_required(f):
     @wraps(f)
@@ -16,13 +63,15 @@ def league_required(f):
         if 'selected_league_id' not in session:
             flash('Please select a league to continue.', 'warning')
             return redirect(url_for('index'))  # Redirect to the homepage to select a league
+        # Resolve the league and its seasons once; the view reads them from g.league_context
+        league_context()
         return f(*args, **kwargs)
     return decorated_function
 
 @app.route('/')
 @login_required
 def index():
-    leagues = League.query.all()  # Fetch all available leagues from the database
+    leagues = League.query.options(selectinload(League.teams)).all()  # Fetch all available leagues with their teams
 
     # Check if a league has already been selected in the session
     selected_league_id = session.get('selected_league_id')
@@ -47,11 +96,12 @@ def select_league(league_id):
 
 @app.route('/league_dashboard/<int:league_id>')
 def league_dashboard(league_id):
-    # Get the league by ID
-    league = League.query.get_or_404(league_id)
-
-    # Fetch all seasons associated with the league
-    seasons = Season.query.filter_by(league_id=league_id).order_by(Season.start_date.desc()).all()
+    # Get the league by ID with all its seasons, newest first
+    context = league_context(league_id)
+    if context.league is None:
+        abort(404)
+    league = context.league
+    seasons = context.seasons
 
     # Determine the selected season; if none is provided, select the latest season
     selected_season_id = request.args.get('season_id', None)
@@ -60,72 +110,15 @@ def league_dashboard(league_id):
     else:
         selected_season_id = int(selected_season_id)
 
-    # Fetch games for the selected season and league
-    games_query = Game.query.filter_by(season_id=selected_season_id, league_id=league_id).order_by(Game.game_date.desc())
-
-    # Last game played
-    last_game = games_query.first()
-
-    mvp = None
-    if last_game:
-        mvp = db.session.query(
-            Player.firstName, Player.lastName, Team.teamName, func.sum(BoxScore.points).label('total_points')
-        ).select_from(BoxScore).join(Player, BoxScore.player_id == Player.playerID).join(Team, BoxScore.team_id == Team.teamID).filter(
-            BoxScore.game_id == last_game.game_id
-        ).group_by(Player.playerID, Team.teamID).order_by(desc('total_points')).first()
-
-    # Calculate team standings
-    teams = Team.query.filter_by(league_id=league_id).all()
-    team_standings = []
-    for team in teams:
-        wins = games_query.filter(
-            ((Game.team_1_id == team.teamID) & (Game.team_1_score > Game.team_2_score)) |
-            ((Game.team_2_id == team.teamID) & (Game.team_2_score > Game.team_1_score))
-        ).count()
-
-        losses = games_query.filter(
-            ((Game.team_1_id == team.teamID) & (Game.team_1_score < Game.team_2_score)) |
-            ((Game.team_2_id == team.teamID) & (Game.team_2_score < Game.team_1_score))
-        ).count()
-
-        team_standings.append({
-            'teamName': team.teamName,
-            'wins': wins,
-            'losses': losses
-        })
-
-    # Sort team standings by number of wins and assign ranking
-    team_standings = sorted(team_standings, key=lambda x: x['wins'], reverse=True)
-    for index, team in enumerate(team_standings):
-        team['rank'] = index + 1
-
-   # Fetch the top 5 scoring leaders for the selected season and league, including FG%
-    top_scorers = db.session.query(
-        Player.firstName, Player.lastName, Team.teamName,
-        func.sum(BoxScore.points).label('total_points'),
-        (func.sum(BoxScore.fgm) / func.sum(BoxScore.fga) * 100).label('fg_percentage')
-    ).select_from(BoxScore) \
-     .join(Player, BoxScore.player_id == Player.playerID) \
-     .join(Team, BoxScore.team_id == Team.teamID) \
-     .filter(
-        BoxScore.season_id == selected_season_id,
-        BoxScore.league_id == league_id,
-        BoxScore.fga > 0  # Exclude players with zero field goal attempts
-    ).group_by(Player.playerID, Team.teamID) \
-     .order_by(desc('total_points')).limit(5).all()
-    # Fetch upcoming games for the selected season
-    upcoming_games = games_query.filter(Game.game_date >= datetime.now()).all()
+    # Last game, MVP, standings, leaders and upcoming games, cached per league/season
+    dashboard = league_dashboard_data(league_id, selected_season_id)
 
     return render_template(
         'league_dashboard.html',
         league=league,
         seasons=seasons,
         selected_season_id=selected_season_id,
-        last_game=last_game,
-        team_standings=team_standings,
-        upcoming_games=upcoming_games,
-        top_scorers=top_scorers,
-        mvp=mvp
+        **dashboard
     )
 
 @app.route('/login', methods=['GET', 'POST'])
@@ -214,40 +207,15 @@ def add_team():
 @league_required
 def teams():
     # Fetch the current league from the session
-    current_league_id = session.get('selected_league_id')
-    latest_season = Season.query.filter_by(league_id=current_league_id).order_by(Season.start_date.desc()).first()
+    current_league_id = g.league_context.league_id
+    latest_season = g.league_context.latest_season
 
     if not latest_season:
         flash("No seasons found for the current league.", "warning")
         return redirect(url_for('index'))
 
-    # Fetch all teams for the current league
-    teams = Team.query.filter_by(league_id=current_league_id).all()
-
-    # Query all games for the current league and season
-    games_query = Game.query.filter_by(season_id=latest_season.id, league_id=current_league_id)
-
-    # Calculate wins and losses for each team
-    team_stats = []
-    for team in teams:
-        wins = games_query.filter(
-            ((Game.team_1_id == team.teamID) & (Game.team_1_score > Game.team_2_score)) |
-            ((Game.team_2_id == team.teamID) & (Game.team_2_score > Game.team_1_score))
-        ).count()
-
-        losses = games_query.filter(
-            ((Game.team_1_id == team.teamID) & (Game.team_1_score < Game.team_2_score)) |
-            ((Game.team_2_id == team.teamID) & (Game.team_2_score < Game.team_1_score))
-        ).count()
-
-        team_stats.append({
-            'team': team,
-            'wins': wins,
-            'losses': losses
-        })
-
-    # Sort the teams by their wins, and then by losses
-    team_stats.sort(key=lambda x: (-x['wins'], x['losses']))
+    # Calculate wins, losses and rank for each team
+    team_stats = load_standings(current_league_id, latest_season.id)
 
     return render_template('teams.html', team_stats=team_stats, latest_season=latest_season)
 
@@ -258,92 +226,38 @@ def team_details(team_id):
     team = Team.query.get_or_404(team_id)
 
     # Fetch the current league and latest season
-    current_league_id = session.get('selected_league_id')
-    latest_season = Season.query.filter_by(league_id=current_league_id).order_by(Season.start_date.desc()).first()
+    context = league_context()
+    current_league_id = context.league_id
+    latest_season = context.latest_season
 
     # Calculate the team's current season record and rank
-    total_wins = Game.query.filter_by(season_id=latest_season.id).filter(
-        ((Game.team_1_id == team_id) & (Game.team_1_score > Game.team_2_score)) |
-        ((Game.team_2_id == team_id) & (Game.team_2_score > Game.team_1_score))
-    ).count()
-
-    total_losses = Game.query.filter_by(season_id=latest_season.id).filter(
-        ((Game.team_1_id == team_id) & (Game.team_1_score < Game.team_2_score)) |
-        ((Game.team_2_id == team_id) & (Game.team_2_score < Game.team_1_score))
-    ).count()
-
-    current_record = f"{total_wins} - {total_losses}"
-
-    # Fetch all teams for ranking calculation
-    teams_in_league = Team.query.filter_by(league_id=current_league_id).all()
-    team_standings = []
-    for t in teams_in_league:
-        wins = Game.query.filter_by(season_id=latest_season.id).filter(
-            ((Game.team_1_id == t.teamID) & (Game.team_1_score > Game.team_2_score)) |
-            ((Game.team_2_id == t.teamID) & (Game.team_2_score > Game.team_1_score))
-        ).count()
-        losses = Game.query.filter_by(season_id=latest_season.id).filter(
-            ((Game.team_1_id == t.teamID) & (Game.team_1_score < Game.team_2_score)) |
-            ((Game.team_2_id == t.teamID) & (Game.team_2_score < Game.team_1_score))
-        ).count()
-        team_standings.append({'team': t, 'wins': wins, 'losses': losses})
-
-    # Sort standings by wins (descending) and set rank
-    team_standings.sort(key=lambda x: (-x['wins'], x['losses']))
-    current_rank = next((index + 1 for index, standing in enumerate(team_standings) if standing['team'].teamID == team_id), None)
-
-    # Fetch the last 3 games played by the team in the current season
-    last_3_games = Game.query.filter_by(season_id=latest_season.id).filter(
-        (Game.team_1_id == team_id) | (Game.team_2_id == team_id)
-    ).order_by(Game.game_date.desc()).limit(3).all()
-
-    # Prepare data for the chart
-    game_dates = [game.game_date.strftime('%Y-%m-%d') for game in last_3_games]
-    points = []
-    fg_percentages = []
+    team_standings = load_standings(current_league_id, latest_season.id)
+    standing = team_standing(team_standings, team_id)
+    if standing:
+        current_record = f"{standing['wins']} - {standing['losses']}"
+        current_rank = standing['rank']
+    else:
+        current_record = "0 - 0"
+        current_rank = None
 
-    # Calculate total points and FG% for each of the last three games
-    for game in last_3_games:
-        if game.team_1_id == team_id:
-            total_points = game.team_1_score
-        else:
-            total_points = game.team_2_score
-
-        # Sum the field goals made and attempted for the team in each game
-        fgm = db.session.query(func.sum(BoxScore.fgm)).filter_by(game_id=game.game_id, team_id=team_id).scalar() or 0
-        fga = db.session.query(func.sum(BoxScore.fga)).filter_by(game_id=game.game_id, team_id=team_id).scalar() or 0
-
-        points.append(total_points)
-        fg_percentages.append((fgm / fga) * 100 if fga > 0 else 0)
-
-    # Fetch all box scores for the team in the current season
-    box_scores = BoxScore.query.filter_by(team_id=team_id, season_id=latest_season.id).all()
-
-    # Calculate average stats per player for the current season
-    players = Player.query.filter_by(teamID=team_id).all()
-    player_stats = []
-    for player in players:
-        # Fetch all box scores for the player
-        player_box_scores = BoxScore.query.filter_by(player_id=player.playerID, season_id=latest_season.id).all()
-        total_games = len(player_box_scores)
-        if total_games > 0:
-            avg_points = sum(bs.points for bs in player_box_scores) / total_games
-            total_fgm = sum(bs.fgm for bs in player_box_scores)
-            total_fga = sum(bs.fga for bs in player_box_scores)
-            fg_percentage = (total_fgm / total_fga) * 100 if total_fga > 0 else 0
-            player_stats.append({
-                'firstName': player.firstName,
-                'lastName': player.lastName,
-                'jersey_number': player.jerseyNumber,
-                'avg_points': avg_points,
-                'fg_percentage': fg_percentage
-            })
-
-    # Fetch games played by the team in the current season
-    games = Game.query.filter_by(season_id=latest_season.id).filter(
+    # Fetch games played by the team in the current season, newest first
+    games = Game.query.options(*GAME_TEAMS).filter_by(season_id=latest_season.id).filter(
         (Game.team_1_id == team_id) | (Game.team_2_id == team_id)
     ).order_by(Game.game_date.desc()).all()
 
+    # The team's last games played, kept up to date by end_game in its form window
+    form_games = team_form(team_id, latest_season.id)
+    form = summarize(form_games)
+
+    # Prepare data for the chart from the last 5 games
+    chart_games = form_games[:5]
+    game_dates = [game.game_date.strftime('%Y-%m-%d') for game in chart_games]
+    points = [game.points for game in chart_games]
+    fg_percentages = [(game.fgm / game.fga) * 100 if game.fga > 0 else 0 for game in chart_games]
+
+    # Average stats per player for the current season, read from the season aggregates
+    player_stats = roster_season_stats(team_id, latest_season.id)
+
     # Prepare game history data
     games_history = []
     for game in games:
@@ -366,15 +280,24 @@ def team_details(team_id):
             'game_id': game.game_id  # Include the game_id for linking
         })
 
-    return render_template('team_details.html', team=team, box_scores=box_scores, game_dates=game_dates, points=points, fg_percentages=fg_percentages, player_stats=player_stats, latest_season=latest_season, games_history=games_history, current_record=current_record, current_rank=current_rank)
+    return render_template('team_details.html', team=team, game_dates=game_dates, points=points, fg_percentages=fg_percentages, form=form, player_stats=player_stats, latest_season=latest_season, games_history=games_history, current_record=current_record, current_rank=current_rank)
 
 
 @app.route('/players')
 @login_required
 @league_required
 def players():
-    all_players = Player.query.all()  # Fetch all players from the database
-    return render_template('players.html', players=all_players)
+    # Players on the selected league's teams, plus unassigned players so they can still be placed on one
+    league_teams = db.select(Team.teamID).filter_by(league_id=g.league_context.league_id)
+    query = Player.query.options(joinedload(Player.team)).filter(
+        Player.teamID.in_(league_teams) | Player.teamID.is_(None)
+    )
+    page = requested_page(query, [Player.playerID], request.args.get('cursor'), descending=False)
+
+    next_url = url_for('players', cursor=page.next_cursor) if page.next_cursor else None
+    if request.args.get('partial'):
+        return load_more_response('partials/player_rows.html', next_url, players=page.items)
+    return render_template('players.html', players=page.items, next_cursor=page.next_cursor)
 
 @app.route('/add_player', methods=['GET', 'POST'])
 @login_required
@@ -382,8 +305,8 @@ def players():
 def add_player():
     form = AddPlayerForm()
 
-    # Populate the teamID choices dynamically
-    form.teamID.choices = [('', 'Select a Team')] + [(team.teamID, team.teamName) for team in Team.query.all()]
+    # Populate the teamID choices with the current league's teams
+    form.teamID.choices = [('', 'Select a Team')] + [(team.teamID, team.teamName) for team in Team.query.filter_by(league_id=g.league_context.league_id).all()]
 
     if form.validate_on_submit():
         player = Player(
@@ -413,8 +336,8 @@ def update_player(player_id):
     player = Player.query.get_or_404(player_id)
     form = UpdatePlayerForm()
 
-    # Populate the teamID choices dynamically
-    form.teamID.choices = [('', 'Select a Team')] + [(str(team.teamID), team.teamName) for team in Team.query.all()]
+    # Populate the teamID choices with the current league's teams
+    form.teamID.choices = [('', 'Select a Team')] + [(str(team.teamID), team.teamName) for team in Team.query.filter_by(league_id=g.league_context.league_id).all()]
 
     if form.validate_on_submit():
         try:
@@ -494,15 +417,109 @@ def quick_upload():
 
     return render_template('quick_upload.html', form=form)  # Pass the form to the template
 
+@app.route('/import/<kind>', methods=['POST'])
+@login_required
+@league_required
+def import_upload(kind):
+    # Bulk counterpart of quick_upload: a CSV or JSON-lines file of teams, players, games or box scores
+    if kind not in IMPORTERS:
+        abort(404)
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return jsonify({'status': 'error', 'message': 'Attach a CSV or JSON-lines file as "file".'}), 400
+
+    # The upload is read from Werkzeug's spooled file a row at a time and committed in chunks
+    rows = read_rows(text_stream(upload.stream), format_for(upload.filename))
+    try:
+        result = import_rows(kind, rows, g.league_context.league_id)
+    except UnicodeDecodeError:
+        db.session.rollback()
+        return jsonify({'status': 'error', 'message': 'The file is not UTF-8 text.'}), 400
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        app.logger.error(f"SQLAlchemyError in import_upload: {str(e)}")
+        return jsonify({'status': 'error', 'message': 'The import failed part way; earlier chunks were kept.'}), 500
+
+    return jsonify({'status': 'success', **result.as_dict()})
+
+@app.route('/export/<kind>', methods=['GET'])
+@login_required
+@league_required
+def export(kind):
+    # ?format=csv|jsonl, ?season_id= to narrow to one season, ?after=<last id received> to resume
+    file_format = request.args.get('format', 'csv')
+    if kind not in EXPORTS or file_format not in FORMATS:
+        abort(404)
+    season_id = request.args.get('season_id', type=int)
+    after = request.args.get('after', type=int)
+    league_id = g.league_context.league_id
+
+    chunks = export_chunks(kind, league_id, season_id, after, file_format)
+    filename = f'{kind}-league{league_id}' + (f'-season{season_id}' if season_id else '') + f'.{file_format}'
+    headers = {'Content-Disposition': f'attachment; filename={filename}', 'Vary': 'Accept-Encoding'}
+    if 'gzip' in request.accept_encodings:
+        chunks = gzip_chunks(chunks)
+        headers['Content-Encoding'] = 'gzip'
+
+    # Rows are read and sent a batch at a time while the response streams, so memory stays flat
+    return Response(stream_with_context(chunks), mimetype=FORMATS[file_format], headers=headers)
+
+@app.route('/api/v1/stats', methods=['GET'])
+@login_required
+def stats_api():
+    # Players or teams ranked by any box score total, rate or per-game average; defaults to the selected league
+    try:
+        query = parse_stats_query(request.args, session.get('selected_league_id'))
+    except StatsQueryError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    return jsonify(run_stats_query(query))
+
+@app.route('/api/v1/advanced_stats', methods=['GET'])
+@login_required
+def advanced_stats_api():
+    # eFG%, TS%, usage, AST/TO, rebound rates, possessions and pace for a season of the selected league
+    context = league_context()
+    season_id = request.args.get('season_id', type=int)
+    season = context.season(season_id) if season_id is not None else context.latest_season
+    if season is None:
+        return jsonify({'status': 'error', 'message': 'Season not found in the selected league.'}), 404
+    try:
+        stats = season_stats_cache.get(season.id)
+    except AnalyticsUnavailable as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 501
+    return jsonify({'season_id': season.id, **stats})
+
+@app.route('/api/v1/leaderboards', methods=['GET'])
+@login_required
+def leaderboards_api():
+    # Top players of every stat category for a season of the selected league, as totals or per game
+    context = league_context()
+    season_id = request.args.get('season_id', type=int)
+    season = context.season(season_id) if season_id is not None else context.latest_season
+    if season is None:
+        return jsonify({'status': 'error', 'message': 'Season not found in the selected league.'}), 404
+    mode = request.args.get('mode')
+    if mode is not None and mode not in MODES:
+        return jsonify({'status': 'error', 'message': f'mode must be one of {", ".join(MODES)}.'}), 400
+    limit = max(1, min(request.args.get('limit', DEFAULT_LIMIT, type=int), MAX_LIMIT))
+
+    leaders = league_leaders(context.league_id, season.id, limit)
+    if mode is not None:
+        leaders = {category: {'label': board['label'], mode: board[mode]} for category, board in leaders.items()}
+    return jsonify({'season_id': season.id, 'leaders': leaders})
+
 @app.route('/create_game', methods=['GET', 'POST'])
 @login_required
 def create_game():
     form = CreateGameForm()
 
     # Fetch the current league and the latest season
-    current_league_id = session.get('selected_league_id')
-    current_league = League.query.get_or_404(current_league_id)
-    seasons = Season.query.filter_by(league_id=current_league_id).order_by(Season.start_date.desc()).all()
+    context = league_context()
+    if context.league is None:
+        abort(404)
+    current_league_id = context.league_id
+    current_league = context.league
+    seasons = context.seasons
     latest_season_id = seasons[0].id if seasons else None
 
     # Populate league and season choices in the form
@@ -519,7 +536,7 @@ def create_game():
     form.season.default = latest_season_id
 
     # Fetch scheduled games for the current league and season
-    scheduled_games = Game.query.filter_by(scheduled_played='Scheduled', league_id=current_league_id, season_id=latest_season_id).all()
+    scheduled_games = Game.query.options(*GAME_TEAMS).filter_by(scheduled_played='Scheduled', league_id=current_league_id, season_id=latest_season_id).all()
 
     if form.validate_on_submit():
         # Check if a scheduled game is selected
@@ -543,6 +560,7 @@ def create_game():
             db.session.add(game)
 
         db.session.commit()
+        dashboard_cache.invalidate(game.league_id, game.season_id)
         flash('Game started successfully!', 'success')
         return redirect(url_for('game_actions', game_id=game.game_id))
 
@@ -557,9 +575,12 @@ def create_game():
 @league_required
 def schedule_game():
     # Fetch the current league and the latest season
-    current_league_id = session.get('selected_league_id')
-    current_league = League.query.get_or_404(current_league_id)
-    seasons = Season.query.filter_by(league_id=current_league_id).order_by(Season.start_date.desc()).all()
+    context = league_context()
+    if context.league is None:
+        abort(404)
+    current_league_id = context.league_id
+    current_league = context.league
+    seasons = context.seasons
     latest_season_id = seasons[0].id if seasons else None
 
     if request.method == 'POST':
@@ -581,6 +602,7 @@ def schedule_game():
         # Add the new game to the database and commit
         db.session.add(new_game)
         db.session.commit()
+        dashboard_cache.invalidate(new_game.league_id, new_game.season_id)
 
         # Flash a success message and redirect to a summary or another page
         flash('Game successfully scheduled!', 'success')
@@ -602,39 +624,55 @@ def schedule_game():
 @login_required
 @league_required
 def view_games():
-    scheduled_games = Game.query.filter_by(scheduled_played='Scheduled').all()
-    ongoing_games = Game.query.filter_by(scheduled_played='Ongoing').all()
-    completed_games = Game.query.filter_by(scheduled_played='Played').all()
-
-    return render_template('view_games.html',
-                           scheduled_games=scheduled_games,
-                           ongoing_games=ongoing_games,
-                           completed_games=completed_games)
+    league_id = g.league_context.league_id
+    status = request.args.get('status')
+    cursor = request.args.get('cursor')
+
+    def section_page(section_status, section_cursor):
+        # Upcoming games soonest first, ongoing and completed games newest first
+        query = Game.query.options(*(GAME_RESULT if section_status == 'Played' else GAME_TEAMS)) \
+            .filter_by(league_id=league_id, scheduled_played=section_status)
+        return requested_page(query, [Game.game_date, Game.game_id], section_cursor,
+                              descending=section_status != 'Scheduled')
+
+    if request.args.get('partial'):
+        if status not in GAME_SECTIONS:
+            abort(400)
+        page = section_page(status, cursor)
+        next_url = url_for('view_games', status=status, cursor=page.next_cursor) if page.next_cursor else None
+        return load_more_response('partials/game_list_items.html', next_url, games=page.items, status=status)
+
+    sections = [
+        {'status': section_status, 'title': title,
+         'page': section_page(section_status, cursor if section_status == status else None)}
+        for section_status, title in GAME_SECTIONS.items()
+    ]
+    return render_template('view_games.html', sections=sections)
 
 
 @app.route('/game_details/<int:game_id>', methods=['GET'])
 @login_required
 @league_required
 def game_details(game_id):
-    game = Game.query.get_or_404(game_id)
+    game = Game.query.options(*GAME_TEAMS).get_or_404(game_id)
     team1_players = Player.query.filter_by(teamID=game.team_1_id).all()
     team2_players = Player.query.filter_by(teamID=game.team_2_id).all()
 
-    # Fetch the last 10 entries from the gamelog table
-    last_entries = GameLog.query.filter_by(gameid=game_id).order_by(GameLog.gamelogdatetime.desc()).limit(100).all()
+    # Fetch the first page of the game log, newest first
+    log_page = game_log_page(game_id)
 
     # Fetch box scores for each team
-    team1_box_scores = BoxScore.query.filter_by(game_id=game_id, team_id=game.team_1_id).all()
-    team2_box_scores = BoxScore.query.filter_by(game_id=game_id, team_id=game.team_2_id).all()
+    box_score = game_box_score(game)
 
     return render_template(
         'game_details.html',
         game=game,
         team1_players=team1_players,
         team2_players=team2_players,
-        last_entries=last_entries,
-        team1_box_scores=team1_box_scores,
-        team2_box_scores=team2_box_scores
+        last_entries=log_page.items,
+        log_cursor=log_page.next_cursor,
+        team1_box_scores=box_score[game.team_1_id].rows,
+        team2_box_scores=box_score[game.team_2_id].rows
     )
 
 
@@ -643,26 +681,23 @@ def game_details(game_id):
 @login_required
 @league_required
 def game_actions(game_id):
-    game = Game.query.get_or_404(game_id)
+    game = Game.query.options(*GAME_TEAMS).get_or_404(game_id)
     team1_players = Player.query.filter_by(teamID=game.team_1_id).all()
     team2_players = Player.query.filter_by(teamID=game.team_2_id).all()
 
-    # Fetch team 1 box score and total points
-    team1_box_scores = BoxScore.query.filter_by(game_id=game_id, team_id=game.team_1_id).all()
-    team1_total_points = sum([box.points for box in team1_box_scores])
-
-    # Fetch team 2 box score and total points
-    team2_box_scores = BoxScore.query.filter_by(game_id=game_id, team_id=game.team_2_id).all()
-    team2_total_points = sum([box.points for box in team2_box_scores])
+    # Fetch both teams' box scores and total points
+    box_score = game_box_score(game)
+    team1, team2 = box_score[game.team_1_id], box_score[game.team_2_id]
 
     return render_template('game_actions.html',
                            game=game,
                            team1_players=team1_players,
                            team2_players=team2_players,
-                           team1_box_scores=team1_box_scores,
-                           team2_box_scores=team2_box_scores,
-                           team1_total_points=team1_total_points,
-                           team2_total_points=team2_total_points)
+                           team1_box_scores=team1.rows,
+                           team2_box_scores=team2.rows,
+                           team1_total_points=team1.totals['points'],
+                           team2_total_points=team2.totals['points'],
+                           max_events_per_batch=MAX_EVENTS_PER_BATCH)
 
 @app.route('/refresh_box_scores/<int:game_id>', methods=['GET'])
 @login_required
@@ -670,24 +705,43 @@ def game_actions(game_id):
 def refresh_box_scores(game_id):
     game = Game.query.get_or_404(game_id)
 
-    # Fetch team 1 box score and total points
-    team1_box_scores = BoxScore.query.filter_by(game_id=game_id, team_id=game.team_1_id).all()
-    team1_total_points = sum([box.points for box in team1_box_scores])
-
-    # Fetch team 2 box score and total points
-    team2_box_scores = BoxScore.query.filter_by(game_id=game_id, team_id=game.team_2_id).all()
-    team2_total_points = sum([box.points for box in team2_box_scores])
-
-    # Render the box scores to HTML strings
-    team1_html = render_template('partials/team_box_score.html', box_scores=team1_box_scores, total_points=team1_total_points)
-    team2_html = render_template('partials/team_box_score.html', box_scores=team2_box_scores, total_points=team2_total_points)
+    # The game's box score version identifies the data; an unchanged game costs one primary key lookup
+    etag = f'{game_id}-{game.box_score_version}'
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    since = request.args.get('since', type=int)
+    if since is not None:
+        # Only the player rows written after the client's version, as compact arrays
+        rows = box_score_rows(game_id, since=since)
+        response = jsonify({
+            'version': game.box_score_version,
+            'columns': ROW_COLUMNS,
+            'rows': [[row[column] for column in ROW_COLUMNS] for row in rows]
+        })
+    else:
+        # Fetch both teams' box scores and total points
+        box_score = game_box_score(game)
+        team1, team2 = box_score[game.team_1_id], box_score[game.team_2_id]
+
+        # Render the box scores to HTML strings
+        team1_html = render_template('partials/team_box_score.html', box_scores=team1.rows, total_points=team1.totals['points'])
+        team2_html = render_template('partials/team_box_score.html', box_scores=team2.rows, total_points=team2.totals['points'])
+
+        response = jsonify({
+            'version': game.box_score_version,
+            'team1_html': team1_html,
+            'team2_html': team2_html,
+            'team1_total_points': team1.totals['points'],
+            'team2_total_points': team2.totals['points']
+        })
 
-    return jsonify({
-        'team1_html': team1_html,
-        'team2_html': team2_html,
-        'team1_total_points': team1_total_points,
-        'team2_total_points': team2_total_points
-    })
+    # Browsers must revalidate every time, which the ETag makes cheap
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 
 
@@ -695,104 +749,139 @@ def refresh_box_scores(game_id):
 @login_required
 @league_required
 def game_summary(game_id):
-    game = Game.query.get_or_404(game_id)
-
-    # Fetch the box scores for both teams
-    team1_box_scores = BoxScore.query.filter_by(game_id=game_id, team_id=game.team_1_id).all()
-    team2_box_scores = BoxScore.query.filter_by(game_id=game_id, team_id=game.team_2_id).all()
-
-    # Calculate total points for each team
-    team1_total_points = sum(box.points for box in team1_box_scores)
-    team2_total_points = sum(box.points for box in team2_box_scores)
-
-    def calculate_percentage(made, attempted):
-        if attempted > 0:
-            return round((made / attempted) * 100, 1)
-        return 0.0
-
-    # Calculate totals and percentages for Team 1
-    team1_totals = {
-        'fga': sum(box.fga for box in team1_box_scores),
-        'fgm': sum(box.fgm for box in team1_box_scores),
-        'three_fga': sum(box.three_fga for box in team1_box_scores),
-        'three_fgm': sum(box.three_fgm for box in team1_box_scores),
-        'fta': sum(box.fta for box in team1_box_scores),
-        'ftm': sum(box.ftm for box in team1_box_scores),
-        'oreb': sum(box.oreb for box in team1_box_scores),
-        'dreb': sum(box.dreb for box in team1_box_scores),
-        'reb': sum(box.oreb + box.dreb for box in team1_box_scores),
-        'ast': sum(box.assists for box in team1_box_scores),
-        'stl': sum(box.steals for box in team1_box_scores),
-        'blk': sum(box.blocks for box in team1_box_scores),
-        'to': sum(box.turnovers for box in team1_box_scores),
-        'pf': sum(box.fouls for box in team1_box_scores),
-        'pts': sum(box.points for box in team1_box_scores),
-        'fg_percent': calculate_percentage(sum(box.fgm for box in team1_box_scores), sum(box.fga for box in team1_box_scores)),
-        'three_fg_percent': calculate_percentage(sum(box.three_fgm for box in team1_box_scores), sum(box.three_fga for box in team1_box_scores)),
-    }
-
-    # Calculate totals and percentages for Team 2
-    team2_totals = {
-        'fga': sum(box.fga for box in team2_box_scores),
-        'fgm': sum(box.fgm for box in team2_box_scores),
-        'three_fga': sum(box.three_fga for box in team2_box_scores),
-        'three_fgm': sum(box.three_fgm for box in team2_box_scores),
-        'fta': sum(box.fta for box in team2_box_scores),
-        'ftm': sum(box.ftm for box in team2_box_scores),
-        'oreb': sum(box.oreb for box in team2_box_scores),
-        'dreb': sum(box.dreb for box in team2_box_scores),
-        'reb': sum(box.oreb + box.dreb for box in team2_box_scores),
-        'ast': sum(box.assists for box in team2_box_scores),
-        'stl': sum(box.steals for box in team2_box_scores),
-        'blk': sum(box.blocks for box in team2_box_scores),
-        'to': sum(box.turnovers for box in team2_box_scores),
-        'pf': sum(box.fouls for box in team2_box_scores),
-        'pts': sum(box.points for box in team2_box_scores),
-        'fg_percent': calculate_percentage(sum(box.fgm for box in team2_box_scores), sum(box.fga for box in team2_box_scores)),
-        'three_fg_percent': calculate_percentage(sum(box.three_fgm for box in team2_box_scores), sum(box.three_fga for box in team2_box_scores)),
-    }
-
-    # Calculate percentages for individual players
-    for box in team1_box_scores + team2_box_scores:
-        box.fg_percent = calculate_percentage(box.fgm, box.fga)
-        box.three_fg_percent = calculate_percentage(box.three_fgm, box.three_fga)
-
-    # Fetch the last 10 entries from the game log table
-    last_entries = GameLog.query.filter_by(gameid=game_id).order_by(GameLog.gamelogdatetime.desc()).limit(100).all()
-
-    return render_template('game_summary.html', game=game,
-                           team1_box_scores=team1_box_scores,
-                           team2_box_scores=team2_box_scores,
-                           last_entries=last_entries,
-                           team1_total_points=team1_total_points,
-                           team2_total_points=team2_total_points,
-                           team1_totals=team1_totals,
-                           team2_totals=team2_totals)
-
+    game = Game.query.options(*GAME_TEAMS).get_or_404(game_id)
+    if game.scheduled_played != 'Played':
+        return render_template('game_summary.html', summary_html=render_game_summary(game))
+
+    # A completed game only changes through a box score correction, which moves its version, or log rows
+    # still being flushed, which move the newest log id
+    last_log_id = db.session.query(func.max(GameLog.gamelogid)).filter(GameLog.gameid == game_id).scalar() or 0
+    key = (game_id, game.box_score_version, last_log_id)
+
+    # The page around the summary carries the user's navigation, so the ETag covers who is looking too
+    etag = '-'.join(str(part) for part in key + (current_user.id, g.league_context.league_id))
+    flashes = session.get('_flashes')
+    if not flashes and request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    summary_html = summary_cache.get(key)
+    if summary_html is None:
+        summary_html = render_game_summary(game)
+        summary_cache.put(key, summary_html)
+
+    response = make_response(render_template('game_summary.html', summary_html=summary_html))
+    if not flashes:
+        response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def render_game_summary(game):
+    # Player rows, team totals and shooting percentages for both teams, computed in one query
+    box_score = game_box_score(game)
+    team1, team2 = box_score[game.team_1_id], box_score[game.team_2_id]
+
+    # Fetch the first page of the game log, newest first
+    log_page = game_log_page(game.game_id)
+
+    return render_template('partials/game_summary_body.html', game=game,
+                           team1_box_scores=team1.rows,
+                           team2_box_scores=team2.rows,
+                           last_entries=log_page.items,
+                           log_cursor=log_page.next_cursor,
+                           team1_total_points=team1.totals['points'],
+                           team2_total_points=team2.totals['points'],
+                           team1_totals=team1.totals,
+                           team2_totals=team2.totals)
+
+
+@app.route('/games/<int:game_id>/log', methods=['GET'])
+@login_required
+@league_required
+def game_log(game_id):
+    # Older play-by-play for the "Load more" link under the game log
+    page = game_log_page(game_id, request.args.get('cursor'))
+    next_url = url_for('game_log', game_id=game_id, cursor=page.next_cursor) if page.next_cursor else None
+    return load_more_response('partials/game_log_rows.html', next_url, entries=page.items)
 
 
 @app.route('/log_action', methods=['POST'])
 @login_required
 @league_required
 def log_action():
-    data = request.get_json()
     try:
-        log_entry = GameLog(
-            gameid=data['gameid'],
-            teamid=data['teamid'],
-            playerid=data['playerid'],
-            actiontype=data['actiontype'],
-            action=data['action'],
-            actiondesc=data['actiondesc'],
-            currenttimer=data['currenttimer'],
-            gamelogdatetime=datetime.now()
-        )
-        db.session.add(log_entry)
+        row = parse_log_row(request.get_json(silent=True))
+    except EventError as e:
+        return jsonify({'status': 'error', 'message': str(e)})
+
+    try:
+        # Queued for the background writer, which publishes the row once committed; nothing here reads it back
+        entries = game_log_writer.write([row])
         db.session.commit()
-        return jsonify({'status': 'success'})
-    except Exception as e:
+    except SQLAlchemyError as e:
         db.session.rollback()
+        app.logger.error(f"SQLAlchemyError in log_action: {str(e)}")
         return jsonify({'status': 'error', 'message': str(e)})
+    publish_log_entries(row['gameid'], entries)
+    return jsonify({'status': 'success'})
+
+@app.route('/games/<int:game_id>/events', methods=['POST'])
+@login_required
+@league_required
+def game_events(game_id):
+    game = Game.query.get_or_404(game_id)
+
+    # Box scores are attributed to the latest season of the current league, like update_boxscore
+    current_league_id = g.league_context.league_id
+    latest_season = g.league_context.latest_season
+    if not latest_season:
+        return jsonify({'status': 'error', 'message': 'No season found for the current league.'}), 400
+
+    try:
+        payload = request.get_json(silent=True)
+        events = parse_events(payload, game)
+        batch_id = parse_batch_id(payload)
+    except EventError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    try:
+        # A resent batch whose first response was lost has already been applied; say so without applying it again
+        if batch_id is not None and not claim_batch(game_id, batch_id):
+            return jsonify({'status': 'success', 'applied': 0, 'duplicate': True})
+
+        # Box score deltas, play-by-play rows and the batch id for the whole batch share one transaction
+        log_entries = apply_events(game, events, current_league_id, latest_season.id)
+        db.session.commit()
+    except SQLAlchemyError as e:
+        app.logger.error(f"SQLAlchemyError in game_events: {str(e)}")
+        db.session.rollback()
+        return jsonify({'status': 'error', 'message': 'An internal server error occurred.'}), 500
+
+    # Push the changes to everyone watching the game
+    publish_box_scores(game_id, {event['player_id'] for event in events if event.get('player_id')})
+    publish_log_entries(game_id, log_entries)
+
+    return jsonify({'status': 'success', 'applied': len(log_entries)})
+
+
+@app.route('/games/<int:game_id>/stream')
+@login_required
+@league_required
+def game_stream(game_id):
+    game = Game.query.get_or_404(game_id)
+
+    # Subscribe before taking the snapshot so no update can fall between the two
+    subscription = broadcaster.subscribe(game_id)
+    try:
+        snapshot = game_snapshot(game)
+    except Exception:
+        broadcaster.unsubscribe(game_id, subscription)
+        raise
+
+    return Response(stream_game(game_id, subscription, snapshot), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/update_boxscore', methods=['POST'])
 @login_required
@@ -800,12 +889,12 @@ def log_action():
 def update_boxscore():
     try:
         # Fetch current league from session
-        current_league_id = session.get('selected_league_id')
+        current_league_id = g.league_context.league_id
         if not current_league_id:
             return jsonify({'status': 'error', 'message': 'League not found in session.'}), 400
 
-        # Fetch the latest season for the current league
-        latest_season = Season.query.filter_by(league_id=current_league_id).order_by(Season.start_date.desc()).first()
+        # Fetch the latest season for the current league, cached per process
+        latest_season = g.league_context.latest_season
         if not latest_season:
             return jsonify({'status': 'error', 'message': 'No season found for the current league.'}), 400
 
@@ -823,48 +912,13 @@ def update_boxscore():
         if not all([game_id, team_id, player_id, action]):
             return jsonify({'status': 'error', 'message': 'Missing required fields.'}), 400
 
-        # Fetch the game to get the game date
+        # Fetch the game, then add the action's counters to the player's BoxScore in a single upsert
         game = Game.query.get_or_404(game_id)
-        game_date = game.game_date
-
-        # Fetch or create the BoxScore entry for the game, team, and player
-        box_score = BoxScore.query.filter_by(game_id=game_id, team_id=team_id, player_id=player_id).first()
-        if not box_score:
-            box_score = BoxScore(
-                game_id=game_id,
-                team_id=team_id,
-                player_id=player_id,
-                league_id=current_league_id,
-                season_id=latest_season.id,
-                date_played=game_date,  # Set date_played from game date
-                fga=0, fgm=0, three_fga=0, three_fgm=0, fta=0, ftm=0,
-                oreb=0, dreb=0, assists=0, steals=0, blocks=0, turnovers=0, fouls=0, points=0
-            )
-            db.session.add(box_score)
-
-        # Dictionary to map actions to their corresponding updates
-        action_map = {
-            '2-Point Made': lambda bs: (setattr(bs, 'fga', (bs.fga or 0) + 1), setattr(bs, 'fgm', (bs.fgm or 0) + 1), setattr(bs, 'points', (bs.points or 0) + 2)),
-            '2-Point Miss': lambda bs: setattr(bs, 'fga', (bs.fga or 0) + 1),
-            '3-Point Made': lambda bs: (setattr(bs, 'fga', (bs.fga or 0) + 1), setattr(bs, 'fgm', (bs.fgm or 0) + 1), setattr(bs, 'three_fga', (bs.three_fga or 0) + 1), setattr(bs, 'three_fgm', (bs.three_fgm or 0) + 1), setattr(bs, 'points', (bs.points or 0) + 3)),
-            '3-Point Miss': lambda bs: (setattr(bs, 'fga', (bs.fga or 0) + 1), setattr(bs, 'three_fga', (bs.three_fga or 0) + 1)),
-            'FT Made': lambda bs: (setattr(bs, 'fta', (bs.fta or 0) + 1), setattr(bs, 'ftm', (bs.ftm or 0) + 1), setattr(bs, 'points', (bs.points or 0) + 1)),
-            'FT Miss': lambda bs: setattr(bs, 'fta', (bs.fta or 0) + 1),
-            'Offensive Rebound': lambda bs: setattr(bs, 'oreb', (bs.oreb or 0) + 1),
-            'Defensive Rebound': lambda bs: setattr(bs, 'dreb', (bs.dreb or 0) + 1),
-            'Assist': lambda bs: setattr(bs, 'assists', (bs.assists or 0) + 1),
-            'Steal': lambda bs: setattr(bs, 'steals', (bs.steals or 0) + 1),
-            'Block': lambda bs: setattr(bs, 'blocks', (bs.blocks or 0) + 1),
-            'Turnover': lambda bs: setattr(bs, 'turnovers', (bs.turnovers or 0) + 1),
-            'Foul': lambda bs: setattr(bs, 'fouls', (bs.fouls or 0) + 1)
-        }
-
-        # Apply the action if it's in the action map
-        if action in action_map:
-            action_map[action](box_score)
+        record_action(game, team_id, player_id, action, current_league_id, latest_season.id)
 
         # Commit the changes to the database
         db.session.commit()
+        publish_box_scores(int(game_id), [player_id])
 
         return jsonify({'status': 'success', 'message': 'BoxScore updated successfully.'})
 
@@ -889,13 +943,15 @@ def end_game():
 
     # Fetch the game
     game = Game.query.get_or_404(game_id)
+    already_played = game.scheduled_played == 'Played'
 
     # Update the game status
     game.scheduled_played = 'Played'
 
-    # Calculate the final scores
-    team_1_score = db.session.query(db.func.sum(BoxScore.points)).filter_by(game_id=game_id, team_id=game.team_1_id).scalar() or 0
-    team_2_score = db.session.query(db.func.sum(BoxScore.points)).filter_by(game_id=game_id, team_id=game.team_2_id).scalar() or 0
+    # Calculate the final scores from the team level of the box score
+    totals = game_team_totals(game)
+    team_1_score = totals[game.team_1_id]['points']
+    team_2_score = totals[game.team_2_id]['points']
 
     game.team_1_score = team_1_score
     game.team_2_score = team_2_score
@@ -908,8 +964,18 @@ def end_game():
     else:
         game.team_won = None  # Handle tie if applicable
 
+    # Update the standings in the same transaction; re-ending a game replays the whole season instead
+    if already_played:
+        db.session.flush()
+        rebuild_standings(game.league_id, game.season_id)
+    else:
+        record_game_result(game)
+    record_game_form(game)
+
     # Commit the changes to the database
     db.session.commit()
+    dashboard_cache.invalidate(game.league_id, game.season_id)
+    publish_final(game)
 
     return jsonify({'status': 'success', 'message': 'Game ended and scores updated.'})
 
@@ -0,0 +1,165 @@
+from sqlalchemy import and_, case, func, union_all
+from app import db
+from app.models import Game, Team, Standing
+from app.upserts import upsert
+
+
+def _team_sides(league_id, season_id):
+    # Every game contributes one row per participating team: (team, points for, points against)
+    home = db.select(
+        Game.team_1_id.label('team_id'),
+        Game.team_1_score.label('points_for'),
+        Game.team_2_score.label('points_against')
+    ).where(Game.league_id == league_id, Game.season_id == season_id)
+
+    away = db.select(
+        Game.team_2_id.label('team_id'),
+        Game.team_2_score.label('points_for'),
+        Game.team_1_score.label('points_against')
+    ).where(Game.league_id == league_id, Game.season_id == season_id)
+
+    return union_all(home, away).subquery('sides')
+
+
+def compute_standings(league_id, season_id):
+    """Wins, losses, win %, games back and rank for every team of a league/season in one query."""
+    sides = _team_sides(league_id, season_id)
+
+    wins = func.coalesce(func.sum(case((sides.c.points_for > sides.c.points_against, 1), else_=0)), 0)
+    losses = func.coalesce(func.sum(case((sides.c.points_for < sides.c.points_against, 1), else_=0)), 0)
+    points_for = func.coalesce(func.sum(sides.c.points_for), 0)
+    points_against = func.coalesce(func.sum(sides.c.points_against), 0)
+
+    rows = db.session.query(
+        Team,
+        wins.label('wins'),
+        losses.label('losses'),
+        points_for.label('points_for'),
+        points_against.label('points_against')
+    ).outerjoin(sides, sides.c.team_id == Team.teamID) \
+     .filter(Team.league_id == league_id) \
+     .group_by(Team.teamID).all()
+
+    standings = [{
+        'team': team,
+        'teamID': team.teamID,
+        'teamName': team.teamName,
+        'wins': int(w),
+        'losses': int(l),
+        'points_for': int(pf),
+        'points_against': int(pa)
+    } for team, w, l, pf, pa in rows]
+
+    return rank_standings(standings)
+
+
+def load_standings(league_id, season_id):
+    """Read the materialized standings of a league/season, including teams that have not played yet."""
+    rows = db.session.query(Team, Standing).outerjoin(
+        Standing,
+        and_(Standing.team_id == Team.teamID, Standing.league_id == league_id, Standing.season_id == season_id)
+    ).filter(Team.league_id == league_id).all()
+
+    standings = [{
+        'team': team,
+        'teamID': team.teamID,
+        'teamName': team.teamName,
+        'wins': standing.wins if standing else 0,
+        'losses': standing.losses if standing else 0,
+        'points_for': standing.points_for if standing else 0,
+        'points_against': standing.points_against if standing else 0,
+        'streak': standing.streak if standing else 0
+    } for team, standing in rows]
+
+    return rank_standings(standings)
+
+
+def _apply_result(standing, points_for, points_against):
+    standing.points_for += points_for
+    standing.points_against += points_against
+    if points_for > points_against:
+        standing.wins += 1
+        standing.streak = standing.streak + 1 if standing.streak > 0 else 1
+    elif points_for < points_against:
+        standing.losses += 1
+        standing.streak = standing.streak - 1 if standing.streak < 0 else -1
+
+
+def _new_standing(league_id, season_id, team_id):
+    return Standing(league_id=league_id, season_id=season_id, team_id=team_id,
+                    wins=0, losses=0, points_for=0, points_against=0, streak=0)
+
+
+def record_game_result(game):
+    """Fold a finished game into the standings table; the caller commits it together with the game."""
+    if game.league_id is None or game.season_id is None:
+        return
+
+    standings = Standing.__table__
+    sides = ((game.team_1_id, game.team_1_score, game.team_2_score),
+             (game.team_2_id, game.team_2_score, game.team_1_score))
+    for team_id, points_for, points_against in sides:
+        # A team's first result inserts its row; the upsert leaves an existing row alone, so two games
+        # ending at once for a new team cannot both insert it
+        key = dict(league_id=game.league_id, season_id=game.season_id, team_id=team_id)
+        upsert(
+            standings, ['league_id', 'season_id', 'team_id'],
+            dict(key, wins=0, losses=0, points_for=0, points_against=0, streak=0),
+            dict(streak=standings.c.streak)
+        )
+
+        # Lock the row so two games ending at once cannot both read the same totals
+        standing = Standing.query.filter_by(**key).with_for_update().one()
+        # The streak extends the stored one, so it follows the order games end in; rebuild_standings
+        # recounts it in (date, game_id) order when results arrive out of date order
+        _apply_result(standing, points_for, points_against)
+
+
+def rebuild_standings(league_id, season_id):
+    """Recompute the standings table of a league/season from its Game rows."""
+    Standing.query.filter_by(league_id=league_id, season_id=season_id).delete()
+
+    games = db.session.query(
+        Game.team_1_id, Game.team_2_id, Game.team_1_score, Game.team_2_score
+    ).filter(
+        Game.league_id == league_id,
+        Game.season_id == season_id,
+        Game.scheduled_played == 'Played'
+    ).order_by(Game.game_date, Game.game_id).all()
+
+    standings = {}
+    for team_1_id, team_2_id, team_1_score, team_2_score in games:
+        for team_id, points_for, points_against in ((team_1_id, team_1_score, team_2_score),
+                                                    (team_2_id, team_2_score, team_1_score)):
+            if team_id not in standings:
+                standings[team_id] = _new_standing(league_id, season_id, team_id)
+            _apply_result(standings[team_id], points_for, points_against)
+
+    db.session.add_all(standings.values())
+    return len(games)
+
+
+def format_streak(streak):
+    if streak > 0:
+        return f'W{streak}'
+    if streak < 0:
+        return f'L{-streak}'
+    return '-'
+
+
+def rank_standings(standings):
+    # Sort by wins (descending) then losses, and fill in win %, games back and rank
+    standings.sort(key=lambda x: (-x['wins'], x['losses'], x['teamName']))
+
+    leader = standings[0] if standings else None
+    for index, standing in enumerate(standings):
+        decided = standing['wins'] + standing['losses']
+        standing['win_pct'] = round(standing['wins'] / decided, 3) if decided > 0 else 0.0
+        standing['games_back'] = ((leader['wins'] - standing['wins']) + (standing['losses'] - leader['losses'])) / 2
+        standing['rank'] = index + 1
+
+    return standings
+
+
+def team_standing(standings, team_id):
+    return next((standing for standing in standings if standing['teamID'] == team_id), None)
@@ -0,0 +1,20 @@
+from flask import g, request
+from app import app
+
+
+class StatementBudgetExceeded(RuntimeError):
+    """A request issued more statements than MAX_STATEMENTS_PER_REQUEST allows."""
+
+
+@app.after_request
+def _check_statement_budget(response):
+    # An N+1 shows up as a statement count that grows with the data; fail loudly in tests, log in production.
+    # Only reads are held to it: a write's statements grow with the batch it carries, one upsert per player
+    limit = app.config.get('MAX_STATEMENTS_PER_REQUEST')
+    count = g.get('sql_statements')  # Counted per request by app.metrics
+    if limit and count is not None and count > limit and request.method in ('GET', 'HEAD'):
+        message = f'{request.method} {request.path} ({request.endpoint}) issued {count} statements, more than {limit}'
+        if app.testing:
+            raise StatementBudgetExceeded(message)
+        app.logger.warning(message)
+    return response
@@ -0,0 +1,109 @@
+// Live box scores and play-by-play pushed by /games/<id>/stream
+function connectGameStream(gameId, options) {
+    const rows = new Map();  // player_id -> latest box score row
+    let team1Id = null;
+    let team2Id = null;
+
+    function cell(text, className) {
+        const td = document.createElement('td');
+        td.textContent = text;
+        if (className) {
+            td.className = className;
+        }
+        return td;
+    }
+
+    function renderTeam(teamId, tbody, totalElement) {
+        if (!tbody) {
+            return;
+        }
+        let total = 0;
+        tbody.replaceChildren();
+        rows.forEach(box => {
+            if (box.team_id !== teamId) {
+                return;
+            }
+            total += box.points;
+
+            const tr = document.createElement('tr');
+            const name = cell(`${box.name} `, 'player-name');
+            const jersey = document.createElement('span');
+            jersey.textContent = box.jersey;
+            name.appendChild(jersey);
+            tr.appendChild(name);
+            [
+                `${box.fgm}-${box.fga}`, `${box.three_fgm}-${box.three_fga}`, `${box.ftm}-${box.fta}`,
+                box.oreb, box.dreb, box.oreb + box.dreb, box.assists, box.steals, box.blocks,
+                box.turnovers, box.fouls, box.points
+            ].forEach(value => tr.appendChild(cell(value)));
+            tbody.appendChild(tr);
+        });
+
+        if (options.totalsRow) {
+            const tr = document.createElement('tr');
+            tr.className = 'font-weight-bold';
+            tr.appendChild(cell('Total'));
+            const totalCell = cell(total);
+            totalCell.colSpan = 12;
+            tr.appendChild(totalCell);
+            tbody.appendChild(tr);
+        }
+        if (totalElement) {
+            totalElement.textContent = total;
+        }
+    }
+
+    function render() {
+        renderTeam(team1Id, options.team1Body, options.team1Total);
+        renderTeam(team2Id, options.team2Body, options.team2Total);
+    }
+
+    const source = new EventSource(`/games/${gameId}/stream`);
+
+    source.addEventListener('snapshot', event => {
+        const data = JSON.parse(event.data);
+        team1Id = data.team1_id;
+        team2Id = data.team2_id;
+        rows.clear();
+        data.rows.forEach(box => rows.set(box.player_id, box));
+        render();
+    });
+
+    source.addEventListener('boxscore', event => {
+        JSON.parse(event.data).rows.forEach(box => {
+            // Concurrent writes can publish out of order; never replace a row with an older version
+            const current = rows.get(box.player_id);
+            if (!current || box.version >= current.version) {
+                rows.set(box.player_id, box);
+            }
+        });
+        render();
+    });
+
+    source.addEventListener('log', event => {
+        const body = options.logBody;
+        if (!body) {
+            return;
+        }
+        JSON.parse(event.data).entries.forEach(entry => {
+            const tr = document.createElement('tr');
+            tr.appendChild(cell(entry.timer || ''));
+            tr.appendChild(cell(entry.description || ''));
+            body.prepend(tr);
+        });
+        // Pages that page through older entries pass no limit, so rows loaded on demand stay put
+        while (options.logLimit && body.rows.length > options.logLimit) {
+            body.deleteRow(-1);
+        }
+    });
+
+    source.addEventListener('final', event => {
+        // Nothing changes after the game ends, so stop the browser from reconnecting
+        source.close();
+        if (options.onFinal) {
+            options.onFinal(JSON.parse(event.data));
+        }
+    });
+
+    return source;
+}
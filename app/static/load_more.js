@@ -0,0 +1,22 @@
+// "Load more" links on keyset listings: fetch the next page and append it in place
+document.addEventListener('click', event => {
+    const link = event.target.closest('a.load-more');
+    if (!link) {
+        return;
+    }
+    event.preventDefault();
+
+    const url = new URL(link.href);
+    url.searchParams.set('partial', '1');
+    fetch(url, { credentials: 'same-origin' })
+        .then(response => response.json())
+        .then(data => {
+            document.getElementById(link.dataset.target).insertAdjacentHTML('beforeend', data.html);
+            if (data.next_url) {
+                link.href = data.next_url;
+            } else {
+                link.remove();
+            }
+        })
+        .catch(error => console.error('Error loading more rows:', error));
+});
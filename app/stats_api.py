@@ -0,0 +1,156 @@
+from collections import namedtuple
+from datetime import date
+from decimal import Decimal
+from functools import lru_cache
+from sqlalchemy import Integer, bindparam, func, select
+from app import db
+from app.box_scores import PERCENTAGES, percentage
+from app.models import BoxScore, Player, Team
+from app.player_stats import STAT_COLUMNS
+
+DEFAULT_LIMIT = 25
+MAX_LIMIT = 500
+
+# Columns that identify a ranked row, by grouping
+IDENTITY = {
+    'players': {
+        'player_id': Player.playerID,
+        'firstName': Player.firstName,
+        'lastName': Player.lastName,
+        'jerseyNumber': Player.jerseyNumber,
+        'team_id': Player.teamID,
+    },
+    'teams': {
+        'team_id': Team.teamID,
+        'teamName': Team.teamName,
+    },
+}
+
+DEFAULT_FIELDS = {
+    'players': ('player_id', 'firstName', 'lastName', 'games', 'points', 'points_per_game', 'fg_percent'),
+    'teams': ('team_id', 'teamName', 'games', 'points', 'points_per_game', 'fg_percent'),
+}
+
+# Optional filters and the comparison each one binds
+FILTERS = {
+    'season_id': lambda value: BoxScore.season_id == value,
+    'team_id': lambda value: BoxScore.team_id == value,
+    'date_from': lambda value: BoxScore.date_played >= value,
+    'date_to': lambda value: BoxScore.date_played <= value,
+}
+
+# Counter a rate is qualified by; min_attempts applies to it, or to field goal attempts for anything else
+ATTEMPTS = {name: attempted for name, (made, attempted) in PERCENTAGES.items()}
+
+# One parsed request; everything but `params` decides the SQL, so equal shapes share a statement
+StatsQuery = namedtuple('StatsQuery', ['group', 'fields', 'sort', 'descending', 'filters', 'qualified', 'params'])
+
+
+class StatsQueryError(ValueError):
+    pass
+
+
+def _stat_expressions():
+    totals = {column: func.sum(getattr(BoxScore, column)) for column in STAT_COLUMNS}
+    totals['reb'] = totals['oreb'] + totals['dreb']
+    games = func.count(func.distinct(BoxScore.game_id))
+
+    stats = {'games': games}
+    stats.update(totals)
+    stats.update({name: percentage(totals[made], totals[attempted]) for name, (made, attempted) in PERCENTAGES.items()})
+    stats.update({f'{column}_per_game': func.round(total * 1.0 / games, 2) for column, total in totals.items()})
+    return stats
+
+
+STATS = _stat_expressions()
+
+
+def available_fields(group):
+    return list(IDENTITY[group]) + list(STATS)
+
+
+def parse_stats_query(args, default_league_id=None):
+    """Validate the query string of /api/v1/stats."""
+    group = args.get('group', 'players')
+    if group not in IDENTITY:
+        raise StatsQueryError(f'group must be one of {", ".join(IDENTITY)}.')
+    known = available_fields(group)
+
+    fields = tuple(args['fields'].split(',')) if args.get('fields') else DEFAULT_FIELDS[group]
+    unknown = [field for field in fields if field not in known]
+    if unknown:
+        raise StatsQueryError(f'Unknown fields: {", ".join(unknown)}. Available: {", ".join(known)}.')
+
+    sort = args.get('sort', 'points')
+    if sort not in STATS:
+        raise StatsQueryError(f'sort must be a stat: {", ".join(STATS)}.')
+    order = args.get('order', 'desc')
+    if order not in ('asc', 'desc'):
+        raise StatsQueryError('order must be asc or desc.')
+
+    params = {}
+    league_id = args.get('league_id', default_league_id)
+    try:
+        params['league_id'] = int(league_id)
+        params['limit'] = max(1, min(int(args.get('limit', DEFAULT_LIMIT)), MAX_LIMIT))
+        for name in ('season_id', 'team_id'):
+            if args.get(name):
+                params[name] = int(args[name])
+        if args.get('min_attempts'):
+            params['min_attempts'] = int(args['min_attempts'])
+    except (TypeError, ValueError):
+        raise StatsQueryError('league_id, season_id, team_id, limit and min_attempts must be whole numbers.')
+    for name in ('date_from', 'date_to'):
+        if args.get(name):
+            try:
+                params[name] = date.fromisoformat(args[name])
+            except ValueError:
+                raise StatsQueryError(f'{name} must be a YYYY-MM-DD date.')
+
+    filters = tuple(name for name in FILTERS if name in params)
+    qualified = ATTEMPTS.get(sort, 'fga') if 'min_attempts' in params else None
+    return StatsQuery(group, fields, sort, order == 'desc', filters, qualified, params)
+
+
+@lru_cache(maxsize=256)
+def stats_statement(group, fields, sort, descending, filters, qualified):
+    """The SELECT for one query shape, with every value left as a bound parameter.
+
+    Built once per shape and reused, so repeat requests skip statement construction and hit SQLAlchemy's
+    compiled cache.
+    """
+    identity = IDENTITY[group]
+    key = next(iter(identity.values()))
+    columns = [(identity.get(field) if field in identity else STATS[field]).label(field) for field in fields]
+
+    statement = select(*columns).select_from(BoxScore)
+    if group == 'players':
+        statement = statement.join(Player, Player.playerID == BoxScore.player_id)
+    else:
+        statement = statement.join(Team, Team.teamID == BoxScore.team_id)
+
+    statement = statement.where(BoxScore.league_id == bindparam('league_id'))
+    for name in filters:
+        statement = statement.where(FILTERS[name](bindparam(name)))
+    statement = statement.group_by(*identity.values())
+    if qualified:
+        statement = statement.having(STATS[qualified] >= bindparam('min_attempts'))
+
+    order = STATS[sort].desc() if descending else STATS[sort].asc()
+    return statement.order_by(order, key).limit(bindparam('limit', type_=Integer))
+
+
+def _plain(value):
+    # SUM() comes back as Decimal on MySQL; JSON wants plain numbers
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+
+def run_stats_query(query):
+    statement = stats_statement(query.group, query.fields, query.sort, query.descending, query.filters, query.qualified)
+    rows = db.session.execute(statement, query.params)
+    return {
+        'columns': list(query.fields),
+        'rows': [[_plain(value) for value in row] for row in rows],
+    }
@@ -0,0 +1,44 @@
+from sqlalchemy import and_
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from app import db
+
+
+def _native_upsert(dialect, table, key, values, updates):
+    # INSERT ... ON DUPLICATE KEY UPDATE on MySQL, INSERT ... ON CONFLICT DO UPDATE on SQLite/PostgreSQL
+    if dialect == 'mysql':
+        return mysql.insert(table).values(**values).on_duplicate_key_update(**updates)
+    if dialect == 'sqlite':
+        return sqlite.insert(table).values(**values).on_conflict_do_update(index_elements=key, set_=updates)
+    if dialect == 'postgresql':
+        return postgresql.insert(table).values(**values).on_conflict_do_update(index_elements=key, set_=updates)
+    return None
+
+
+def _locked_upsert(table, key, values, updates):
+    # Other databases: lock the row if it exists and update it, otherwise insert it. An insert that loses a
+    # race to another transaction's insert rolls back to its savepoint and updates the winner's row instead
+    match = and_(*(table.c[column] == values[column] for column in key))
+    for _ in range(2):
+        if db.session.execute(db.select(*(table.c[column] for column in key)).where(match).with_for_update()).first():
+            db.session.execute(db.update(table).where(match).values(**updates))
+            return
+        try:
+            with db.session.begin_nested():
+                db.session.execute(db.insert(table).values(**values))
+            return
+        except IntegrityError:
+            continue
+    raise RuntimeError(f'Could not upsert into {table.name}: the row kept appearing and disappearing.')
+
+
+def upsert(table, key, values, updates):
+    """Insert values as a new row of table, or apply updates to the row already holding its key columns.
+
+    updates may refer to the row's current values, e.g. table.c.points + 2.
+    """
+    statement = _native_upsert(db.session.get_bind().dialect.name, table, key, values, updates)
+    if statement is None:
+        _locked_upsert(table, key, values, updates)
+    else:
+        db.session.execute(statement)
@@ -10,3 +10,20 @@ class Config:
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     ADMINS = ['mjfahad1012@gmail.com']
+    # Most SQL statements one page (GET) may issue; 0 disables the check. Exceeding it raises under TESTING and logs otherwise
+    MAX_STATEMENTS_PER_REQUEST = int(os.environ.get('MAX_STATEMENTS_PER_REQUEST') or 0)
+    # Requests slower than this many seconds are logged with every statement they issued; 0 disables the log
+    SLOW_REQUEST_SECONDS = float(os.environ.get('SLOW_REQUEST_SECONDS') or 0)
+    # Play-by-play rows queued for the background log writer before requests block; 0 writes them on the request thread
+    GAMELOG_BUFFER_ROWS = int(os.environ.get('GAMELOG_BUFFER_ROWS') or 10000)
+    # The log writer flushes once this many rows are queued or the oldest has waited this many seconds; a crashed
+    # process loses at most the rows of that window, a clean shutdown flushes them
+    GAMELOG_FLUSH_ROWS = int(os.environ.get('GAMELOG_FLUSH_ROWS') or 500)
+    GAMELOG_FLUSH_SECONDS = float(os.environ.get('GAMELOG_FLUSH_SECONDS') or 0.25)
+    # Rendered summaries of completed games kept in memory, and an optional directory that keeps them across restarts
+    RENDER_CACHE_ENTRIES = int(os.environ.get('RENDER_CACHE_ENTRIES') or 256)
+    RENDER_CACHE_DIR = os.environ.get('RENDER_CACHE_DIR')
+    # Most summary files kept in RENDER_CACHE_DIR, one per game; the least recently written go first
+    RENDER_CACHE_DIR_ENTRIES = int(os.environ.get('RENDER_CACHE_DIR_ENTRIES') or 10000)
+    # Seconds a cached league dashboard may be served before it is recomputed; 0 disables the cache
+    DASHBOARD_CACHE_SECONDS = int(os.environ.get('DASHBOARD_CACHE_SECONDS') or 60)
@@ -0,0 +1,23 @@
+import os
+import tempfile
+
+# The app reads DATABASE_URL when it is imported; a file rather than :memory: so threads share one database
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'courtinsight.db')
+
+import pytest
+from app import app, db
+
+
+@pytest.fixture(scope='session')
+def database():
+    # One schema for the session; each test seeds its own league, so tests never see each other's rows
+    app.config['TESTING'] = True
+    # Any request over this many statements raises StatementBudgetExceeded, so N+1 regressions fail the suite
+    app.config['MAX_STATEMENTS_PER_REQUEST'] = 10
+    # Game log rows are written in the request unless a test runs the background writer itself
+    app.config['GAMELOG_BUFFER_ROWS'] = 0
+    with app.app_context():
+        db.create_all()
+    yield db
+    with app.app_context():
+        db.drop_all()
@@ -0,0 +1,129 @@
+import threading
+from datetime import date
+import pytest
+from sqlalchemy import inspect
+from sqlalchemy.exc import IntegrityError
+from app import app, db
+from app.bench import logged_in_client, seed_game, seed_league
+from app.migrations import add_box_score_key
+from app.models import BoxScore, GameLog, PlayerSeasonStats, Standing
+
+THREADS = 8
+EVENTS_PER_THREAD = 5
+
+
+def test_concurrent_scorers_share_one_box_score(database):
+    with app.app_context():
+        league_id, season_id = seed_league(2, 0)
+        game_id, rosters = seed_game(league_id, season_id, 1)
+        team_id, (player_id,) = next(iter(rosters.items()))
+        clients = [logged_in_client(league_id) for _ in range(THREADS)]
+
+    # Half the scorers post single actions, half post event batches; none of them finds a row to update
+    def post(client, batched):
+        barrier.wait()
+        for _ in range(EVENTS_PER_THREAD):
+            if batched:
+                response = client.post(f'/games/{game_id}/events', json={'events': [
+                    {'team_id': team_id, 'player_id': player_id, 'action': '2-Point Made'}]})
+            else:
+                response = client.post('/update_boxscore', json={
+                    'game_id': game_id, 'team_id': team_id, 'player_id': player_id, 'action': '2-Point Made'})
+            statuses.append(response.status_code)
+
+    barrier = threading.Barrier(THREADS)
+    statuses = []
+    threads = [threading.Thread(target=post, args=(client, i % 2 == 0)) for i, client in enumerate(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    events = THREADS * EVENTS_PER_THREAD
+    assert statuses == [200] * events
+    with app.app_context():
+        box_score = BoxScore.query.filter_by(game_id=game_id).one()
+        assert (box_score.player_id, box_score.fgm, box_score.fga, box_score.points) == \
+            (player_id, events, events, 2 * events)
+        season_stats = PlayerSeasonStats.query.filter_by(season_id=season_id, player_id=player_id).one()
+        assert (season_stats.games_played, season_stats.points) == (1, 2 * events)
+
+
+def test_merge_duplicate_box_scores_before_unique_key(database):
+    index = next(index for index in BoxScore.__table__.indexes if index.name == 'uq_box_scores_game_team_player')
+    with app.app_context():
+        league_id, season_id = seed_league(2, 0, seed=1)
+        game_id, rosters = seed_game(league_id, season_id, 2)
+        team_id, (player_id, teammate_id) = next(iter(rosters.items()))
+
+        def box_score(player, **stats):
+            return BoxScore(game_id=game_id, team_id=team_id, player_id=player, league_id=league_id,
+                            season_id=season_id, date_played=date.today(), **stats)
+
+        # A database from before the key, where racing scorers inserted the same player's row three times
+        index.drop(db.engine)
+        try:
+            rows = [box_score(player_id, points=2, fouls=1), box_score(player_id, points=3, assists=1),
+                    box_score(player_id, points=1, fouls=1), box_score(teammate_id, points=4)]
+            db.session.add_all(rows)
+            db.session.commit()
+            oldest_id = rows[0].box_score_id
+
+            add_box_score_key()
+
+            merged = BoxScore.query.filter_by(game_id=game_id, player_id=player_id).one()
+            assert (merged.box_score_id, merged.points, merged.fouls, merged.assists) == (oldest_id, 6, 2, 1)
+            assert BoxScore.query.filter_by(game_id=game_id, player_id=teammate_id).one().points == 4
+            assert index.name in {i['name'] for i in inspect(db.engine).get_indexes('box_scores')}
+
+            # With the key in place a second row for the player is refused
+            db.session.add(box_score(player_id, points=2))
+            with pytest.raises(IntegrityError):
+                db.session.commit()
+            db.session.rollback()
+        finally:
+            index.create(db.engine, checkfirst=True)
+
+
+def test_resent_batch_is_applied_once(database):
+    with app.app_context():
+        league_id, season_id = seed_league(2, 0, seed=2)
+        game_id, rosters = seed_game(league_id, season_id, 1)
+        team_id, (player_id,) = next(iter(rosters.items()))
+        client = logged_in_client(league_id)
+
+    # The scorer page resends a batch under the same id when it never saw the first response
+    batch = {'batch_id': 'b6c1d8e2-resend', 'events': [
+        {'team_id': team_id, 'player_id': player_id, 'action': '3-Point Made'},
+        {'team_id': team_id, 'player_id': player_id, 'action': 'Assist'}]}
+    first = client.post(f'/games/{game_id}/events', json=batch).json
+    resent = client.post(f'/games/{game_id}/events', json=batch).json
+
+    assert (first['applied'], resent['applied'], resent.get('duplicate')) == (2, 0, True)
+    with app.app_context():
+        box_score = BoxScore.query.filter_by(game_id=game_id).one()
+        assert (box_score.points, box_score.assists) == (3, 1)
+        assert GameLog.query.filter_by(gameid=game_id).count() == 2
+
+
+def test_locked_upsert_fallback(database, monkeypatch):
+    # Databases without a native upsert lock the row and update it, or insert it when there is none
+    monkeypatch.setattr('app.upserts._native_upsert', lambda *args: None)
+    with app.app_context():
+        league_id, season_id = seed_league(2, 0, seed=3)
+        game_id, rosters = seed_game(league_id, season_id, 1)
+        team_id, (player_id,) = next(iter(rosters.items()))
+        client = logged_in_client(league_id)
+
+    for action in ('2-Point Made', '3-Point Made', 'Assist'):
+        response = client.post('/update_boxscore', json={
+            'game_id': game_id, 'team_id': team_id, 'player_id': player_id, 'action': action})
+        assert response.status_code == 200
+    assert client.post('/end_game', json={'game_id': game_id}).json['status'] == 'success'
+
+    with app.app_context():
+        box_score = BoxScore.query.filter_by(game_id=game_id).one()
+        assert (box_score.points, box_score.fgm, box_score.assists) == (5, 2, 1)
+        season_stats = PlayerSeasonStats.query.filter_by(season_id=season_id, player_id=player_id).one()
+        assert (season_stats.games_played, season_stats.points) == (1, 5)
+        assert Standing.query.filter_by(season_id=season_id, team_id=team_id).one().wins == 1
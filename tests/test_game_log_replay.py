@@ -0,0 +1,30 @@
+from app import app, db
+from app.bench import logged_in_client, seed_game, seed_league
+from app.game_log_replay import replay_game_log
+from app.models import Game
+
+
+def test_score_only_correction_moves_the_summary_etag(database):
+    with app.app_context():
+        league_id, season_id = seed_league(2, 0, seed=50)
+        game_id, rosters = seed_game(league_id, season_id, 1)
+        team_id, (player_id,) = next(iter(rosters.items()))
+        client = logged_in_client(league_id)
+    client.post(f'/games/{game_id}/events', json={'events': [
+        {'team_id': team_id, 'player_id': player_id, 'action': '2-Point Made'}]})
+    client.post('/end_game', json={'game_id': game_id})
+
+    # The stored final score drifts from the box scores and log, which still agree with each other
+    with app.app_context():
+        db.session.execute(db.update(Game).where(Game.game_id == game_id).values(team_1_score=9))
+        db.session.commit()
+    stale = client.get(f'/game_summary/{game_id}')
+
+    with app.app_context():
+        replay = replay_game_log([game_id])
+        db.session.commit()
+        assert (replay.counts['scores_updated'], replay.counts['box_scores_updated']) == (1, 0)
+
+    # Every worker builds its cache key and ETag from the version, so the corrected page cannot be a 304
+    response = client.get(f'/game_summary/{game_id}', headers={'If-None-Match': stale.headers['ETag']})
+    assert response.status_code == 200 and response.headers['ETag'] != stale.headers['ETag']
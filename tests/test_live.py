@@ -0,0 +1,66 @@
+import json
+from app import app
+from app.bench import logged_in_client, seed_game, seed_league
+from app.live import broadcaster
+
+SUBSCRIBERS = 3
+
+
+def sse_events(response):
+    # (event, data) per message of a streamed response, skipping keep-alive comments
+    for chunk in response.iter_encoded():
+        message = chunk.decode()
+        if message.startswith(':'):
+            continue
+        event, data = message.strip().split('\n')
+        yield event[len('event: '):], json.loads(data[len('data: '):])
+
+
+def start_game(seed):
+    with app.app_context():
+        league_id, season_id = seed_league(2, 0, seed=seed)
+        game_id, rosters = seed_game(league_id, season_id, 2)
+        team_id, (player_id, _) = next(iter(rosters.items()))
+        return logged_in_client(league_id), game_id, team_id, player_id
+
+
+def post_action(client, game_id, team_id, player_id):
+    response = client.post(f'/games/{game_id}/events', json={'events': [
+        {'team_id': team_id, 'player_id': player_id, 'action': '3-Point Made', 'current_timer': '00:01:00'}]})
+    assert response.status_code == 200
+
+
+def test_every_subscriber_follows_the_game_to_the_end(database):
+    client, game_id, team_id, player_id = start_game(seed=10)
+    streams = [sse_events(client.get(f'/games/{game_id}/stream', buffered=False)) for _ in range(SUBSCRIBERS)]
+    for stream in streams:
+        event, snapshot = next(stream)
+        assert (event, snapshot['game_id'], snapshot['rows']) == ('snapshot', game_id, [])
+    assert broadcaster.subscriber_count(game_id) == SUBSCRIBERS
+
+    post_action(client, game_id, team_id, player_id)
+    assert client.post('/end_game', json={'game_id': game_id}).status_code == 200
+
+    for stream in streams:
+        events = list(stream)
+        assert [event for event, _ in events] == ['boxscore', 'log', 'final']
+        boxscore, log, final = (data for _, data in events)
+        assert [(row['player_id'], row['points']) for row in boxscore['rows']] == [(player_id, 3)]
+        assert log['entries'][0]['id'] is not None and log['entries'][0]['action'] == '3-Point Made'
+        assert (final['team_won'], final['team_1_score'] + final['team_2_score']) == (team_id, 3)
+    assert broadcaster.subscriber_count(game_id) == 0
+
+
+def test_slow_subscriber_is_dropped_and_told_to_resync(database, monkeypatch):
+    client, game_id, team_id, player_id = start_game(seed=11)
+    monkeypatch.setattr(broadcaster, 'max_pending', 2)
+    stream = sse_events(client.get(f'/games/{game_id}/stream', buffered=False))
+    assert next(stream)[0] == 'snapshot'
+
+    # The stream reads nothing while three writes publish six updates; its queue holds two
+    for _ in range(3):
+        post_action(client, game_id, team_id, player_id)
+    assert broadcaster.subscriber_count(game_id) == 0
+
+    # What was queued is still delivered, then the browser is told to fetch a fresh snapshot
+    assert [event for event, _ in stream] == ['boxscore', 'log', 'resync']
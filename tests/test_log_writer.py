@@ -0,0 +1,59 @@
+import pytest
+from app import app
+from app.bench import logged_in_client, seed_game, seed_league
+from app.game_log_replay import replay_game_log
+from app.live import broadcaster
+from app.log_writer import game_log_writer
+from app.models import GameLog
+
+ROWS = 20
+
+
+@pytest.fixture
+def background_writer(database, monkeypatch):
+    monkeypatch.setitem(app.config, 'GAMELOG_BUFFER_ROWS', 100)
+    monkeypatch.setitem(app.config, 'GAMELOG_FLUSH_ROWS', 1000)
+    monkeypatch.setitem(app.config, 'GAMELOG_FLUSH_SECONDS', 0.5)
+    yield game_log_writer
+    game_log_writer.close()
+
+
+def log_action(client, game_id, team_id, player_id, n):
+    response = client.post('/log_action', json={
+        'gameid': game_id, 'teamid': team_id, 'playerid': player_id, 'actiontype': 'Game Action',
+        'action': '2-Point Made', 'actiondesc': f'Basket {n}', 'currenttimer': '00:05:00'})
+    assert response.json['status'] == 'success'
+
+
+def test_queued_rows_are_bulk_inserted_then_published(background_writer):
+    with app.app_context():
+        league_id, season_id = seed_league(2, 0, seed=30)
+        game_id, rosters = seed_game(league_id, season_id, 1)
+        team_id, (player_id,) = next(iter(rosters.items()))
+        client = logged_in_client(league_id)
+    subscription = broadcaster.subscribe(game_id)
+    batches = background_writer.batches
+
+    try:
+        for n in range(ROWS):
+            log_action(client, game_id, team_id, player_id, n)
+
+        # Acknowledged on enqueue: nothing is in the table until the time threshold flushes the batch
+        assert background_writer.pending_games() == {game_id}
+        with app.app_context():
+            assert GameLog.query.filter_by(gameid=game_id).count() == 0
+            assert replay_game_log([game_id]).counts['queued_log_games'] == 1
+
+        background_writer.drain()
+        with app.app_context():
+            ids = [entry.gamelogid for entry in GameLog.query.filter_by(gameid=game_id).order_by(GameLog.gamelogid)]
+        assert len(ids) == ROWS and background_writer.batches == batches + 1
+        assert background_writer.pending_games() == set()
+
+        # The live stream hears about the rows only once they are committed, with their ids
+        event, data = subscription.get(timeout=1)
+        assert event == 'log'
+        assert [entry['id'] for entry in data['entries']] == ids
+        assert [entry['description'] for entry in data['entries']] == [f'Basket {n}' for n in range(ROWS)]
+    finally:
+        broadcaster.unsubscribe(game_id, subscription)
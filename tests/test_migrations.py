@@ -0,0 +1,30 @@
+from datetime import date
+from app import app, db
+from app.bench import seed_game, seed_league
+from app.migrations import schema_migrations, upgrade
+from app.models import BoxScore, PlayerSeasonStats
+from app.standings import compute_standings, load_standings
+
+
+def test_upgrade_backfills_standings_and_player_totals(database):
+    # A database from before standings and player_season_stats: games and box scores, empty aggregate tables
+    with app.app_context():
+        league_id, season_id = seed_league(4, 4, seed=40)
+        game_id, rosters = seed_game(league_id, season_id, 1)
+        team_id, (player_id,) = next(iter(rosters.items()))
+        db.session.add(BoxScore(game_id=game_id, team_id=team_id, player_id=player_id, league_id=league_id,
+                                season_id=season_id, date_played=date.today(), points=7, assists=2))
+        db.session.commit()
+        with db.engine.begin() as connection:
+            connection.execute(schema_migrations.delete().where(
+                schema_migrations.c.name.in_(['standings_backfill', 'player_season_stats_backfill'])))
+
+        applied = list(upgrade())
+
+        assert {'standings_backfill', 'player_season_stats_backfill'} <= set(applied)
+        columns = ('teamID', 'wins', 'losses', 'points_for', 'points_against')
+        expected = [[standing[column] for column in columns] for standing in compute_standings(league_id, season_id)]
+        assert [[standing[column] for column in columns] for standing in load_standings(league_id, season_id)] \
+            == expected
+        totals = PlayerSeasonStats.query.filter_by(season_id=season_id, player_id=player_id).one()
+        assert (totals.games_played, totals.points, totals.assists) == (1, 7, 2)
@@ -0,0 +1,27 @@
+import os
+from app import app
+from app.render_cache import RenderCache
+
+
+def test_disk_store_keeps_one_bounded_file_per_game(database, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'RENDER_CACHE_DIR', str(tmp_path))
+    monkeypatch.setitem(app.config, 'RENDER_CACHE_DIR_ENTRIES', 10)
+    cache = RenderCache('test-summary')
+
+    # A newer version of a game replaces its file; another process reads it, but not for the old version
+    cache.put((1, 1, 100), '<p>v1</p>')
+    cache.put((1, 2, 100), '<p>v2</p>')
+    assert os.listdir(tmp_path) == ['test-summary-1.html']
+    other_worker = RenderCache('test-summary')
+    assert other_worker.get((1, 2, 100)) == '<p>v2</p>'
+    assert other_worker.get((1, 1, 100)) is None
+
+    cache.invalidate(1)
+    assert os.listdir(tmp_path) == []
+    assert RenderCache('test-summary').get((1, 2, 100)) is None
+
+    for game_id in range(25):
+        cache.put((game_id, 1, 0), f'<p>{game_id}</p>')
+    files = os.listdir(tmp_path)
+    assert len(files) <= 10
+    assert 'test-summary-24.html' in files
@@ -0,0 +1,56 @@
+from datetime import date
+from app import app, db
+from app.bench import logged_in_client, seed_league
+from app.models import Game, Player, Standing, Team
+from app.standings import format_streak, rebuild_standings
+
+
+def standings_rows(league_id, season_id):
+    rows = Standing.query.filter_by(league_id=league_id, season_id=season_id).order_by(Standing.team_id)
+    return [(row.team_id, row.wins, row.losses, row.points_for, row.points_against, format_streak(row.streak))
+            for row in rows]
+
+
+def play_three_games(seed, end_order):
+    # Team 1 wins on the 1st and 3rd and loses on the 2nd; the scorer ends the games in end_order.
+    # Returns the incremental standings, the rebuilt ones and the two team ids
+    with app.app_context():
+        league_id, season_id = seed_league(2, 0, seed=seed)
+        teams = Team.query.filter_by(league_id=league_id).order_by(Team.teamID).all()
+        players = [Player(firstName='Test', lastName=team.teamName, jerseyNumber=1, teamID=team.teamID)
+                   for team in teams]
+        games = [Game(game_date=date(2024, 3, day), team_1_id=teams[0].teamID, team_2_id=teams[1].teamID,
+                      league_id=league_id, season_id=season_id, scheduled_played='Ongoing') for day in (1, 2, 3)]
+        db.session.add_all(players + games)
+        db.session.commit()
+        scorers = {player.teamID: player.playerID for player in players}
+        team_1, team_2 = scorers
+        game_ids = [game.game_id for game in games]
+        client = logged_in_client(league_id)
+
+    for game_id, winner in zip(game_ids, (team_1, team_2, team_1)):
+        response = client.post(f'/games/{game_id}/events', json={'events': [
+            {'team_id': winner, 'player_id': scorers[winner], 'action': '2-Point Made'}]})
+        assert response.status_code == 200
+    for index in end_order:
+        assert client.post('/end_game', json={'game_id': game_ids[index]}).json['status'] == 'success'
+
+    with app.app_context():
+        incremental = standings_rows(league_id, season_id)
+        rebuild_standings(league_id, season_id)
+        db.session.commit()
+        return incremental, standings_rows(league_id, season_id), team_1, team_2
+
+
+def test_games_ended_in_order_match_a_rebuild(database):
+    incremental, rebuilt, team_1, team_2 = play_three_games(21, (0, 1, 2))
+    assert incremental == rebuilt
+    assert incremental == [(team_1, 2, 1, 4, 2, 'W1'), (team_2, 1, 2, 2, 4, 'L1')]
+
+
+def test_games_ended_out_of_order_keep_totals_and_streak_by_end_order(database):
+    incremental, rebuilt, team_1, team_2 = play_three_games(20, (2, 0, 1))
+    # Totals match a rebuild; the streak extends the stored one, so it follows the order the games ended in
+    assert [row[:5] for row in incremental] == [row[:5] for row in rebuilt]
+    assert incremental == [(team_1, 2, 1, 4, 2, 'L1'), (team_2, 1, 2, 2, 4, 'W1')]
+    assert rebuilt == [(team_1, 2, 1, 4, 2, 'W1'), (team_2, 1, 2, 2, 4, 'L1')]
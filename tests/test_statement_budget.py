@@ -0,0 +1,32 @@
+import pytest
+from app import app
+from app.bench import request_page, seed_pages
+from app.dashboard import dashboard_cache
+from app.statement_budget import StatementBudgetExceeded
+
+# Pages whose templates walk teams, players, games and box scores, where an N+1 would show first
+PAGES = ('/league_dashboard/', '/team_details/', '/view_games', '/players', '/game_summary/')
+
+
+@pytest.fixture(scope='module')
+def pages(database):
+    # Twelve teams of ten players: a query per row would blow far past the budget
+    with app.app_context():
+        client, pages = seed_pages(12, 10)
+    return client, [page for page in pages if page.startswith(PAGES)]
+
+
+def test_pages_stay_within_the_statement_budget(pages):
+    client, paths = pages
+    assert len(paths) == len(PAGES)
+    for path in paths:
+        # Cold: the dashboard is otherwise served from the cache the seeding requests warmed
+        dashboard_cache.clear()
+        assert request_page(client, path).status_code == 200, path
+
+
+def test_budget_is_enforced(pages, monkeypatch):
+    client, paths = pages
+    monkeypatch.setitem(app.config, 'MAX_STATEMENTS_PER_REQUEST', 1)
+    with pytest.raises(StatementBudgetExceeded):
+        request_page(client, paths[0])